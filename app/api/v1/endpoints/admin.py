@@ -1,8 +1,25 @@
 from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
+from app.core.idempotency import idempotency_store
+from app.core.pagination import paginate, set_next_cursor
 from app.core.security import get_current_admin
-from app.db.supabase import get_supabase
+from app.db.supabase import get_async_supabase, get_pool_stats
+from app.db.coalesce import query_coalescer
+from app.services.cache_bus import cache_bus
+from app.services.profile_cache import profile_cache
+from app.services.redis_cache import async_redis_service
+from app.services.view_recorder import view_recorder
+from app.services.unique_views import unique_views
+from app.services.counters import counters
+from app.services.tag_cache import tag_cache
+from app.services.tag_index import tag_index
+from app.services.prompt_create import prompt_creator
+from app.services.prompt_import import prompt_importer
+from app.services.prompt_search import prompt_search
+from app.services.category_cache import category_cache
+from app.services.prompt_cache import PROMPT_CACHE_FIELDS, invalidate_prompt_lists, prompt_list_cache, trending_cache
 
 router = APIRouter()
 
@@ -12,31 +29,31 @@ router = APIRouter()
 # ─────────────────────────────────────────────
 
 @router.get("/stats")
-def get_admin_stats(current_user=Depends(get_current_admin)):
+async def get_admin_stats(current_user=Depends(get_current_admin)):
     """
     Get aggregate platform stats for the admin dashboard. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
 
     try:
-        total_users = supabase.table("users").select("id", count="exact").execute()
-        total_prompts = supabase.table("prompts").select("id", count="exact").execute()
-        total_comments = supabase.table("comments").select("id", count="exact").execute()
-        total_tags = supabase.table("tags").select("id", count="exact").execute()
-        total_reports = supabase.table("reports").select("id", count="exact").execute()
-        pending_reports = (
+        total_users = await supabase.table("users").select("id", count="exact").execute()
+        total_prompts = await supabase.table("prompts").select("id", count="exact").execute()
+        total_comments = await supabase.table("comments").select("id", count="exact").execute()
+        total_tags = await supabase.table("tags").select("id", count="exact").execute()
+        total_reports = await supabase.table("reports").select("id", count="exact").execute()
+        pending_reports = await (
             supabase.table("reports")
             .select("id", count="exact")
             .eq("status", "pending")
             .execute()
         )
-        published_prompts = (
+        published_prompts = await (
             supabase.table("prompts")
             .select("id", count="exact")
             .eq("status", "published")
             .execute()
         )
-        featured_prompts = (
+        featured_prompts = await (
             supabase.table("prompts")
             .select("id", count="exact")
             .eq("is_featured", True)
@@ -44,7 +61,7 @@ def get_admin_stats(current_user=Depends(get_current_admin)):
         )
 
         # Recent users (last 5)
-        recent_users_res = (
+        recent_users_res = await (
             supabase.table("users")
             .select("id, username, display_name, avatar_url, role, created_at, is_active")
             .order("created_at", desc=True)
@@ -53,7 +70,7 @@ def get_admin_stats(current_user=Depends(get_current_admin)):
         )
 
         # Recent prompts (last 5)
-        recent_prompts_res = (
+        recent_prompts_res = await (
             supabase.table("prompts")
             .select("id, title, status, created_at, view_count, like_count, author:users(username, display_name)")
             .order("created_at", desc=True)
@@ -77,14 +94,49 @@ def get_admin_stats(current_user=Depends(get_current_admin)):
         raise HTTPException(status_code=500, detail=f"Failed to fetch stats: {str(e)}")
 
 
+@router.get("/system")
+async def get_system_stats(current_user=Depends(get_current_admin)):
+    """
+    Runtime stats for this worker (connection pool utilisation, read coalescing,
+    L1/L2 cache hit rates and footprint). Admin only.
+    """
+    try:
+        redis_memory = await async_redis_service.memory_stats()
+    except Exception as e:
+        redis_memory = {"error": str(e)}
+
+    return {
+        "db_pool": get_pool_stats(),
+        "coalescing": query_coalescer.stats(),
+        "prompt_list_cache": prompt_list_cache.stats(),
+        "trending_cache": trending_cache.stats(),
+        "category_cache": category_cache.stats(),
+        "profile_cache": profile_cache.stats(),
+        "cache_bus": cache_bus.stats(),
+        "view_recorder": view_recorder.stats(),
+        "unique_views": unique_views.stats(),
+        "counters": counters.stats(),
+        "tag_cache": tag_cache.stats(),
+        "tag_index": tag_index.stats(),
+        "prompt_create": prompt_creator.stats(),
+        "prompt_import": prompt_importer.stats(),
+        "prompt_search": prompt_search.stats(),
+        "idempotency": idempotency_store.stats(),
+        "redis": redis_memory,
+    }
+
+
 # ─────────────────────────────────────────────
 # User Management
 # ─────────────────────────────────────────────
 
 @router.get("/users")
-def list_all_users(
+async def list_all_users(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, gt=0, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; replaces skip"),
     search: Optional[str] = Query(None),
     role: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
@@ -93,7 +145,7 @@ def list_all_users(
     """
     List all users with pagination, search, and filters. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     query = supabase.table("users").select(
         "id, username, email, display_name, avatar_url, role, is_active, is_verified, "
         "total_prompts, total_followers, total_following, created_at, last_login_at"
@@ -106,13 +158,14 @@ def list_all_users(
     if is_active is not None:
         query = query.eq("is_active", is_active)
 
-    query = query.order("created_at", desc=True).range(skip, skip + limit - 1)
-    response = query.execute()
-    return response.data
+    query = paginate(query, "created_at", skip, limit, cursor)
+    rows = (await query.execute()).data
+    set_next_cursor(request, response, rows, "created_at", limit)
+    return rows
 
 
 @router.put("/users/{user_id}/role")
-def update_user_role(
+async def update_user_role(
     user_id: UUID,
     role: str = Query(..., description="New role: user or admin"),
     current_user=Depends(get_current_admin),
@@ -123,19 +176,20 @@ def update_user_role(
     if role not in ("user", "admin"):
         raise HTTPException(status_code=400, detail="Role must be 'user' or 'admin'")
 
-    supabase = get_supabase()
-    existing = supabase.table("users").select("id").eq("id", str(user_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("users").select("id").eq("id", str(user_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="User not found")
 
-    response = supabase.table("users").update({"role": role}).eq("id", str(user_id)).execute()
+    response = await supabase.table("users").update({"role": role}).eq("id", str(user_id)).execute()
+    await profile_cache.invalidate(user_id)
     if not response.data:
         raise HTTPException(status_code=400, detail="Could not update role")
     return response.data[0]
 
 
 @router.put("/users/{user_id}/status")
-def toggle_user_status(
+async def toggle_user_status(
     user_id: UUID,
     is_active: bool = Query(...),
     current_user=Depends(get_current_admin),
@@ -143,33 +197,35 @@ def toggle_user_status(
     """
     Activate or deactivate a user. Admin only.
     """
-    supabase = get_supabase()
-    existing = supabase.table("users").select("id").eq("id", str(user_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("users").select("id").eq("id", str(user_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="User not found")
 
-    response = (
+    response = await (
         supabase.table("users")
         .update({"is_active": is_active})
         .eq("id", str(user_id))
         .execute()
     )
+    await profile_cache.invalidate(user_id)
     if not response.data:
         raise HTTPException(status_code=400, detail="Could not update user status")
     return response.data[0]
 
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: UUID, current_user=Depends(get_current_admin)):
+async def delete_user(user_id: UUID, current_user=Depends(get_current_admin)):
     """
     Permanently delete a user. Admin only.
     """
-    supabase = get_supabase()
-    existing = supabase.table("users").select("id").eq("id", str(user_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("users").select("id").eq("id", str(user_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="User not found")
 
-    supabase.table("users").delete().eq("id", str(user_id)).execute()
+    await supabase.table("users").delete().eq("id", str(user_id)).execute()
+    await profile_cache.invalidate(user_id)
     return None
 
 
@@ -178,9 +234,12 @@ def delete_user(user_id: UUID, current_user=Depends(get_current_admin)):
 # ─────────────────────────────────────────────
 
 @router.get("/prompts")
-def list_all_prompts(
+async def list_all_prompts(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, gt=0, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; replaces skip"),
     search: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     prompt_type: Optional[str] = Query(None),
@@ -190,7 +249,7 @@ def list_all_prompts(
     """
     List all prompts (all statuses) with filters. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     query = supabase.table("prompts").select(
         "id, title, status, prompt_type, privacy_status, is_featured, "
         "view_count, like_count, bookmark_count, comment_count, average_rating, "
@@ -206,13 +265,42 @@ def list_all_prompts(
     if is_featured is not None:
         query = query.eq("is_featured", is_featured)
 
-    query = query.order("created_at", desc=True).range(skip, skip + limit - 1)
-    response = query.execute()
-    return response.data
+    query = paginate(query, "created_at", skip, limit, cursor)
+    rows = (await query.execute()).data
+    set_next_cursor(request, response, rows, "created_at", limit)
+    return rows
+
+
+class ImportStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body generator consumes the request body itself. The stock
+    class also reads `receive` to watch for disconnects (ASGI < 2.4), which would steal
+    body chunks; here a disconnect surfaces as ClientDisconnect from `request.stream()`.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+@router.post("/prompts/import")
+async def import_prompts(
+    request: Request,
+    batch_size: Optional[int] = Query(None, ge=1, le=1000),
+    concurrency: Optional[int] = Query(None, ge=1, le=16),
+    current_user=Depends(get_current_admin),
+):
+    """
+    Bulk-create prompts from an NDJSON body (one PromptCreate per line), owned by the
+    calling admin. Streams back one NDJSON result per line, then a summary. Admin only.
+    """
+    return ImportStreamingResponse(
+        prompt_importer.run(current_user["id"], request.stream(), batch_size, concurrency),
+        media_type="application/x-ndjson",
+    )
 
 
 @router.put("/prompts/{prompt_id}/feature")
-def toggle_prompt_feature(
+async def toggle_prompt_feature(
     prompt_id: UUID,
     is_featured: bool = Query(...),
     current_user=Depends(get_current_admin),
@@ -222,8 +310,8 @@ def toggle_prompt_feature(
     """
     from datetime import datetime
 
-    supabase = get_supabase()
-    existing = supabase.table("prompts").select("id").eq("id", str(prompt_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("prompts").select(PROMPT_CACHE_FIELDS).eq("id", str(prompt_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Prompt not found")
 
@@ -231,7 +319,7 @@ def toggle_prompt_feature(
     if is_featured:
         update_data["featured_at"] = datetime.utcnow().isoformat()
 
-    response = (
+    response = await (
         supabase.table("prompts")
         .update(update_data)
         .eq("id", str(prompt_id))
@@ -239,11 +327,13 @@ def toggle_prompt_feature(
     )
     if not response.data:
         raise HTTPException(status_code=400, detail="Could not update prompt")
+
+    await invalidate_prompt_lists(existing.data[0])
     return response.data[0]
 
 
 @router.put("/prompts/{prompt_id}/status")
-def update_prompt_status(
+async def update_prompt_status(
     prompt_id: UUID,
     status: str = Query(..., description="New status: draft, published, archived"),
     current_user=Depends(get_current_admin),
@@ -254,12 +344,12 @@ def update_prompt_status(
     if status not in ("draft", "published", "archived"):
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    supabase = get_supabase()
-    existing = supabase.table("prompts").select("id").eq("id", str(prompt_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("prompts").select(PROMPT_CACHE_FIELDS).eq("id", str(prompt_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Prompt not found")
 
-    response = (
+    response = await (
         supabase.table("prompts")
         .update({"status": status})
         .eq("id", str(prompt_id))
@@ -267,20 +357,26 @@ def update_prompt_status(
     )
     if not response.data:
         raise HTTPException(status_code=400, detail="Could not update prompt status")
+
+    await invalidate_prompt_lists(existing.data[0])
+    await tag_index.prompts_changed([prompt_id])
     return response.data[0]
 
 
 @router.delete("/prompts/{prompt_id}", status_code=status.HTTP_204_NO_CONTENT)
-def admin_delete_prompt(prompt_id: UUID, current_user=Depends(get_current_admin)):
+async def admin_delete_prompt(prompt_id: UUID, current_user=Depends(get_current_admin)):
     """
     Delete any prompt. Admin only.
     """
-    supabase = get_supabase()
-    existing = supabase.table("prompts").select("id").eq("id", str(prompt_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("prompts").select(PROMPT_CACHE_FIELDS).eq("id", str(prompt_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Prompt not found")
 
-    supabase.table("prompts").delete().eq("id", str(prompt_id)).execute()
+    await supabase.table("prompts").delete().eq("id", str(prompt_id)).execute()
+    await invalidate_prompt_lists(existing.data[0])
+    await tag_index.prompts_changed([prompt_id])
+    await unique_views.forget(str(prompt_id))
     return None
 
 
@@ -289,16 +385,19 @@ def admin_delete_prompt(prompt_id: UUID, current_user=Depends(get_current_admin)
 # ─────────────────────────────────────────────
 
 @router.get("/comments")
-def list_all_comments(
+async def list_all_comments(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, gt=0, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; replaces skip"),
     is_approved: Optional[bool] = Query(None),
     current_user=Depends(get_current_admin),
 ):
     """
     List all comments with approval status. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     query = supabase.table("comments").select(
         "id, content, is_approved, is_edited, upvote_count, created_at, "
         "author:users(id, username, display_name, avatar_url), "
@@ -308,13 +407,14 @@ def list_all_comments(
     if is_approved is not None:
         query = query.eq("is_approved", is_approved)
 
-    query = query.order("created_at", desc=True).range(skip, skip + limit - 1)
-    response = query.execute()
-    return response.data
+    query = paginate(query, "created_at", skip, limit, cursor)
+    rows = (await query.execute()).data
+    set_next_cursor(request, response, rows, "created_at", limit)
+    return rows
 
 
 @router.put("/comments/{comment_id}/approve")
-def approve_comment(
+async def approve_comment(
     comment_id: UUID,
     is_approved: bool = Query(...),
     current_user=Depends(get_current_admin),
@@ -322,12 +422,12 @@ def approve_comment(
     """
     Approve or disapprove a comment. Admin only.
     """
-    supabase = get_supabase()
-    existing = supabase.table("comments").select("id").eq("id", str(comment_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("comments").select("id").eq("id", str(comment_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    response = (
+    response = await (
         supabase.table("comments")
         .update({"is_approved": is_approved})
         .eq("id", str(comment_id))
@@ -339,16 +439,16 @@ def approve_comment(
 
 
 @router.delete("/comments/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def admin_delete_comment(comment_id: UUID, current_user=Depends(get_current_admin)):
+async def admin_delete_comment(comment_id: UUID, current_user=Depends(get_current_admin)):
     """
     Delete a comment. Admin only.
     """
-    supabase = get_supabase()
-    existing = supabase.table("comments").select("id").eq("id", str(comment_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("comments").select("id").eq("id", str(comment_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    supabase.table("comments").delete().eq("id", str(comment_id)).execute()
+    await supabase.table("comments").delete().eq("id", str(comment_id)).execute()
     return None
 
 
@@ -357,16 +457,19 @@ def admin_delete_comment(comment_id: UUID, current_user=Depends(get_current_admi
 # ─────────────────────────────────────────────
 
 @router.get("/reports")
-def list_reports(
+async def list_reports(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, gt=0, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; replaces skip"),
     report_status: Optional[str] = Query(None, alias="status"),
     current_user=Depends(get_current_admin),
 ):
     """
     List all reports with details. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     query = supabase.table("reports").select(
         "id, reportable_type, reportable_id, reason, description, status, "
         "resolution_notes, resolved_at, created_at, "
@@ -376,13 +479,14 @@ def list_reports(
     if report_status:
         query = query.eq("status", report_status)
 
-    query = query.order("created_at", desc=True).range(skip, skip + limit - 1)
-    response = query.execute()
-    return response.data
+    query = paginate(query, "created_at", skip, limit, cursor)
+    rows = (await query.execute()).data
+    set_next_cursor(request, response, rows, "created_at", limit)
+    return rows
 
 
 @router.put("/reports/{report_id}")
-def update_report(
+async def update_report(
     report_id: UUID,
     report_status: str = Query(..., alias="status", description="reviewing, resolved, dismissed"),
     resolution_notes: Optional[str] = Query(None),
@@ -394,8 +498,8 @@ def update_report(
     if report_status not in ("reviewing", "resolved", "dismissed"):
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    supabase = get_supabase()
-    existing = supabase.table("reports").select("id").eq("id", str(report_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("reports").select("id").eq("id", str(report_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Report not found")
 
@@ -410,7 +514,7 @@ def update_report(
     if report_status in ("resolved", "dismissed"):
         update_data["resolved_at"] = datetime.utcnow().isoformat()
 
-    response = (
+    response = await (
         supabase.table("reports")
         .update(update_data)
         .eq("id", str(report_id))
@@ -426,35 +530,41 @@ def update_report(
 # ─────────────────────────────────────────────
 
 @router.get("/tags")
-def list_all_tags(
+async def list_all_tags(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, gt=0, le=200),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; replaces skip"),
     search: Optional[str] = Query(None),
     current_user=Depends(get_current_admin),
 ):
     """
     List all tags with usage counts. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     query = supabase.table("tags").select("id, name, slug, usage_count, created_at")
 
     if search:
         query = query.ilike("name", f"%{search}%")
 
-    query = query.order("usage_count", desc=True).range(skip, skip + limit - 1)
-    response = query.execute()
-    return response.data
+    query = paginate(query, "usage_count", skip, limit, cursor)
+    rows = (await query.execute()).data
+    set_next_cursor(request, response, rows, "usage_count", limit)
+    return rows
 
 
 @router.delete("/tags/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
-def admin_delete_tag(tag_id: UUID, current_user=Depends(get_current_admin)):
+async def admin_delete_tag(tag_id: UUID, current_user=Depends(get_current_admin)):
     """
     Delete a tag. Admin only.
     """
-    supabase = get_supabase()
-    existing = supabase.table("tags").select("id").eq("id", str(tag_id)).execute()
+    supabase = await get_async_supabase()
+    existing = await supabase.table("tags").select("id").eq("id", str(tag_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Tag not found")
 
-    supabase.table("tags").delete().eq("id", str(tag_id)).execute()
+    await supabase.table("tags").delete().eq("id", str(tag_id)).execute()
+    await tag_cache.invalidate(tag_id)
+    await tag_index.tag_deleted(tag_id)
     return None
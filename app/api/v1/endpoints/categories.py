@@ -1,36 +1,50 @@
 from typing import List
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse
 from app.core.security import get_current_admin, get_current_user
-from app.db.supabase import get_supabase
+from app.core.http_cache import (
+    CACHE_CONTROL_CATEGORIES,
+    cached_response,
+    etag_from_parts,
+    is_not_modified,
+    not_modified,
+    set_validators,
+)
+from app.db.supabase import get_async_supabase
+from app.db.coalesce import execute_coalesced
+from app.services.category_cache import CATEGORY_LIST, category_cache, invalidate_category_lists
+from app.services.prompt_cache import category_tag, prompt_list_cache
 
 router = APIRouter()
 
 @router.post("/", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
-def create_category(
+async def create_category(
     category_in: CategoryCreate,
     current_user = Depends(get_current_admin) # Admin only
 ):
     """
     Create a new category. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     
     # Check if slug exists
-    existing = supabase.table("categories").select("id").eq("slug", category_in.slug).execute()
+    existing = await supabase.table("categories").select("id").eq("slug", category_in.slug).execute()
     if existing.data:
         raise HTTPException(status_code=400, detail="Category with this slug already exists")
         
-    response = supabase.table("categories").insert(category_in.model_dump(mode='json')).execute()
+    response = await supabase.table("categories").insert(category_in.model_dump(mode='json')).execute()
     
     if not response.data:
         raise HTTPException(status_code=400, detail="Could not create category")
-        
+
+    await invalidate_category_lists()
     return response.data[0]
 
 @router.get("/", response_model=List[CategoryResponse])
-def read_categories(
+async def read_categories(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     is_active: bool = True
@@ -38,7 +52,7 @@ def read_categories(
     """
     Retrieve categories. Public.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     query = supabase.table("categories").select("*")
     
     if is_active:
@@ -46,24 +60,34 @@ def read_categories(
         
     query = query.order("display_order", desc=False).range(skip, skip + limit - 1)
     
-    response = query.execute()
-    return response.data
+    async def load():
+        response = await execute_coalesced(query, label="read_categories")
+        return response.data
+
+    cache_key = category_cache.key("read_categories", skip=skip, limit=limit, is_active=is_active)
+    entry = await category_cache.get_or_load_entry(cache_key, load, [CATEGORY_LIST])
+    return cached_response(request, response, entry, CACHE_CONTROL_CATEGORIES)
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-def read_category(category_id: UUID):
+async def read_category(category_id: UUID, request: Request, response: Response):
     """
-    Get category by ID. Public.
+    Get category by ID. Public. Supports If-None-Match / If-Modified-Since.
     """
-    supabase = get_supabase()
-    response = supabase.table("categories").select("*").eq("id", str(category_id)).execute()
+    supabase = await get_async_supabase()
+    category_res = await supabase.table("categories").select("*").eq("id", str(category_id)).execute()
     
-    if not response.data:
+    if not category_res.data:
         raise HTTPException(status_code=404, detail="Category not found")
-        
-    return response.data[0]
+
+    category = category_res.data[0]
+    etag = etag_from_parts(category["id"], category.get("updated_at"))
+    if is_not_modified(request, etag, category.get("updated_at")):
+        return not_modified(etag, category.get("updated_at"), CACHE_CONTROL_CATEGORIES)
+    set_validators(response, etag, category.get("updated_at"), CACHE_CONTROL_CATEGORIES)
+    return category
 
 @router.put("/{category_id}", response_model=CategoryResponse)
-def update_category(
+async def update_category(
     category_id: UUID,
     category_in: CategoryUpdate,
     current_user = Depends(get_current_admin) # Admin only
@@ -71,38 +95,41 @@ def update_category(
     """
     Update a category. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     
     update_data = category_in.model_dump(mode='json', exclude_unset=True)
     
     if not update_data:
         # Fetch existing to return
-        existing = supabase.table("categories").select("*").eq("id", str(category_id)).execute()
+        existing = await supabase.table("categories").select("*").eq("id", str(category_id)).execute()
         if not existing.data:
              raise HTTPException(status_code=404, detail="Category not found")
         return existing.data[0]
         
-    response = supabase.table("categories").update(update_data).eq("id", str(category_id)).execute()
+    response = await supabase.table("categories").update(update_data).eq("id", str(category_id)).execute()
     
     if not response.data:
          raise HTTPException(status_code=400, detail="Could not update category")
-         
+
+    await invalidate_category_lists()
     return response.data[0]
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(
+async def delete_category(
     category_id: UUID,
     current_user = Depends(get_current_admin) # Admin only
 ):
     """
     Delete a category. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     
     # Check if category exists
-    existing = supabase.table("categories").select("id").eq("id", str(category_id)).execute()
+    existing = await supabase.table("categories").select("id").eq("id", str(category_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Category not found")
         
-    supabase.table("categories").delete().eq("id", str(category_id)).execute()
+    await supabase.table("categories").delete().eq("id", str(category_id)).execute()
+    await prompt_list_cache.invalidate_tags(category_tag(category_id))
+    await invalidate_category_lists()
     return None
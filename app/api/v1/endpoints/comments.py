@@ -4,19 +4,20 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from app.schemas.comment import CommentCreate, CommentUpdate, CommentResponse
 from app.schemas.comment_vote import CommentVoteCreate, CommentVoteResponse, VoteType
 from app.core.security import get_current_user, get_current_admin
-from app.db.supabase import get_supabase
+from app.db.supabase import get_async_supabase
+from app.services.counters import counters
 
 router = APIRouter()
 
 @router.post("/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
-def create_comment(
+async def create_comment(
     comment_in: CommentCreate,
     current_user = Depends(get_current_user)
 ):
     """
     Create a new comment.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     user_id = current_user["id"]
     
     data = comment_in.model_dump(mode="json")
@@ -24,7 +25,7 @@ def create_comment(
     
     # Optional: Verify prompt_id exists and parent_comment_id (if provided) exists
     
-    response = supabase.table("comments").insert(data).execute()
+    response = await supabase.table("comments").insert(data).execute()
     
     if not response.data:
         raise HTTPException(status_code=400, detail="Could not create comment")
@@ -32,7 +33,7 @@ def create_comment(
     return response.data[0]
 
 @router.get("/prompt/{prompt_id}", response_model=List[CommentResponse])
-def read_comments_for_prompt(
+async def read_comments_for_prompt(
     prompt_id: UUID,
     skip: int = 0,
     limit: int = 100
@@ -40,17 +41,17 @@ def read_comments_for_prompt(
     """
     Retrieve comments for a specific prompt.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     # Order by created_at desc or asc? Usually threads need structure.
     # For flat list we can filter by prompt_id.
     query = supabase.table("comments").select("*").eq("prompt_id", str(prompt_id))
     query = query.range(skip, skip + limit - 1)
     
-    response = query.execute()
+    response = await query.execute()
     return response.data
 
 @router.put("/{comment_id}", response_model=CommentResponse)
-def update_comment(
+async def update_comment(
     comment_id: UUID,
     comment_in: CommentUpdate,
     current_user = Depends(get_current_user)
@@ -58,12 +59,12 @@ def update_comment(
     """
     Update a comment. Owner or Admin.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     user_id = current_user["id"]
     is_admin = current_user.get("role") == "admin"
     
     # Ownership check
-    existing = supabase.table("comments").select("user_id").eq("id", str(comment_id)).execute()
+    existing = await supabase.table("comments").select("user_id").eq("id", str(comment_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Comment not found")
         
@@ -80,7 +81,7 @@ def update_comment(
 
     update_data["is_edited"] = True
     
-    response = supabase.table("comments").update(update_data).eq("id", str(comment_id)).execute()
+    response = await supabase.table("comments").update(update_data).eq("id", str(comment_id)).execute()
     
     if not response.data:
          raise HTTPException(status_code=400, detail="Could not update comment")
@@ -88,50 +89,38 @@ def update_comment(
     return response.data[0]
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_comment(
+async def delete_comment(
     comment_id: UUID,
     current_user = Depends(get_current_user)
 ):
     """
     Delete a comment. Owner or Admin.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     user_id = current_user["id"]
     is_admin = current_user.get("role") == "admin"
     
     # Ownership check
-    existing = supabase.table("comments").select("user_id").eq("id", str(comment_id)).execute()
+    existing = await supabase.table("comments").select("user_id").eq("id", str(comment_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Comment not found")
         
     if existing.data[0]["user_id"] != user_id and not is_admin:
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    supabase.table("comments").delete().eq("id", str(comment_id)).execute()
+    await supabase.table("comments").delete().eq("id", str(comment_id)).execute()
     return None
 
 @router.post("/{comment_id}/vote", response_model=CommentVoteResponse)
-def vote_comment(
+async def vote_comment(
     comment_id: UUID,
     vote_in: CommentVoteCreate,
     current_user = Depends(get_current_user)
 ):
     """
-    Upvote/Downvote a comment. Upserts.
+    Upvote/Downvote a comment. Upserts and keeps the comment's `upvote_count` in step.
     """
-    supabase = get_supabase()
-    user_id = current_user["id"]
-    
-    # Check if vote exists (UNIQUE constraint on user_id, comment_id)
-    data = {
-        "user_id": user_id,
-        "comment_id": str(comment_id),
-        "vote_type": vote_in.vote_type
-    }
-    
-    response = supabase.table("comment_votes").upsert(data, on_conflict="user_id, comment_id").execute()
-    
-    if not response.data:
-        raise HTTPException(status_code=400, detail="Could not vote")
-        
-    return response.data[0]
+    vote = await counters.set_comment_vote(current_user["id"], comment_id, vote_in.vote_type.value)
+    if vote is None:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    return vote
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.db.supabase import get_supabase
+from app.db.supabase import get_async_supabase
 from app.core.config import settings
 import uuid
 import mimetypes
@@ -11,7 +11,7 @@ async def upload_file(file: UploadFile = File(...)):
     """
     Upload a file to Supabase storage and return the public URL.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     bucket_name = settings.SUPABASE_STORAGE_BUCKET
 
     # Generate a unique filename
@@ -26,14 +26,14 @@ async def upload_file(file: UploadFile = File(...)):
         file_content = await file.read()
         
         # Upload file to Supabase Storage
-        res = supabase.storage.from_(bucket_name).upload(
+        res = await supabase.storage.from_(bucket_name).upload(
             path=file_name,
             file=file_content,
             file_options={"content-type": file.content_type}
         )
         
         # Get public URL
-        public_url_res = supabase.storage.from_(bucket_name).get_public_url(file_name)
+        public_url_res = await supabase.storage.from_(bucket_name).get_public_url(file_name)
         
         return {"url": public_url_res}
 
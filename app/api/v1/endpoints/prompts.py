@@ -1,13 +1,43 @@
 from typing import List, Optional
 from uuid import UUID
 from enum import Enum
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, BackgroundTasks
-from app.schemas.prompt import PromptCreate, PromptUpdate, PromptResponse, PromptType
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from app.schemas.prompt import PromptCreate, PromptUpdate, PromptResponse, PromptType, PromptView
 from app.schemas.prompt_rating import PromptRatingCreate, PromptRatingResponse
 from app.schemas.bookmark import BookmarkCreate, BookmarkResponse
 from app.schemas.prompt_like import PromptLikeResponse, PromptLikeToggleResponse
 from app.core.security import get_current_user, get_current_user_optional
-from app.db.supabase import get_supabase
+from app.core.pagination import decode_cursor, paginate, set_next_cursor
+from app.core.projection import PROMPT_LIST_MODEL, PROMPT_LIST_RESPONSES, PROMPT_SELECT, prompt_projection
+from app.core.http_cache import (
+    CACHE_CONTROL_LIST,
+    CACHE_CONTROL_PRIVATE,
+    CACHE_CONTROL_PROMPT,
+    CACHE_CONTROL_TRENDING,
+    cached_response,
+    etag_from_parts,
+    is_not_modified,
+    not_modified,
+    set_validators,
+)
+from app.db.supabase import get_async_supabase
+from app.db.coalesce import execute_coalesced
+from app.services.counters import counters
+from app.services.prompt_create import prompt_creator
+from app.services.prompt_search import RELEVANCE, SearchIndexUnavailable, prompt_search
+from app.services.tag_cache import tag_cache
+from app.services.tag_index import tag_index
+from app.services.unique_views import unique_views
+from app.services.view_recorder import view_recorder
+from app.services.prompt_cache import (
+    PROMPT_CACHE_FIELDS,
+    category_tag,
+    invalidate_prompt_lists,
+    list_tags,
+    prompt_list_cache,
+    tag_tag,
+    trending_cache,
+)
 
 
 
@@ -17,93 +47,93 @@ class SortOrder(str, Enum):
     most_liked = "most_liked"
     most_viewed = "most_viewed"
     most_bookmarked = "most_bookmarked"
+    top_rated = "top_rated"
+
+
+# Column each sort order is keyed on (descending, `id` breaks ties; see paginate)
+SORT_COLUMNS = {
+    SortOrder.new: "created_at",
+    SortOrder.most_liked: "like_count",
+    SortOrder.most_viewed: "view_count",
+    SortOrder.most_bookmarked: "bookmark_count",
+    SortOrder.top_rated: "bayesian_rating",
+}
+
+class SearchSortOrder(str, Enum):
+    relevance = "relevance"
+    new = "new"
+    most_liked = "most_liked"
+    most_viewed = "most_viewed"
+    most_bookmarked = "most_bookmarked"
+    top_rated = "top_rated"
+
+
+# Search ranks by BM25 score for relevance, otherwise like the listings
+SEARCH_SORT_COLUMNS = {
+    SearchSortOrder.relevance: RELEVANCE,
+    **{SearchSortOrder(order.value): column for order, column in SORT_COLUMNS.items()},
+}
+
+CURSOR_DESCRIPTION = "Opaque cursor from the previous page's X-Next-Cursor / Link header; replaces skip"
+VIEW_DESCRIPTION = "full: PromptResponse (default); card: compact PromptCard without prompt text and outputs"
+FIELDS_DESCRIPTION = "Comma-separated PromptResponse fields to return (e.g. title,like_count,author); overrides view"
 
 
 router = APIRouter()
 
+
+async def _fetch_rows(query) -> list:
+    response = await query.execute()
+    return response.data
+
+
+# Columns needed to answer a conditional GET for a prompt without the embedded joins
+PROMPT_VALIDATOR_FIELDS = "id, content_updated_at, privacy_status, status"
+
+
+def _prompt_validators(prompt: dict):
+    """
+    ETag, Last-Modified and Cache-Control for a prompt row (full or PROMPT_VALIDATOR_FIELDS).
+    `content_updated_at` is bumped by triggers on every edit of the prompt, its outputs,
+    tags and author; counters and `unique_views` are volatile and left out, so a 304 can
+    leave the client with the counters of its last full response.
+    """
+    etag = etag_from_parts(prompt["id"], prompt.get("content_updated_at"))
+    is_public = prompt.get("privacy_status", "public") == "public" and prompt.get("status") == "published"
+    return etag, prompt.get("content_updated_at"), CACHE_CONTROL_PROMPT if is_public else CACHE_CONTROL_PRIVATE
+
 @router.post("/", response_model=PromptResponse, status_code=status.HTTP_201_CREATED)
-def create_prompt(
+async def create_prompt(
     prompt_in: PromptCreate,
     current_user = Depends(get_current_user)
 ):
     """
     Create a new prompt.
     """
-    supabase = get_supabase()
-    # Extract user ID from the Auth response
-    # Supabase get_user returns UserResponse, accessing .user property
     user_id = current_user["id"]
 
-
-
-    prompt_data = prompt_in.model_dump(mode='json')
-    variables_data = prompt_data.pop("variables", None)
-    tags_data = prompt_data.pop("tags", None)
-    outputs_data = prompt_data.pop("prompt_outputs", None)
-
-    prompt_data["user_id"] = user_id
-    
     try:
-        # In a real app, you might want to handle slug generation here or in DB
-        
-        response = supabase.table("prompts").insert(prompt_data).execute()
-        
-        if not response.data:
-            raise HTTPException(status_code=400, detail="Could not create prompt")
-        
-        new_prompt = response.data[0]
-        prompt_id = new_prompt["id"]
-
-        # Handle Variables
-        if variables_data:
-            for out in variables_data:
-                 # Check if loop variable is dict
-                 if not isinstance(out, dict):
-                      out = out.model_dump(mode='json')
-                 out["prompt_id"] = prompt_id
-            supabase.table("prompt_variables").insert(variables_data).execute()
-
-        # Handle Tags
-        if tags_data:
-            for tag_name in tags_data:
-                slug = tag_name.lower().strip().replace(" ", "-")
-                
-                tag_res = supabase.table("tags").select("id").eq("slug", slug).execute()
-                
-                tag_id = None
-                if tag_res.data:
-                    tag_id = tag_res.data[0]["id"]
-                else:
-                    new_tag = {"name": tag_name.strip(), "slug": slug}
-                    tag_create_res = supabase.table("tags").insert(new_tag).execute()
-                    if tag_create_res.data:
-                        tag_id = tag_create_res.data[0]["id"]
-                
-                if tag_id:
-                    link_data = {"prompt_id": prompt_id, "tag_id": tag_id}
-                    supabase.table("prompt_tags").insert(link_data).execute()
-
-        # Handle Outputs
-        if outputs_data:
-            for out in outputs_data:
-                 if not isinstance(out, dict):
-                      out = out.model_dump(mode='json')
-                 out["prompt_id"] = prompt_id
-                 out["user_id"] = user_id
-            supabase.table("prompt_outputs").insert(outputs_data).execute()
-            
-        return new_prompt
-
+        # One call, one transaction (see PromptCreator)
+        new_prompt, tag_ids = await prompt_creator.create(user_id, prompt_in)
     except Exception as e:
         print(f"Error creating prompt: {e}")
         # Return error as detail for debugging
         raise HTTPException(status_code=500, detail=f"Creation failed: {str(e)}")
 
-@router.get("/", response_model=List[PromptResponse])
-def read_prompts(
+    await invalidate_prompt_lists(category_id=new_prompt.get("category_id"), user_id=user_id, tag_ids=tag_ids)
+    await tag_index.prompts_changed([new_prompt["id"]])
+    return new_prompt
+
+@router.get("/", response_model=PROMPT_LIST_MODEL, responses=PROMPT_LIST_RESPONSES)
+async def read_prompts(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, gt=0, le=100),
-    sort: SortOrder = Query(SortOrder.new, description="Sort order: new, most_liked, most_viewed, most_bookmarked"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    view: PromptView = Query(PromptView.FULL, description=VIEW_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    sort: SortOrder = Query(SortOrder.new, description="Sort order: new, most_liked, most_viewed, most_bookmarked, top_rated"),
     user_id: Optional[UUID] = Query(None, description="Filter by author user ID"),
     category_id: Optional[UUID] = Query(None, description="Filter by category ID"),
     prompt_type: Optional[PromptType] = Query(None, description="Filter by prompt type"),
@@ -116,9 +146,18 @@ def read_prompts(
     - **sort=most_liked** – highest average rating first
     - **sort=most_viewed** – most views first
     - **sort=most_bookmarked** – most bookmarks first
+    - **sort=top_rated** – best Bayesian average rating first (few ratings weigh less)
+
+    Full pages carry `X-Next-Cursor` and a `Link: rel="next"` header; pass `cursor` to
+    fetch the next page (faster than a growing `skip`, and stable while prompts are added).
+
+    `view=card` returns compact `PromptCard` items; `fields=title,like_count,author`
+    returns only the listed fields (plus `id` and the sort column). Either way only
+    those columns are selected.
     """
-    supabase = get_supabase()
-    query = supabase.table("prompts").select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))")
+    supabase = await get_async_supabase()
+    projection = prompt_projection(view, fields, required=("id", SORT_COLUMNS[sort]))
+    query = supabase.table("prompts").select(projection.select)
 
 
     # --- Filters ---
@@ -131,46 +170,87 @@ def read_prompts(
     if status:
         query = query.eq("status", status)
 
-    # --- Sorting ---
-    if sort == SortOrder.most_liked:
-        query = query.order("like_count", desc=True)
-    elif sort == SortOrder.most_viewed:
-        query = query.order("view_count", desc=True)
-    elif sort == SortOrder.most_bookmarked:
-        query = query.order("bookmark_count", desc=True)
-    else:  # SortOrder.new
-        query = query.order("created_at", desc=True)
-
-    # --- Pagination ---
-    query = query.range(skip, skip + limit - 1)
+    # --- Sorting & pagination ---
+    query = paginate(query, SORT_COLUMNS[sort], skip, limit, cursor)
 
-    response = query.execute()
-    return response.data
+    cache_key = prompt_list_cache.key(
+        "read_prompts", view=projection.name, skip=skip, cursor=cursor, limit=limit, sort=sort, user_id=user_id,
+        category_id=category_id, prompt_type=prompt_type, status=status,
+    )
+    entry = await prompt_list_cache.get_or_load_entry(
+        cache_key, lambda: _fetch_rows(query), list_tags(category_id=category_id, user_id=user_id)
+    )
+    set_next_cursor(request, response, entry["value"], SORT_COLUMNS[sort], limit)
+    return projection.respond(response, cached_response(request, response, entry))
 
-@router.get("/search", response_model=List[PromptResponse])
-def search_prompts(
+@router.get("/search", response_model=PROMPT_LIST_MODEL, responses=PROMPT_LIST_RESPONSES)
+async def search_prompts(
+    request: Request,
+    response: Response,
     q: str = Query(..., min_length=1, description="Search query string"),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, gt=0, le=100),
-    sort: SortOrder = Query(SortOrder.new),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    view: PromptView = Query(PromptView.FULL, description=VIEW_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    sort: SearchSortOrder = Query(SearchSortOrder.relevance),
     category_id: Optional[UUID] = Query(None),
     prompt_type: Optional[PromptType] = Query(None),
 ):
     """
-    Search prompts by title or description using a keyword query.
+    Full-text search of published public prompts.
 
-    - **q** – Required search keyword
-    - **sort** – Sort order: new, most_liked, most_viewed, most_bookmarked
+    Matches the title, description, prompt text and tag names. Words are stemmed
+    (`summarizing` finds `summarize`), stop words are ignored, and every remaining word
+    of `q` must match.
+
+    - **q** – Required search keywords
+    - **sort** – relevance (BM25, default), new, most_liked, most_viewed, most_bookmarked, top_rated
     - **category_id** – Optional category filter
     - **prompt_type** – Optional type filter (text, image, etc.)
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
+    column = SEARCH_SORT_COLUMNS[sort]
+    projection = prompt_projection(view, fields, required=("id",) if column == RELEVANCE else ("id", column))
+    cache_key = prompt_list_cache.key(
+        "search", view=projection.name, q=q, skip=skip, cursor=cursor, limit=limit, sort=sort, category_id=category_id, prompt_type=prompt_type,
+    )
+
+    # Ranked pages carry the rank of each match, for the cursor (BM25 scores are not columns)
+    cursor_column = f"search:{column}"
+    after = decode_cursor(cursor, cursor_column) if cursor else None
 
-    # Search across title and description using ilike (case insensitive)
+    async def load_ranked():
+        ranked = await prompt_search.search(
+            q, column, limit, skip, after, category_id, prompt_type.value if prompt_type else None
+        )
+        rows = []
+        if ranked:
+            rows = await _fetch_rows(
+                supabase.table("prompts").select(projection.select).in_("id", [match["id"] for match in ranked])
+            )
+        rows_by_id = {row["id"]: row for row in rows}
+        return {
+            "rows": [rows_by_id[match["id"]] for match in ranked if match["id"] in rows_by_id],
+            "ranks": [{"id": match["id"], cursor_column: match["rank"]} for match in ranked],
+        }
+
+    try:
+        entry = await prompt_list_cache.get_or_load_entry(cache_key, load_ranked, list_tags(category_id=category_id))
+    except SearchIndexUnavailable:
+        pass
+    else:
+        set_next_cursor(request, response, entry["value"]["ranks"], cursor_column, limit)
+        page = cached_response(request, response, entry)
+        return projection.respond(response, page if isinstance(page, Response) else page["rows"])
+
+    # Search index not installed: substring match on title and description, newest first for relevance
+    if column == RELEVANCE:
+        column = "created_at"
+    projection = prompt_projection(view, fields, required=("id", column))
     query = (
         supabase.table("prompts")
-        .select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))")
-
+        .select(projection.select)
         .or_(f"title.ilike.%{q}%,description.ilike.%{q}%")
         .eq("status", "published")
     )
@@ -180,91 +260,190 @@ def search_prompts(
     if prompt_type:
         query = query.eq("prompt_type", prompt_type.value)
 
-    if sort == SortOrder.most_liked:
-        query = query.order("like_count", desc=True)
-    elif sort == SortOrder.most_viewed:
-        query = query.order("view_count", desc=True)
-    elif sort == SortOrder.most_bookmarked:
-        query = query.order("bookmark_count", desc=True)
-    else:
-        query = query.order("created_at", desc=True)
+    query = paginate(query, column, skip, limit, cursor)
+    cache_key = prompt_list_cache.key(
+        "search_ilike", view=projection.name, q=q, skip=skip, cursor=cursor, limit=limit, sort=sort, category_id=category_id, prompt_type=prompt_type,
+    )
+    entry = await prompt_list_cache.get_or_load_entry(cache_key, lambda: _fetch_rows(query), list_tags(category_id=category_id))
+    set_next_cursor(request, response, entry["value"], column, limit)
+    return projection.respond(response, cached_response(request, response, entry))
 
-    query = query.range(skip, skip + limit - 1)
+@router.get("/trending", response_model=List[PromptResponse])
+async def get_trending_prompts(
+    request: Request,
+    response: Response,
+    limit: int = Query(20, gt=0, le=100),
+):
+    """
+    Get currently trending prompts.
+
+    Returns prompts from the pre-calculated `trending_prompts` table, ordered
+    by rank (ascending). The trending score is computed based on views,
+    ratings, and bookmarks in the last 24 hours.
+    """
+    async def load():
+        supabase = await get_async_supabase()
+
+        # Fetch active trending records ordered by rank
+        trending_res = await execute_coalesced(
+            supabase.table("trending_prompts")
+            .select("prompt_id, rank")
+            .order("rank", desc=False)
+            .limit(limit),
+            label="get_trending_prompts",
+        )
+
+        if not trending_res.data:
+            return []
+
+        prompt_ids = [row["prompt_id"] for row in trending_res.data]
+
+        # Fetch the full prompt details for those IDs
+        prompts_res = await execute_coalesced(
+            supabase.table("prompts")
+            .select(PROMPT_SELECT)
+            .in_("id", prompt_ids),
+            label="get_trending_prompts",
+        )
+
+        # Re-order results to match the rank order from trending_prompts
+        prompts_by_id = {p["id"]: p for p in prompts_res.data}
+        ordered = [prompts_by_id[pid] for pid in prompt_ids if pid in prompts_by_id]
+
+        return ordered
+
+    entry = await trending_cache.get_or_load_entry(trending_cache.key("trending", limit=limit), load)
+    return cached_response(request, response, entry, CACHE_CONTROL_TRENDING)
+
+
+async def _resolve_tags(values: List[str]) -> List[Optional[str]]:
+    """Tag ids for repeated and/or comma-separated tag slugs (None for unknown tags)."""
+    names = [name.strip() for value in values for name in value.split(",") if name.strip()]
+    return [await tag_cache.lookup(name) for name in dict.fromkeys(names)]
+
+
+@router.get("/tags", response_model=PROMPT_LIST_MODEL, responses=PROMPT_LIST_RESPONSES)
+async def get_prompts_by_tags(
+    request: Request,
+    response: Response,
+    all_tags: List[str] = Query([], alias="all", description="Prompts must carry every one of these tags"),
+    any_tags: List[str] = Query([], alias="any", description="Prompts must carry at least one of these tags"),
+    none_tags: List[str] = Query([], alias="none", description="Prompts must carry none of these tags"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, gt=0, le=100),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    view: PromptView = Query(PromptView.FULL, description=VIEW_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    sort: SortOrder = Query(SortOrder.new, description="Sort order: new, most_liked, most_viewed, most_bookmarked, top_rated"),
+):
+    """
+    Published public prompts matching a boolean tag query, e.g.
+    `?all=python&all=gpt-4&none=beginner` or `?any=python,javascript`.
+
+    Tags are given by slug (or name), repeated or comma-separated; at least one `all`
+    or `any` tag is required. The query runs against the in-memory tag index (see
+    `TagIndex`), which also orders and pages the matches, so only the page itself is
+    read from the database. Sort counters in the index are refreshed periodically
+    (TAG_INDEX_REBUILD_SECONDS).
+    """
+    if not all_tags and not any_tags:
+        raise HTTPException(status_code=400, detail="Give at least one 'all' or 'any' tag")
+
+    column = SORT_COLUMNS[sort]
+    projection = prompt_projection(view, fields, required=("id", column))
+    after = decode_cursor(cursor, column) if cursor else None
+
+    all_ids = await _resolve_tags(all_tags)
+    any_ids = [tag_id for tag_id in await _resolve_tags(any_tags) if tag_id]
+    none_ids = [tag_id for tag_id in await _resolve_tags(none_tags) if tag_id]
+    if None in all_ids or (any_tags and not any_ids):
+        return projection.respond(response, [])  # an unknown required tag matches nothing
+
+    await tag_index.ready()
+    entries = tag_index.page(tag_index.match(all_ids, any_ids, none_ids), column, skip, limit, after)
+    if not entries:
+        return projection.respond(response, [])
+
+    supabase = await get_async_supabase()
+    rows = await _fetch_rows(supabase.table("prompts").select(projection.select).in_("id", [e["id"] for e in entries]))
+    rows_by_id = {row["id"]: row for row in rows}
+    ordered = [rows_by_id[e["id"]] for e in entries if e["id"] in rows_by_id]
+
+    # Cursor from the index entries, whose sort values are the ones the next page compares against
+    set_next_cursor(request, response, entries, column, limit)
+    response.headers["Cache-Control"] = CACHE_CONTROL_LIST
+    return projection.respond(response, ordered)
 
-    response = query.execute()
-    return response.data
 
 @router.get("/{prompt_id}", response_model=PromptResponse)
-def read_prompt(
+async def read_prompt(
     prompt_id: UUID, 
     request: Request,
-    background_tasks: BackgroundTasks,
+    response: Response,
     current_user = Depends(get_current_user_optional)
 ):
     """
-    Get prompt by ID. Records a view in the background.
+    Get prompt by ID. Records a view (buffered, see `view_recorder`) unless the same
+    viewer already viewed it within the dedupe window, and returns the unique viewer
+    estimate as `unique_views`.
+
+    Supports conditional requests: when the client sends `If-None-Match` or
+    `If-Modified-Since`, the validators are checked first against a lightweight
+    query and a 304 is returned without loading the embedded outputs, author and tags.
     """
-    supabase = get_supabase()
-    response = supabase.table("prompts").select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))").eq("id", str(prompt_id)).execute()
+    supabase = await get_async_supabase()
 
-    
-    if not response.data:
+    if request.headers.get("if-none-match") or request.headers.get("if-modified-since"):
+        head = await execute_coalesced(
+            supabase.table("prompts").select(PROMPT_VALIDATOR_FIELDS).eq("id", str(prompt_id)),
+            label="read_prompt_validators",
+        )
+        if not head.data:
+            raise HTTPException(status_code=404, detail="Prompt not found")
+        etag, last_modified, cache_control = _prompt_validators(head.data[0])
+        if is_not_modified(request, etag, last_modified):
+            # Revalidations count as views too
+            await _record_view(request, prompt_id, current_user)
+            return not_modified(etag, last_modified, cache_control)
+
+    # Concurrent requests for the same prompt share one upstream query
+    prompt_res = await execute_coalesced(
+        supabase.table("prompts").select(PROMPT_SELECT).eq("id", str(prompt_id)),
+        label="read_prompt",
+    )
+
+    if not prompt_res.data:
         raise HTTPException(status_code=404, detail="Prompt not found")
         
-    prompt = response.data[0]
+    # Copy: the coalesced result is shared with concurrent requests
+    prompt = {**prompt_res.data[0]}
+    prompt["unique_views"] = await _record_view(request, prompt_id, current_user)
+    set_validators(response, *_prompt_validators(prompt))
+    return prompt
+
 
-    # Record view in background
+async def _record_view(request: Request, prompt_id: UUID, current_user: Optional[dict]) -> Optional[int]:
+    """Record a view unless it repeats within the dedupe window. Returns the unique viewer estimate."""
     user_id = current_user["id"] if current_user else None
     ip_address = request.client.host if request.client else None
     user_agent = request.headers.get("user-agent")
-    referrer = request.headers.get("referer")
-    
-    background_tasks.add_task(
-        record_prompt_view, 
-        prompt_id=str(prompt_id), 
-        user_id=user_id,
-        ip_address=ip_address,
-        user_agent=user_agent,
-        referrer=referrer
-    )
-        
-    return prompt
 
-def record_prompt_view(
-    prompt_id: str, 
-    user_id: Optional[str] = None, 
-    ip_address: Optional[str] = None, 
-    user_agent: Optional[str] = None, 
-    referrer: Optional[str] = None
-):
-    """
-    Helper to record a view and increment count in the background.
-    """
-    supabase = get_supabase()
-    
-    try:
-        # 1. Insert into prompt_views
-        view_data = {
-            "prompt_id": prompt_id,
-        }
-        if user_id: view_data["user_id"] = user_id
-        if ip_address: view_data["ip_address"] = ip_address
-        if user_agent: view_data["user_agent"] = user_agent
-        if referrer: view_data["referrer"] = referrer
-        
-        supabase.table("prompt_views").insert(view_data).execute()
-        
-        # 2. Increment view_count in prompts table
-        prompt_res = supabase.table("prompts").select("view_count").eq("id", prompt_id).execute()
-        if prompt_res.data:
-            current_count = prompt_res.data[0].get("view_count") or 0
-            supabase.table("prompts").update({"view_count": current_count + 1}).eq("id", prompt_id).execute()
-    except Exception as e:
-        print(f"Error recording view: {e}")
+    counts, unique = await unique_views.observe(
+        str(prompt_id), unique_views.viewer_id(user_id, ip_address, user_agent)
+    )
+    if counts:
+        view_recorder.record(
+            prompt_id=str(prompt_id), 
+            user_id=user_id,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            referrer=request.headers.get("referer"),
+        )
+    return unique
 
 
 @router.put("/{prompt_id}", response_model=PromptResponse)
-def update_prompt(
+async def update_prompt(
     prompt_id: UUID,
     prompt_in: PromptUpdate,
     current_user = Depends(get_current_user)
@@ -272,13 +451,13 @@ def update_prompt(
     """
     Update a prompt.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     today = current_user
     user_id = current_user["id"]
     is_admin = current_user.get("role") == "admin"
     
     # Verify ownership
-    existing = supabase.table("prompts").select("user_id").eq("id", str(prompt_id)).execute()
+    existing = await supabase.table("prompts").select(PROMPT_CACHE_FIELDS).eq("id", str(prompt_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Prompt not found")
         
@@ -287,183 +466,125 @@ def update_prompt(
     
     update_data = prompt_in.model_dump(mode='json', exclude_unset=True)
     
-    response = supabase.table("prompts").update(update_data).eq("id", str(prompt_id)).execute()
+    response = await supabase.table("prompts").update(update_data).eq("id", str(prompt_id)).execute()
     
     if not response.data:
          raise HTTPException(status_code=400, detail="Could not update prompt")
-         
+
+    # Evict listings for both the old and (if it moved) the new category
+    await invalidate_prompt_lists(existing.data[0])
+    if response.data[0].get("category_id") != existing.data[0].get("category_id"):
+        await invalidate_prompt_lists(category_id=response.data[0].get("category_id"))
+    await tag_index.prompts_changed([prompt_id])
     return response.data[0]
 
 
 @router.delete("/{prompt_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_prompt(
+async def delete_prompt(
     prompt_id: UUID,
     current_user = Depends(get_current_user)
 ):
     """
     Delete a prompt.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     user_id = current_user["id"]
     is_admin = current_user.get("role") == "admin"
     
     # Verify ownership
-    existing = supabase.table("prompts").select("user_id").eq("id", str(prompt_id)).execute()
+    existing = await supabase.table("prompts").select(PROMPT_CACHE_FIELDS).eq("id", str(prompt_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="Prompt not found")
         
     if existing.data[0]["user_id"] != user_id and not is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to delete this prompt")
         
-    supabase.table("prompts").delete().eq("id", str(prompt_id)).execute()
+    await supabase.table("prompts").delete().eq("id", str(prompt_id)).execute()
+    await invalidate_prompt_lists(existing.data[0])
+    await tag_index.prompts_changed([prompt_id])
+    await unique_views.forget(str(prompt_id))
 
     return None
 
 # Engagement Endpoints
 
 @router.post("/{prompt_id}/like", response_model=PromptLikeToggleResponse)
-def like_prompt(
+async def like_prompt(
     prompt_id: UUID,
     current_user = Depends(get_current_user)
 ):
     """
-    Like a prompt.
+    Like a prompt. Idempotent (liking twice counts once).
     """
-    supabase = get_supabase()
-    user_id = current_user["id"]
-    
-    # Check if already liked
-    existing = supabase.table("prompt_likes").select("*").eq("user_id", user_id).eq("prompt_id", str(prompt_id)).execute()
-    if existing.data:
-        # Already liked. Return current count
-        prompt_res = supabase.table("prompts").select("like_count").eq("id", str(prompt_id)).execute()
-        return {"has_liked": True, "like_count": prompt_res.data[0].get("like_count") or 0}
-        
-    data = {
-        "user_id": user_id,
-        "prompt_id": str(prompt_id)
-    }
-    
-    supabase.table("prompt_likes").insert(data).execute()
-    
-    prompt_res = supabase.table("prompts").select("like_count").eq("id", str(prompt_id)).execute()
-    current_count = prompt_res.data[0].get("like_count") or 0 if prompt_res.data else 0
-    new_count = current_count + 1
-    
-    supabase.table("prompts").update({"like_count": new_count}).eq("id", str(prompt_id)).execute()
-    
-    return {"has_liked": True, "like_count": new_count}
+    like_count = await counters.set_like(current_user["id"], prompt_id, liked=True)
+    if like_count is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    return {"has_liked": True, "like_count": like_count}
 
 @router.delete("/{prompt_id}/like", response_model=PromptLikeToggleResponse)
-def unlike_prompt(
+async def unlike_prompt(
     prompt_id: UUID,
     current_user = Depends(get_current_user)
 ):
     """
     Remove like from a prompt.
     """
-    supabase = get_supabase()
-    user_id = current_user["id"]
-    
-    existing = supabase.table("prompt_likes").select("*").eq("user_id", user_id).eq("prompt_id", str(prompt_id)).execute()
-    if not existing.data:
-        prompt_res = supabase.table("prompts").select("like_count").eq("id", str(prompt_id)).execute()
-        count = prompt_res.data[0].get("like_count") or 0 if prompt_res.data else 0
-        return {"has_liked": False, "like_count": count}
-    
-    supabase.table("prompt_likes").delete().eq("user_id", user_id).eq("prompt_id", str(prompt_id)).execute()
-    
-    prompt_res = supabase.table("prompts").select("like_count").eq("id", str(prompt_id)).execute()
-    current_count = prompt_res.data[0].get("like_count") or 0 if prompt_res.data else 0
-    new_count = max(0, current_count - 1)
-    
-    supabase.table("prompts").update({"like_count": new_count}).eq("id", str(prompt_id)).execute()
-    
-    return {"has_liked": False, "like_count": new_count}
+    like_count = await counters.set_like(current_user["id"], prompt_id, liked=False)
+    if like_count is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    return {"has_liked": False, "like_count": like_count}
 
 @router.post("/{prompt_id}/rate", response_model=PromptRatingResponse)
-def rate_prompt(
+async def rate_prompt(
     prompt_id: UUID,
     rating_in: PromptRatingCreate,
     current_user = Depends(get_current_user)
 ):
     """
-    Rate a prompt (1-5). Upserts (updates if already rated).
+    Rate a prompt (1-5). Upserts (updates if already rated); the prompt's rating
+    aggregates move by the difference from the previous rating.
     """
-    supabase = get_supabase()
-    user_id = current_user["id"]
-    
-    # Check bounds (handled by Pydantic but good to be safe)
-    if not (1 <= rating_in.rating <= 5):
-        raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
-        
-    # Check if user already rated this prompt
-    # In Supabase/Postgres we can use upsert if we have a unique constraint on (user_id, prompt_id)
-    # The schema has UNIQUE(user_id, prompt_id)
-    
-    data = {
-        "user_id": user_id,
-        "prompt_id": str(prompt_id),
-        "rating": rating_in.rating
-    }
-    
-    # Using upsert
-    response = supabase.table("prompt_ratings").upsert(data, on_conflict="user_id, prompt_id").execute()
-    
-    if not response.data:
-        raise HTTPException(status_code=400, detail="Could not rate prompt")
-        
-    return response.data[0]
+    rating = await counters.set_rating(current_user["id"], prompt_id, rating_in.rating)
+    if rating is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    return rating
 
 @router.post("/{prompt_id}/bookmark", response_model=BookmarkResponse)
-def bookmark_prompt(
+async def bookmark_prompt(
     prompt_id: UUID,
     current_user = Depends(get_current_user)
 ):
     """
     Bookmark a prompt. Idempotent (if already bookmarked, returns existing).
     """
-    supabase = get_supabase()
-    user_id = current_user["id"]
-    
-    # Check if already bookmarked
-    existing = supabase.table("bookmarks").select("*").eq("user_id", user_id).eq("prompt_id", str(prompt_id)).execute()
-    if existing.data:
-        return existing.data[0]
-        
-    data = {
-        "user_id": user_id,
-        "prompt_id": str(prompt_id)
-    }
-    
-    response = supabase.table("bookmarks").insert(data).execute()
-    
-    if not response.data:
-         raise HTTPException(status_code=400, detail="Could not bookmark prompt")
-         
-    return response.data[0]
+    bookmark = await counters.set_bookmark(current_user["id"], prompt_id, bookmarked=True)
+    if bookmark is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    return bookmark
 
 @router.delete("/{prompt_id}/bookmark", status_code=status.HTTP_204_NO_CONTENT)
-def unbookmark_prompt(
+async def unbookmark_prompt(
     prompt_id: UUID,
     current_user = Depends(get_current_user)
 ):
     """
     Remove bookmark.
     """
-    supabase = get_supabase()
-    user_id = current_user["id"]
-    
-    supabase.table("bookmarks").delete().eq("user_id", user_id).eq("prompt_id", str(prompt_id)).execute()
+    await counters.set_bookmark(current_user["id"], prompt_id, bookmarked=False)
     return None
 
 
-@router.get("/category/{category_id}", response_model=List[PromptResponse])
-def get_prompts_by_category(
+@router.get("/category/{category_id}", response_model=PROMPT_LIST_MODEL, responses=PROMPT_LIST_RESPONSES)
+async def get_prompts_by_category(
     category_id: UUID,
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, gt=0, le=100),
-    sort: SortOrder = Query(SortOrder.new, description="Sort order: new, most_liked, most_viewed, most_bookmarked"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    view: PromptView = Query(PromptView.FULL, description=VIEW_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    sort: SortOrder = Query(SortOrder.new, description="Sort order: new, most_liked, most_viewed, most_bookmarked, top_rated"),
     status: Optional[str] = Query(None, description="Filter by status (draft, published, archived)"),
 ):
     """
@@ -474,40 +595,48 @@ def get_prompts_by_category(
     - **most_liked** – highest average rating first
     - **most_viewed** – most views first
     - **most_bookmarked** – most bookmarks first
+    - **top_rated** – best Bayesian average rating first
     """
-    supabase = get_supabase()
-
-    # Verify the category exists
-    cat_res = supabase.table("categories").select("id").eq("id", str(category_id)).execute()
-    if not cat_res.data:
-        raise HTTPException(status_code=404, detail="Category not found")
-
-    query = supabase.table("prompts").select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))").eq("category_id", str(category_id))
+    supabase = await get_async_supabase()
+    projection = prompt_projection(view, fields, required=("id", SORT_COLUMNS[sort]))
+    query = supabase.table("prompts").select(projection.select).eq("category_id", str(category_id))
 
 
     if status:
         query = query.eq("status", status)
 
-    if sort == SortOrder.most_liked:
-        query = query.order("like_count", desc=True)
-    elif sort == SortOrder.most_viewed:
-        query = query.order("view_count", desc=True)
-    elif sort == SortOrder.most_bookmarked:
-        query = query.order("bookmark_count", desc=True)
-    else:
-        query = query.order("created_at", desc=True)
+    query = paginate(query, SORT_COLUMNS[sort], skip, limit, cursor)
+
+    async def load():
+        # Verify the category exists (only on a cache miss; deleting a category evicts its listings)
+        cat_res = await supabase.table("categories").select("id").eq("id", str(category_id)).execute()
+        if not cat_res.data:
+            raise HTTPException(status_code=404, detail="Category not found")
+        return await _fetch_rows(query)
+
+    cache_key = prompt_list_cache.key(
+        "by_category", view=projection.name, category_id=category_id, skip=skip, cursor=cursor, limit=limit, sort=sort, status=status,
+    )
+    entry = await prompt_list_cache.get_or_load_entry(cache_key, load, [category_tag(category_id)])
+    set_next_cursor(request, response, entry["value"], SORT_COLUMNS[sort], limit)
+    return projection.respond(response, cached_response(request, response, entry))
 
-    query = query.range(skip, skip + limit - 1)
-    response = query.execute()
-    return response.data
 
+# Alias of the prompt_tags join used only to filter by tag
+TAG_FILTER = "tag_filter"
 
-@router.get("/tag/{tag}", response_model=List[PromptResponse])
-def get_prompts_by_tag(
+
+@router.get("/tag/{tag}", response_model=PROMPT_LIST_MODEL, responses=PROMPT_LIST_RESPONSES)
+async def get_prompts_by_tag(
     tag: str,
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, gt=0, le=100),
-    sort: SortOrder = Query(SortOrder.new, description="Sort order: new, most_liked, most_viewed, most_bookmarked"),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    view: PromptView = Query(PromptView.FULL, description=VIEW_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    sort: SortOrder = Query(SortOrder.new, description="Sort order: new, most_liked, most_viewed, most_bookmarked, top_rated"),
     status: Optional[str] = Query(None, description="Filter by status (draft, published, archived)"),
 ):
     """
@@ -518,89 +647,41 @@ def get_prompts_by_tag(
 
     Supports the same `sort` options as the main prompts list.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
+    projection = prompt_projection(view, fields, required=("id", SORT_COLUMNS[sort]))
 
-    # Resolve tag — try slug first, then name
-    tag_res = supabase.table("tags").select("id, slug, name").eq("slug", tag).execute()
-    if not tag_res.data:
-        tag_res = supabase.table("tags").select("id, slug, name").ilike("name", tag).execute()
-    if not tag_res.data:
+    # Resolve tag — try slug first, then name (cached in-process)
+    tag_id = await tag_cache.lookup(tag)
+    if tag_id is None:
         raise HTTPException(status_code=404, detail=f"Tag '{tag}' not found")
 
-    tag_id = tag_res.data[0]["id"]
-
-    # Fetch prompt IDs linked to this tag via the prompt_tags join table
-    pt_res = supabase.table("prompt_tags").select("prompt_id").eq("tag_id", tag_id).execute()
-    if not pt_res.data:
-        return []
-
-    prompt_ids = [row["prompt_id"] for row in pt_res.data]
-
-    query = supabase.table("prompts").select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))").in_("id", prompt_ids)
-
-
-    if status:
-        query = query.eq("status", status)
-
-    if sort == SortOrder.most_liked:
-        query = query.order("like_count", desc=True)
-    elif sort == SortOrder.most_viewed:
-        query = query.order("view_count", desc=True)
-    elif sort == SortOrder.most_bookmarked:
-        query = query.order("bookmark_count", desc=True)
-    else:
-        query = query.order("created_at", desc=True)
-
-    query = query.range(skip, skip + limit - 1)
-    response = query.execute()
-    return response.data
-
-
-@router.get("/trending", response_model=List[PromptResponse])
-def get_trending_prompts(
-    limit: int = Query(20, gt=0, le=100),
-):
-    """
-    Get currently trending prompts.
-
-    Returns prompts from the pre-calculated `trending_prompts` table, ordered
-    by rank (ascending). The trending score is computed based on views,
-    ratings, and bookmarks in the last 24 hours.
-    """
-    supabase = get_supabase()
-
-    # Fetch active trending records ordered by rank
-    trending_res = (
-        supabase.table("trending_prompts")
-        .select("prompt_id, rank")
-        .order("rank", desc=False)
-        .limit(limit)
-        .execute()
-    )
-
-    if not trending_res.data:
-        return []
-
-    prompt_ids = [row["prompt_id"] for row in trending_res.data]
-
-    # Fetch the full prompt details for those IDs
-    prompts_res = (
-        supabase.table("prompts")
-        .select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))")
+    async def load():
+        # Filter through an inner join on prompt_tags (aliased, so the embedded
+        # `prompt_tags` still lists every tag of the prompt): one query paged in the
+        # database, whatever the number of prompts carrying the tag
+        query = (
+            supabase.table("prompts")
+            .select(f"{projection.select}, {TAG_FILTER}:prompt_tags!inner(tag_id)")
+            .eq(f"{TAG_FILTER}.tag_id", tag_id)
+        )
 
-        .in_("id", prompt_ids)
-        .execute()
-    )
+        if status:
+            query = query.eq("status", status)
 
-    # Re-order results to match the rank order from trending_prompts
-    prompts_by_id = {p["id"]: p for p in prompts_res.data}
-    ordered = [prompts_by_id[pid] for pid in prompt_ids if pid in prompts_by_id]
+        query = paginate(query, SORT_COLUMNS[sort], skip, limit, cursor)
+        rows = await _fetch_rows(query)
+        for row in rows:
+            row.pop(TAG_FILTER, None)
+        return rows
 
-    return ordered
+    cache_key = prompt_list_cache.key("by_tag", view=projection.name, tag_id=tag_id, skip=skip, cursor=cursor, limit=limit, sort=sort, status=status)
+    entry = await prompt_list_cache.get_or_load_entry(cache_key, load, [tag_tag(tag_id)])
+    set_next_cursor(request, response, entry["value"], SORT_COLUMNS[sort], limit)
+    return projection.respond(response, cached_response(request, response, entry))
 
 
 @router.get("/recommendations/prompts", response_model=List[PromptResponse])
-def get_recommended_prompts(
+async def get_recommended_prompts(
     limit: int = Query(10, gt=0, le=50),
     current_user = Depends(get_current_user)
 ):
@@ -608,27 +689,27 @@ def get_recommended_prompts(
     Get recommended prompts for the current user.
     Prioritizes prompts from followed users, then popular prompts in categories the user has previously engaged with.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     user_id = current_user["id"]
     
     recommended = []
 
     # 1. Identify prompts already interacted with to exclude them
-    interacted_res = supabase.table("prompt_ratings").select("prompt_id").eq("user_id", user_id).execute()
+    interacted_res = await supabase.table("prompt_ratings").select("prompt_id").eq("user_id", user_id).execute()
     excluded_ids = {i["prompt_id"] for i in interacted_res.data}
 
-    bookmark_ids = supabase.table("bookmarks").select("prompt_id").eq("user_id", user_id).execute()
+    bookmark_ids = await supabase.table("bookmarks").select("prompt_id").eq("user_id", user_id).execute()
     excluded_ids.update({b["prompt_id"] for b in bookmark_ids.data})
     
     # 2. Add prompts from followed users
-    follows_res = supabase.table("follows").select("following_id").eq("follower_id", user_id).execute()
+    follows_res = await supabase.table("follows").select("following_id").eq("follower_id", user_id).execute()
     following_ids = [f["following_id"] for f in follows_res.data]
     
     if following_ids:
         # Get recent/top prompts from followed users
-        followed_prompts_res = (
+        followed_prompts_res = await (
             supabase.table("prompts")
-            .select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))")
+            .select(PROMPT_SELECT)
             .eq("status", "published")
             .in_("user_id", following_ids)
             .order("created_at", desc=True)
@@ -645,8 +726,8 @@ def get_recommended_prompts(
                     return recommended
 
     # 3. If limit not reached, identify categories of interest from ratings and bookmarks
-    rated = supabase.table("prompt_ratings").select("prompts(category_id)").eq("user_id", user_id).gte("rating", 4).execute()
-    bookmarked = supabase.table("bookmarks").select("prompts(category_id)").eq("user_id", user_id).execute()
+    rated = await supabase.table("prompt_ratings").select("prompts(category_id)").eq("user_id", user_id).gte("rating", 4).execute()
+    bookmarked = await supabase.table("bookmarks").select("prompts(category_id)").eq("user_id", user_id).execute()
 
     category_ids = {r["prompts"]["category_id"] for r in rated.data if r.get("prompts")}
     category_ids.update({b["prompts"]["category_id"] for b in bookmarked.data if b.get("prompts")})
@@ -654,16 +735,16 @@ def get_recommended_prompts(
     if category_ids:
         query = (
             supabase.table("prompts")
-            .select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))")
+            .select(PROMPT_SELECT)
             .eq("status", "published")
             .neq("user_id", user_id)
             .in_("category_id", list(category_ids))
-            .order("average_rating", desc=True)
+            .order("bayesian_rating", desc=True)
             .order("view_count", desc=True)
             .limit(limit)
         )
         
-        category_prompts_res = query.execute()
+        category_prompts_res = await query.execute()
         
         for p in category_prompts_res.data:
             if p["id"] not in excluded_ids:
@@ -676,14 +757,14 @@ def get_recommended_prompts(
     # 4. Fallback: fill with globally popular prompts
     fallback_query = (
         supabase.table("prompts")
-        .select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))")
+        .select(PROMPT_SELECT)
         .eq("status", "published")
         .neq("user_id", user_id)
-        .order("average_rating", desc=True)
+        .order("bayesian_rating", desc=True)
         .limit(limit * 2)
     )
 
-    fallback_res = fallback_query.execute()
+    fallback_res = await fallback_query.execute()
     for p in fallback_res.data:
         if p["id"] not in excluded_ids:
             recommended.append(p)
@@ -1,35 +1,51 @@
 from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from datetime import datetime
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserRole, UserExistsResponse, UserCreateRequest, UserProfileDetails, UserFollowResponse
-from app.schemas.prompt import PromptResponse
+from app.schemas.prompt import PromptView
 from app.core.security import get_current_user, get_current_admin, get_current_auth_user, get_current_user_optional
+from app.core.pagination import paginate, set_next_cursor
+from app.core.projection import PROMPT_LIST_MODEL, PROMPT_LIST_RESPONSES, prompt_projection
 
-from app.db.supabase import get_supabase
+from app.db.supabase import get_async_supabase
+from app.services.counters import counters
+from app.services.profile_cache import profile_cache
 
 router = APIRouter()
 
+# Columns of a UserResponse. The cached `current_user` only carries PROFILE_FIELDS, so
+# endpoints returning the caller's full profile read it here.
+USER_RESPONSE_FIELDS = ", ".join(UserResponse.model_fields)
+
+
+async def _read_own_profile(user_id: str) -> dict:
+    supabase = await get_async_supabase()
+    response = await supabase.table("users").select(USER_RESPONSE_FIELDS).eq("id", user_id).execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="User profile not found")
+    return response.data[0]
+
 @router.get("/check-exists", response_model=UserExistsResponse)
-def check_user_exists(
+async def check_user_exists(
     current_auth_user = Depends(get_current_auth_user)
 ):
     """
     Check if the authenticated user has a profile in the users table.
     Requires a valid JWT token.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     user_id = current_auth_user.id
     
     # Check ID
-    response = supabase.table("users").select("id").eq("id", user_id).execute()
+    response = await supabase.table("users").select("id").eq("id", user_id).execute()
     if response.data:
         return UserExistsResponse(exists=True, conflict_field="id")
             
     return UserExistsResponse(exists=False)
 
 @router.post("/", response_model=UserResponse)
-def create_user(
+async def create_user(
     user_in: UserCreateRequest,
     current_auth_user = Depends(get_current_auth_user)
 ):
@@ -39,7 +55,7 @@ def create_user(
     Requires a valid JWT token. 
     User ID and Email are extracted from the token.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     
     # Extract ID and Email from the verified token
     user_id = current_auth_user.id
@@ -50,12 +66,12 @@ def create_user(
     
     # Check if user already exists
     # We check by ID primarily as it's the specific record key
-    existing_id = supabase.table("users").select("id").eq("id", user_id).execute()
+    existing_id = await supabase.table("users").select("id").eq("id", user_id).execute()
     if existing_id.data:
          raise HTTPException(status_code=400, detail="User profile already exists")
     
     # Check username uniqueness (since username is set by user)
-    existing_username = supabase.table("users").select("id").eq("username", user_in.username).execute()
+    existing_username = await supabase.table("users").select("id").eq("username", user_in.username).execute()
     if existing_username.data:
          raise HTTPException(status_code=400, detail="User with this username already exists")
          
@@ -67,7 +83,7 @@ def create_user(
     user_data["created_at"] = datetime.utcnow().isoformat()
     user_data["updated_at"] = datetime.utcnow().isoformat()
     
-    response = supabase.table("users").insert(user_data).execute()
+    response = await supabase.table("users").insert(user_data).execute()
     
     if not response.data:
         raise HTTPException(status_code=400, detail="Could not create user")
@@ -75,31 +91,32 @@ def create_user(
     return response.data[0]
 
 @router.get("/me", response_model=UserResponse)
-def read_user_me(
+async def read_user_me(
     current_user = Depends(get_current_user)
 ):
     """
     Get current user profile.
     """
-    return current_user
+    return await _read_own_profile(current_user["id"])
 
 @router.put("/me", response_model=UserResponse)
-def update_user_me(
+async def update_user_me(
     user_in: UserUpdate,
     current_user = Depends(get_current_user)
 ):
     """
     Update current user profile.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     user_id = current_user["id"]
     
     update_data = user_in.model_dump(mode='json', exclude_unset=True)
     
     if not update_data:
-        return current_user
+        return await _read_own_profile(user_id)
         
-    response = supabase.table("users").update(update_data).eq("id", user_id).execute()
+    response = await supabase.table("users").update(update_data).eq("id", user_id).execute()
+    await profile_cache.invalidate(user_id)
     
     if not response.data:
         raise HTTPException(status_code=400, detail="Could not update profile")
@@ -107,7 +124,7 @@ def update_user_me(
     return response.data[0]
 
 @router.get("/", response_model=List[UserResponse])
-def read_users(
+async def read_users(
     skip: int = 0,
     limit: int = 100,
     current_user = Depends(get_current_admin) # Admin only
@@ -115,21 +132,21 @@ def read_users(
     """
     Retrieve users. Admin only.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     query = supabase.table("users").select("*").range(skip, skip + limit - 1)
-    response = query.execute()
+    response = await query.execute()
     return response.data
 
 @router.get("/{user_id}", response_model=UserResponse)
-def read_user_by_id(
+async def read_user_by_id(
     user_id: UUID,
     current_user = Depends(get_current_user) # Any auth user can view public profiles?
 ):
     """
     Get a specific user by ID.
     """
-    supabase = get_supabase()
-    response = supabase.table("users").select("*").eq("id", str(user_id)).execute()
+    supabase = await get_async_supabase()
+    response = await supabase.table("users").select("*").eq("id", str(user_id)).execute()
     
     if not response.data:
         raise HTTPException(status_code=404, detail="User not found")
@@ -139,7 +156,7 @@ def read_user_by_id(
     return user
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user_by_id(
+async def update_user_by_id(
     user_id: UUID,
     user_in: UserUpdate, # Note: Normal update schema. Role update might need separate schema or param.
     role: Optional[UserRole] = None, # Allow admin to update role via query param or switch to a specific schema
@@ -148,10 +165,10 @@ def update_user_by_id(
     """
     Update a user. Admin only. Can update role.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     
     # Check if user exists
-    existing = supabase.table("users").select("*").eq("id", str(user_id)).execute()
+    existing = await supabase.table("users").select("*").eq("id", str(user_id)).execute()
     if not existing.data:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -163,7 +180,8 @@ def update_user_by_id(
     if not update_data:
         return existing.data[0]
         
-    response = supabase.table("users").update(update_data).eq("id", str(user_id)).execute()
+    response = await supabase.table("users").update(update_data).eq("id", str(user_id)).execute()
+    await profile_cache.invalidate(user_id)
     
     if not response.data:
          raise HTTPException(status_code=400, detail="Could not update user")
@@ -172,7 +190,7 @@ def update_user_by_id(
 
 
 @router.get("/recommendations/prompters", response_model=List[UserResponse])
-def get_recommended_prompters(
+async def get_recommended_prompters(
     limit: int = Query(5, gt=0, le=20),
     current_user = Depends(get_current_user)
 ):
@@ -180,20 +198,20 @@ def get_recommended_prompters(
     Get recommended prompters (creators) based on current user's engagements.
     Identifies users whose prompts the current user has rated highly, bookmarked, or commented on.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     user_id = current_user["id"]
 
     # 1. Get creator IDs from ratings
     # We join with prompts to get user_id of the creator
-    ratings = supabase.table("prompt_ratings").select("prompts(user_id)").eq("user_id", user_id).gte("rating", 4).execute()
+    ratings = await supabase.table("prompt_ratings").select("prompts(user_id)").eq("user_id", user_id).gte("rating", 4).execute()
     creator_ids = [r["prompts"]["user_id"] for r in ratings.data if r.get("prompts")]
 
     # 2. Get creator IDs from bookmarks
-    bookmarks = supabase.table("bookmarks").select("prompts(user_id)").eq("user_id", user_id).execute()
+    bookmarks = await supabase.table("bookmarks").select("prompts(user_id)").eq("user_id", user_id).execute()
     creator_ids.extend([b["prompts"]["user_id"] for b in bookmarks.data if b.get("prompts")])
 
     # 3. Get creator IDs from comments
-    comments = supabase.table("comments").select("prompts(user_id)").eq("user_id", user_id).execute()
+    comments = await supabase.table("comments").select("prompts(user_id)").eq("user_id", user_id).execute()
     creator_ids.extend([c["prompts"]["user_id"] for c in comments.data if c.get("prompts")])
 
     # Filter out current user and count frequencies
@@ -204,27 +222,27 @@ def get_recommended_prompters(
 
     if not top_creator_ids:
         # Fallback: Just return some active public users (excluding me)
-        response = supabase.table("users").select("*").neq("id", user_id).limit(limit).execute()
+        response = await supabase.table("users").select("*").neq("id", user_id).limit(limit).execute()
         return response.data
 
     # Fetch full user details for the top creators
-    response = supabase.table("users").select("*").in_("id", top_creator_ids).execute()
+    response = await supabase.table("users").select("*").in_("id", top_creator_ids).execute()
     return response.data
 
 
 @router.post("/profile/{target_username}/follow", response_model=UserFollowResponse)
-def follow_user(
+async def follow_user(
     target_username: str,
     current_user = Depends(get_current_user)
 ):
     """
     Follow a user by username.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     follower_id = current_user["id"]
     
     # Get target user ID from username
-    target_res = supabase.table("users").select("id, total_followers").eq("username", target_username).execute()
+    target_res = await supabase.table("users").select("id").eq("username", target_username).execute()
     if not target_res.data:
         raise HTTPException(status_code=404, detail="User not found")
         
@@ -233,81 +251,56 @@ def follow_user(
     if follower_id == following_id:
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
         
-    # Check if already following
-    existing = supabase.table("follows").select("*").eq("follower_id", str(follower_id)).eq("following_id", str(following_id)).execute()
-    if existing.data:
-        # Already followed
-        return {"has_followed": True, "follower_count": target_res.data[0].get("total_followers") or 0}
-        
-    # Insert follow
+    # Idempotent: following twice counts once
     try:
-        supabase.table("follows").insert({
-            "follower_id": str(follower_id),
-            "following_id": str(following_id)
-        }).execute()
-        
-        # Increment total_followers for target
-        new_count = (target_res.data[0].get("total_followers") or 0) + 1
-        supabase.table("users").update({"total_followers": new_count}).eq("id", str(following_id)).execute()
-        
-        # Increment total_following for current user
-        current_res = supabase.table("users").select("total_following").eq("id", str(follower_id)).execute()
-        if current_res.data:
-            new_following = (current_res.data[0].get("total_following") or 0) + 1
-            supabase.table("users").update({"total_following": new_following}).eq("id", str(follower_id)).execute()
-            
-        return {"has_followed": True, "follower_count": new_count}
+        follower_count = await counters.set_follow(follower_id, following_id, following=True)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if follower_count is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    await profile_cache.invalidate(follower_id)
+    await profile_cache.invalidate(following_id)
+    return {"has_followed": True, "follower_count": follower_count}
 
 @router.delete("/profile/{target_username}/follow", response_model=UserFollowResponse)
-def unfollow_user(
+async def unfollow_user(
     target_username: str,
     current_user = Depends(get_current_user)
 ):
     """
     Unfollow a user by username.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
     follower_id = current_user["id"]
     
-    target_res = supabase.table("users").select("id, total_followers").eq("username", target_username).execute()
+    target_res = await supabase.table("users").select("id").eq("username", target_username).execute()
     if not target_res.data:
         raise HTTPException(status_code=404, detail="User not found")
         
     following_id = target_res.data[0]["id"]
     
-    existing = supabase.table("follows").select("*").eq("follower_id", str(follower_id)).eq("following_id", str(following_id)).execute()
-    if not existing.data:
-        return {"has_followed": False, "follower_count": target_res.data[0].get("total_followers") or 0}
-        
     try:
-        supabase.table("follows").delete().eq("follower_id", str(follower_id)).eq("following_id", str(following_id)).execute()
-        
-        # Decrement total_followers for target
-        new_count = max(0, (target_res.data[0].get("total_followers") or 0) - 1)
-        supabase.table("users").update({"total_followers": new_count}).eq("id", str(following_id)).execute()
-        
-        # Decrement total_following for current user
-        current_res = supabase.table("users").select("total_following").eq("id", str(follower_id)).execute()
-        if current_res.data:
-            new_following = max(0, (current_res.data[0].get("total_following") or 0) - 1)
-            supabase.table("users").update({"total_following": new_following}).eq("id", str(follower_id)).execute()
-            
-        return {"has_followed": False, "follower_count": new_count}
+        follower_count = await counters.set_follow(follower_id, following_id, following=False)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if follower_count is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    await profile_cache.invalidate(follower_id)
+    await profile_cache.invalidate(following_id)
+    return {"has_followed": False, "follower_count": follower_count}
 
 @router.get("/profile/{username}", response_model=UserProfileDetails)
-def get_user_profile(
+async def get_user_profile(
     username: str,
     current_user = Depends(get_current_user_optional)
 ):
     """
     Get a user's public profile by username, including follow status.
     """
-    supabase = get_supabase()
-    response = supabase.table("users").select("*").eq("username", username).execute()
+    supabase = await get_async_supabase()
+    response = await supabase.table("users").select("*").eq("username", username).execute()
     
     if not response.data:
         raise HTTPException(status_code=404, detail="User not found")
@@ -319,26 +312,32 @@ def get_user_profile(
         follower_id = current_user["id"]
         following_id = user["id"]
         if str(follower_id) != str(following_id):
-            follow_check = supabase.table("follows").select("id").eq("follower_id", str(follower_id)).eq("following_id", str(following_id)).execute()
+            follow_check = await supabase.table("follows").select("id").eq("follower_id", str(follower_id)).eq("following_id", str(following_id)).execute()
             if follow_check.data:
                 is_following = True
                 
     user["is_following"] = is_following
     return user
 
-@router.get("/profile/{username}/prompts", response_model=List[PromptResponse])
-def get_user_prompts(
+@router.get("/profile/{username}/prompts", response_model=PROMPT_LIST_MODEL, responses=PROMPT_LIST_RESPONSES)
+async def get_user_prompts(
     username: str,
+    request: Request,
+    response: Response,
     skip: int = 0,
-    limit: int = 20
+    limit: int = 20,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor; replaces skip"),
+    view: PromptView = Query(PromptView.FULL, description="full (default) or card"),
+    fields: Optional[str] = Query(None, description="Comma-separated PromptResponse fields to return; overrides view"),
 ):
     """
     Get a list of published prompts created by this user.
     """
-    supabase = get_supabase()
+    supabase = await get_async_supabase()
+    projection = prompt_projection(view, fields, required=("id", "created_at"))
     
     # 1. Resolve username to user_id
-    user_res = supabase.table("users").select("id").eq("username", username).execute()
+    user_res = await supabase.table("users").select("id").eq("username", username).execute()
     if not user_res.data:
         raise HTTPException(status_code=404, detail="User not found")
         
@@ -347,12 +346,12 @@ def get_user_prompts(
     # 2. Fetch published prompts by user_id
     query = (
         supabase.table("prompts")
-        .select("*, prompt_outputs(*), author:users(*), prompt_tags(tags(id, name, slug))")
+        .select(projection.select)
         .eq("user_id", str(target_user_id))
         .eq("status", "published")
-        .order("created_at", desc=True)
-        .range(skip, skip + limit - 1)
     )
-    
-    response = query.execute()
-    return response.data
+    query = paginate(query, "created_at", skip, limit, cursor)
+
+    rows = (await query.execute()).data
+    set_next_cursor(request, response, rows, "created_at", limit)
+    return projection.respond(response, rows)
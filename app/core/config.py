@@ -23,8 +23,94 @@ class Settings(BaseSettings):
     SUPABASE_JWT_SECRET: Optional[str] = None
     SUPABASE_STORAGE_BUCKET: str = "dev"
 
+    # HTTP connection pool shared by the async Supabase client
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = 100
+    SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    SUPABASE_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    SUPABASE_HTTP_CONNECT_TIMEOUT: float = 5.0
+    SUPABASE_HTTP_READ_TIMEOUT: float = 30.0
+    SUPABASE_HTTP_POOL_TIMEOUT: float = 10.0
+    SUPABASE_HTTP2: bool = True
+
+    # JWT verification
+    # "local" verifies tokens in-process, "remote" asks Supabase Auth on every
+    # request, "auto" picks local whenever a JWT secret or JWKS URL is configured.
+    AUTH_VERIFICATION_MODE: str = "auto"
+    AUTH_REMOTE_FALLBACK: bool = False
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    SUPABASE_JWT_ISSUER: Optional[str] = None  # Defaults to {SUPABASE_URL}/auth/v1
+    AUTH_CLAIMS_CACHE_SIZE: int = 10000
+    # Asymmetric (RS256/ES256) tokens: http(s) URL, file:// URL or path of a JWKS document
+    SUPABASE_JWKS_URL: Optional[str] = None
+    JWKS_CACHE_TTL_SECONDS: int = 600
+    JWKS_MIN_REFETCH_INTERVAL_SECONDS: int = 30
+
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    CACHE_SERIALIZER: str = "orjson"  # orjson, msgpack or json
+    # Stale-while-revalidate: lock held by the worker refreshing an entry
+    CACHE_LOCK_TIMEOUT_SECONDS: int = 10
+    # Probabilistic early refresh for hot keys (0 disables)
+    CACHE_EARLY_REFRESH_BETA: float = 1.0
+    # Pub/sub channel used to drop in-process (L1) cache entries on every worker
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+
+    # User profile cache (auth dependencies)
+    PROFILE_CACHE_TTL_SECONDS: int = 300
+    PROFILE_CACHE_LOCAL_TTL_SECONDS: int = 30
+    PROFILE_CACHE_MAX_ENTRIES: int = 10000
+    PROFILE_CACHE_LOCAL_MAX_BYTES: int = 8 * 1024 * 1024
+
+    # Prompt listing cache (read_prompts, search, by category / tag)
+    PROMPT_LIST_CACHE_TTL_SECONDS: int = 300
+    PROMPT_LIST_CACHE_LOCAL_TTL_SECONDS: int = 30
+    PROMPT_LIST_CACHE_LOCAL_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Hot keys served stale-while-revalidate (trending prompts, category list)
+    TRENDING_CACHE_TTL_SECONDS: int = 60
+    TRENDING_CACHE_STALE_SECONDS: int = 600
+    CATEGORY_CACHE_TTL_SECONDS: int = 300
+    CATEGORY_CACHE_STALE_SECONDS: int = 3600
+    HOT_CACHE_LOCAL_TTL_SECONDS: int = 10
+
+    # Tag slug -> id map (in-process; tag renames / deletes are broadcast on the cache bus)
+    TAG_CACHE_TTL_SECONDS: int = 3600
+    TAG_CACHE_MAX_ENTRIES: int = 50000
+    TAG_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+
+    # HTTP caching (Cache-Control max-age for public reads; CDN / browser)
+    HTTP_CACHE_PROMPT_MAX_AGE: int = 15
+    HTTP_CACHE_LIST_MAX_AGE: int = 30
+
+    # Prompt view ingestion (write-behind, flushed in batches)
+    VIEW_FLUSH_INTERVAL_SECONDS: float = 5.0
+    VIEW_FLUSH_BATCH_SIZE: int = 500
+    VIEW_BUFFER_MAX_ROWS: int = 20000
+    # Repeat views by the same viewer within this window are not recorded (0 disables)
+    VIEW_DEDUPE_WINDOW_SECONDS: int = 1800
+
+    # Idempotency-Key replay for write requests (stored responses, keyed per user)
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    # Lifetime of the in-progress marker, in case the owning worker dies mid-request
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    # How long a concurrent duplicate waits for the original before answering 409
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    # Larger request or response bodies are not fingerprinted / stored
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 256 * 1024
+
+    # Bulk prompt import (POST /admin/prompts/import)
+    PROMPT_IMPORT_BATCH_SIZE: int = 100
+    PROMPT_IMPORT_CONCURRENCY: int = 4
+    PROMPT_IMPORT_MAX_LINE_BYTES: int = 1024 * 1024
+
+    # In-memory tag index (GET /prompts/tags); full rebuilds also refresh sort counters
+    TAG_INDEX_REBUILD_SECONDS: int = 300
+    TAG_INDEX_SCAN_PAGE_SIZE: int = 5000
+
+    # Full-text search: how often pending term / corpus statistics are folded in
+    PROMPT_SEARCH_COMPACT_SECONDS: float = 30.0
 
     # Logging
     LOG_LEVEL: str = "INFO"
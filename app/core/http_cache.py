@@ -0,0 +1,116 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Union
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+# Cache-Control per route family. Public reads are safe for shared caches (CDN);
+# anything that is not public to everyone must stay private.
+CACHE_CONTROL_PROMPT = (
+    f"public, max-age={settings.HTTP_CACHE_PROMPT_MAX_AGE}, "
+    f"stale-while-revalidate={settings.HTTP_CACHE_PROMPT_MAX_AGE * 4}"
+)
+CACHE_CONTROL_LIST = (
+    f"public, max-age={settings.HTTP_CACHE_LIST_MAX_AGE}, "
+    f"stale-while-revalidate={settings.HTTP_CACHE_LIST_MAX_AGE * 4}"
+)
+CACHE_CONTROL_TRENDING = (
+    f"public, max-age={settings.TRENDING_CACHE_TTL_SECONDS}, "
+    f"stale-while-revalidate={settings.TRENDING_CACHE_STALE_SECONDS}"
+)
+CACHE_CONTROL_CATEGORIES = (
+    f"public, max-age={settings.CATEGORY_CACHE_TTL_SECONDS}, "
+    f"stale-while-revalidate={settings.CATEGORY_CACHE_STALE_SECONDS}"
+)
+CACHE_CONTROL_PRIVATE = "private, no-cache"
+
+
+def etag_from_parts(*parts) -> str:
+    """Weak validator from a resource's identity and `updated_at`."""
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_from_content(data: bytes) -> str:
+    """Validator from the serialised payload, for lists that have no single `updated_at`."""
+    return f'W/"{hashlib.sha1(data).hexdigest()[:20]}"'
+
+
+def _parse_timestamp(value: Union[str, datetime, None]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Union[str, datetime, None] = None) -> bool:
+    """
+    Evaluate If-None-Match (preferred) or If-Modified-Since against the current validators.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    modified = _parse_timestamp(last_modified)
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return modified <= since
+    return False
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: Union[str, datetime, None] = None,
+    cache_control: str = CACHE_CONTROL_LIST,
+) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    modified = _parse_timestamp(last_modified)
+    if modified is not None:
+        response.headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+
+
+def not_modified(
+    etag: str,
+    last_modified: Union[str, datetime, None] = None,
+    cache_control: str = CACHE_CONTROL_LIST,
+) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified, cache_control)
+    return response
+
+
+def cached_response(request: Request, response: Response, entry: dict, cache_control: str = CACHE_CONTROL_LIST):
+    """
+    Answer from a QueryCache entry: 304 if the client's copy is current, otherwise the
+    cached value with validators attached.
+    """
+    etag = entry["etag"]
+    if is_not_modified(request, etag):
+        return not_modified(etag, cache_control=cache_control)
+    set_validators(response, etag, cache_control=cache_control)
+    return entry["value"]
@@ -0,0 +1,266 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.security import verify_token
+from app.services.redis_cache import async_redis_service
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+REPLAY_HEADER = b"idempotent-replayed"
+
+
+class IdempotencyStore:
+    """
+    Redis record per `Idempotency-Key`, scoped to the calling user:
+
+        pending: {"fingerprint"}                         (SET NX, IDEMPOTENCY_LOCK_SECONDS)
+        done:    {"fingerprint", "status", "headers", "body"}   (IDEMPOTENCY_TTL_SECONDS)
+
+    The fingerprint is a hash of method, path, query and body, so a key reused for a
+    different request is rejected instead of replaying the wrong response. Only
+    responses below 500 are kept; after a server error the key is released and a
+    retry runs again.
+    """
+
+    def __init__(self, ttl: int, lock_seconds: int, wait_seconds: float, namespace: str = "idem"):
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self.wait_seconds = wait_seconds
+        self.namespace = namespace
+        # Requests owned by this worker, so local duplicates wake up as soon as they finish
+        self._local: Dict[str, asyncio.Event] = {}
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+        self.stored = 0
+        self.errors = 0
+
+    def key(self, user_id: str, idempotency_key: str) -> str:
+        return f"{self.namespace}:{user_id}:{idempotency_key}"
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[dict]:
+        """
+        Take the key for this request, or wait for whoever holds it. Returns None when
+        the caller now owns the key, otherwise the finished record of the original.
+        Raises `IdempotencyConflict` for a mismatched or still-running original.
+        """
+        deadline = asyncio.get_running_loop().time() + self.wait_seconds
+        interval = 0.05
+        waited = False
+        while True:
+            if await async_redis_service.client.set(
+                key, async_redis_service.serializer.dumps({"fingerprint": fingerprint}), nx=True, ex=self.lock_seconds
+            ):
+                self._local[key] = asyncio.Event()
+                return None
+
+            # None: released between SET NX and GET. Back off below, then try to take it again
+            record = await async_redis_service.get(key)
+            if record is not None:
+                if record["fingerprint"] != fingerprint:
+                    self.conflicts += 1
+                    raise IdempotencyConflict(422, "Idempotency-Key was already used with a different request")
+                if "status" in record:
+                    self.replayed += 1
+                    return record
+
+            if not waited:
+                waited = True
+                self.waited += 1
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                self.conflicts += 1
+                raise IdempotencyConflict(409, "A request with this Idempotency-Key is still in progress")
+            event = self._local.get(key)
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(interval, remaining))
+                interval = min(interval * 2, 0.5)
+
+    async def finish(self, key: str, fingerprint: str, status: int, headers: List[Tuple[bytes, bytes]], body: Optional[bytes]) -> None:
+        """Store the response of the owning request, or release the key if it is not replayable."""
+        try:
+            if body is None or status >= 500:
+                await async_redis_service.delete(key)
+            else:
+                record = {
+                    "fingerprint": fingerprint,
+                    "status": status,
+                    "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in headers],
+                    "body": base64.b64encode(body).decode(),
+                }
+                await async_redis_service.set(key, record, expire=self.ttl)
+                self.stored += 1
+        finally:
+            event = self._local.pop(key, None)
+            if event is not None:
+                event.set()
+
+    def stats(self) -> dict:
+        return {
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "conflicts": self.conflicts,
+            "stored": self.stored,
+            "errors": self.errors,
+            "in_flight": len(self._local),
+        }
+
+
+class IdempotencyConflict(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+idempotency_store = IdempotencyStore(
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+    lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS,
+    wait_seconds=settings.IDEMPOTENCY_WAIT_SECONDS,
+)
+
+
+async def _send_json(send: Send, status: int, payload: dict) -> None:
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """
+    Replays the stored response of a write request (POST/PUT/PATCH/DELETE) retried with
+    the same `Idempotency-Key` header, without running the endpoint again; concurrent
+    duplicates wait for the first one (up to IDEMPOTENCY_WAIT_SECONDS, then 409).
+
+    Keys are scoped to the user of the bearer token, so only authenticated requests
+    take part. Chunked requests and bodies above IDEMPOTENCY_MAX_BODY_BYTES (e.g. the
+    streaming bulk import) pass straight through, as does everything when Redis is
+    unavailable.
+    """
+
+    def __init__(self, app: ASGIApp, store: IdempotencyStore = idempotency_store, max_body_bytes: int = None):
+        self.app = app
+        self.store = store
+        self.max_body_bytes = max_body_bytes or settings.IDEMPOTENCY_MAX_BODY_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key", b"").decode("latin-1").strip()
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        content_length = headers.get(b"content-length", b"0")
+        if (
+            not idempotency_key
+            or len(idempotency_key) > 255
+            or not authorization.lower().startswith("bearer ")
+            or b"transfer-encoding" in headers
+            or not content_length.isdigit()
+            or int(content_length) > self.max_body_bytes
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            user = await verify_token(authorization[7:].strip())
+        except Exception:
+            await self.app(scope, receive, send)  # the endpoint answers 401 itself
+            return
+
+        # The body is small (bounded above): read it to fingerprint the request, then hand it on
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        fingerprint = hashlib.sha256(b"\n".join([
+            scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body,
+        ])).hexdigest()
+        key = self.store.key(user.id, idempotency_key)
+
+        try:
+            record = await self.store.claim(key, fingerprint)
+        except IdempotencyConflict as e:
+            await _send_json(send, e.status, {"detail": e.detail})
+            return
+        except Exception as e:
+            self.store.errors += 1
+            logger.warning(f"Idempotency store unavailable, running request without it: {e}")
+            record = key = None
+
+        if record is not None:
+            await send({
+                "type": "http.response.start",
+                "status": record["status"],
+                "headers": [(n.encode("latin-1"), v.encode("latin-1")) for n, v in record["headers"]]
+                + [(REPLAY_HEADER, b"true")],
+            })
+            await send({"type": "http.response.body", "body": base64.b64decode(record["body"])})
+            return
+
+        body_sent = False
+
+        async def replay_receive() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        if key is None:
+            await self.app(scope, replay_receive, send)
+            return
+
+        status = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        response_body: Optional[List[bytes]] = []
+        size = 0
+
+        async def capture_send(message: Message) -> None:
+            nonlocal status, response_headers, response_body, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body" and response_body is not None:
+                size += len(message.get("body", b""))
+                if size > self.max_body_bytes:
+                    response_body = None  # too large to keep: served once, not replayable
+                else:
+                    response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            try:
+                await self.store.finish(
+                    key, fingerprint, status, response_headers,
+                    b"".join(response_body) if response_body is not None else None,
+                )
+            except Exception as e:
+                self.store.errors += 1
+                logger.warning(f"Could not store idempotent response: {e}")
@@ -0,0 +1,117 @@
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+import jwt
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSCache:
+    """
+    In-memory cache of the signing keys published in a JWKS document.
+
+    Keys are refreshed by a background thread every `ttl` seconds. Lookups never
+    download anything: an unknown `kid` schedules a single-flight refetch (rate
+    limited by `min_refetch_interval`) and returns None for the current request.
+
+    `source` may be an http(s) URL, a `file://` URL or a plain path, the latter two
+    being handy as an offline stand-in for the Supabase JWKS endpoint.
+    """
+
+    def __init__(self, source: str, ttl: int = 600, min_refetch_interval: int = 30):
+        self.source = source
+        self.ttl = ttl
+        self.min_refetch_interval = min_refetch_interval
+
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._last_attempt = 0.0
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_document(self) -> dict:
+        parsed = urlparse(self.source)
+        if parsed.scheme in ("http", "https"):
+            response = httpx.get(self.source, timeout=5.0)
+            response.raise_for_status()
+            return response.json()
+
+        path = parsed.path if parsed.scheme == "file" else self.source
+        with open(path) as f:
+            return json.load(f)
+
+    def refresh(self) -> bool:
+        """
+        Fetch the JWKS document and atomically swap in the parsed keys.
+        Returns False if another refresh is already running or the fetch failed;
+        on failure the previously known keys are kept.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            self._last_attempt = time.monotonic()
+            document = self._load_document()
+
+            keys: Dict[str, jwt.PyJWK] = {}
+            for jwk in document.get("keys", []):
+                if jwk.get("use", "sig") != "sig" or not jwk.get("kid"):
+                    continue
+                try:
+                    keys[jwk["kid"]] = jwt.PyJWK(jwk)
+                except jwt.PyJWKError as e:
+                    logger.warning(f"Skipping unusable JWK {jwk.get('kid')}: {e}")
+
+            self._keys = keys
+            return True
+        except Exception as e:
+            logger.warning(f"JWKS refresh from {self.source} failed: {e}")
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def request_refresh(self) -> None:
+        """Schedule a background refetch unless one ran (or is running) too recently."""
+        if time.monotonic() - self._last_attempt < self.min_refetch_interval:
+            return
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(target=self.refresh, name="jwks-refetch", daemon=True).start()
+
+    def get_key(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        key = self._keys.get(kid) if kid else None
+        if key is None:
+            self.request_refresh()
+        return key
+
+    def _run(self) -> None:
+        while not self._stop.wait(timeout=self.ttl):
+            self.refresh()
+
+    def start(self) -> None:
+        """Load the keys once and start the periodic refresher."""
+        self.refresh()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="jwks-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+jwks_cache: Optional[JWKSCache] = (
+    JWKSCache(
+        settings.SUPABASE_JWKS_URL,
+        ttl=settings.JWKS_CACHE_TTL_SECONDS,
+        min_refetch_interval=settings.JWKS_MIN_REFETCH_INTERVAL_SECONDS,
+    )
+    if settings.SUPABASE_JWKS_URL
+    else None
+)
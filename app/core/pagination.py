@@ -0,0 +1,71 @@
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import HTTPException, Request, Response
+
+CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(column: str, row: dict) -> str:
+    """Opaque cursor pointing just past `row` in a listing ordered by (column desc, id desc)."""
+    payload = json.dumps({"c": column, "v": row.get(column), "id": row["id"]}, separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, column: str) -> Tuple[Any, str]:
+    """Return (sort value, id) of a cursor; 400 if it is malformed or from another sort order."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        value, last_id = payload["v"], str(payload["id"])
+        if payload["c"] != column:
+            raise ValueError("sort order changed")
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    return value, last_id
+
+
+def _quote(value: Any) -> str:
+    # Logic-tree values with reserved characters (timestamps: '.', ':', '+') must be quoted
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def paginate(query, column: str, skip: int, limit: int, cursor: Optional[str] = None):
+    """
+    Order a listing by `column` (descending, newest / highest first) with `id` as tie
+    breaker, and select one page of it.
+
+    With a `cursor` the page starts after the row it points to - `(column, id) < (v, id)`,
+    an index range scan on (column, id) however deep the client has scrolled, and stable
+    while new rows arrive at the top. Without one, `skip` is applied as an offset, as
+    before. Postgres sorts NULLs first in descending order, so they are handled as the
+    largest values.
+    """
+    query = query.order(column, desc=True).order("id", desc=True)
+    if not cursor:
+        return query.range(skip, skip + limit - 1)
+
+    value, last_id = decode_cursor(cursor, column)
+    if value is None:
+        query = query.or_(f"and({column}.is.null,id.lt.{last_id}),{column}.not.is.null")
+    else:
+        value = _quote(value)
+        query = query.or_(f"{column}.lt.{value},and({column}.eq.{value},id.lt.{last_id})")
+    return query.limit(limit)
+
+
+def set_next_cursor(request: Request, response: Response, rows: List[dict], column: str, limit: int) -> Optional[str]:
+    """
+    Advertise the next page of a full page of rows, as `X-Next-Cursor` and as an RFC 8288
+    `Link: <...>; rel="next"` carrying the same query with `cursor` in place of `skip`.
+    """
+    if len(rows) < limit:
+        return None
+    cursor = encode_cursor(column, rows[-1])
+    # multi_items keeps repeated parameters (e.g. /prompts/tags?all=a&all=b)
+    params = [(k, v) for k, v in request.query_params.multi_items() if k not in ("skip", "cursor")]
+    next_url = request.url.replace(query=urlencode(params + [("cursor", cursor)]))
+    response.headers[CURSOR_HEADER] = cursor
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return cursor
@@ -0,0 +1,101 @@
+from typing import Iterable, List, Optional, Type, Union
+
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.schemas.prompt import PromptCard, PromptResponse, PromptView
+from app.schemas.user import UserPublic
+
+# Embedded resources of a prompt, by response field. The author is limited to the
+# public profile columns (never email / password_hash).
+EMBEDS = {
+    "author": f"author:users({', '.join(UserPublic.model_fields)})",
+    "prompt_outputs": "prompt_outputs(*)",
+    "prompt_tags": "prompt_tags(tags(id, name, slug))",
+}
+
+# Response fields that are not columns (computed per request)
+COMPUTED = {"unique_views"}
+
+PROMPT_FIELDS = [name for name in PromptResponse.model_fields if name not in COMPUTED]
+
+# Select of a full PromptResponse
+PROMPT_SELECT = "*, " + ", ".join(EMBEDS.values())
+
+
+def select_for(fields: Iterable[str]) -> str:
+    """PostgREST select string for the given response fields, embeds included."""
+    columns, embeds = [], []
+    for name in fields:
+        if name in EMBEDS:
+            embeds.append(EMBEDS[name])
+        elif name not in COMPUTED and name not in columns:
+            columns.append(name)
+    return ", ".join(columns + embeds)
+
+
+class Projection:
+    """
+    The columns a prompt listing selects and how its rows are returned: validated as
+    `model` (full / card views), or passed through as-is for a sparse fieldset.
+    """
+
+    def __init__(self, name: str, select: str, model: Optional[Type[BaseModel]]):
+        self.name = name  # part of cache keys
+        self.select = select
+        self.model = model
+
+    @property
+    def is_full(self) -> bool:
+        return self.model is PromptResponse
+
+    def respond(self, response: Response, value: Union[list, Response]):
+        """
+        Return a listing in this projection. Full rows go back to FastAPI to validate
+        against the route's `PROMPT_LIST_MODEL`; other projections are answered directly,
+        carrying over the headers already set on `response`.
+        """
+        if self.is_full or isinstance(value, Response):
+            return value
+        if self.model is not None:
+            value = [self.model.model_validate(row).model_dump(mode="json") for row in value]
+        return JSONResponse(value, headers=dict(response.headers))
+
+
+FULL = Projection("full", PROMPT_SELECT, PromptResponse)
+CARD = Projection("card", select_for(PromptCard.model_fields), PromptCard)
+
+# Route declarations for listings that take `?view=` / `?fields=`, so the card and sparse
+# shapes answered by `Projection.respond` are part of the OpenAPI schema
+PROMPT_LIST_MODEL = Union[List[PromptResponse], List[PromptCard]]
+PROMPT_LIST_RESPONSES = {
+    200: {
+        "description": "PromptResponse items; PromptCard items with `view=card`; "
+                       "with `fields=`, PromptResponse items holding only the requested fields (and id)",
+    },
+}
+
+
+def prompt_projection(view: PromptView = PromptView.FULL, fields: Optional[str] = None, required: Iterable[str] = ("id",)) -> Projection:
+    """
+    Resolve `?view=` / `?fields=` for a prompt listing. `fields` is a comma-separated
+    list of PromptResponse fields (embeds by name: author, prompt_outputs, prompt_tags)
+    and wins over `view`; `required` columns (id, the sort column) are always selected.
+    """
+    if not fields:
+        return CARD if view == PromptView.CARD else FULL
+
+    requested: List[str] = []
+    for name in (f.strip() for f in fields.split(",")):
+        if not name:
+            continue
+        if name not in PROMPT_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{name}'")
+        if name not in requested:
+            requested.append(name)
+    if not requested:
+        return FULL
+
+    selected = list(required) + [name for name in requested if name not in required]
+    return Projection("fields:" + ",".join(sorted(selected)), select_for(selected), None)
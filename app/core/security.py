@@ -1,80 +1,210 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.db.supabase import get_supabase
 
-from typing import Optional
+from app.core.config import settings
+from app.core.jwks import jwks_cache
+from app.db.supabase import get_async_supabase
+from app.services.profile_cache import PROFILE_FIELDS, profile_cache
+
+logger = logging.getLogger(__name__)
+
 security = HTTPBearer()
 security_optional = HTTPBearer(auto_error=False)
 
+
+class AuthUser:
+    """
+    Minimal stand-in for the Supabase Auth `User` object, built from verified JWT claims.
+    Exposes the attributes the endpoints rely on (`id`, `email`).
+    """
+
+    def __init__(self, claims: dict):
+        self.id = claims.get("sub")
+        self.email = claims.get("email")
+        self.role = claims.get("role")
+        self.claims = claims
+
+
+class ClaimsCache:
+    """
+    Bounded LRU of decoded token claims. Entries are dropped once the token's `exp` passes,
+    so a cached token is never accepted past its own expiry.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        expires_at = claims.get("exp")
+        if not expires_at:
+            return
+        with self._lock:
+            self._entries[token] = (claims, float(expires_at))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+claims_cache = ClaimsCache(settings.AUTH_CLAIMS_CACHE_SIZE)
+
+SYMMETRIC_ALGORITHMS = ("HS256",)
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+
+def _credentials_exception(detail: str = "Could not validate credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _use_local_verification() -> bool:
+    mode = settings.AUTH_VERIFICATION_MODE.lower()
+    if mode == "remote":
+        return False
+    if mode == "auto":
+        return bool(settings.SUPABASE_JWT_SECRET or jwks_cache)
+    return True
+
+
+def decode_token(token: str) -> dict:
+    """
+    Verify signature, expiry, audience and issuer of a Supabase access token in-process.
+    HS256 tokens are checked against SUPABASE_JWT_SECRET, RS256/ES256 tokens against the
+    cached JWKS keys. Raises `jwt.InvalidTokenError` (or a subclass) when the token is not acceptable.
+    """
+    cached = claims_cache.get(token)
+    if cached is not None:
+        return cached
+
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+
+    if algorithm in SYMMETRIC_ALGORITHMS:
+        if not settings.SUPABASE_JWT_SECRET:
+            raise jwt.InvalidTokenError("SUPABASE_JWT_SECRET is not configured")
+        key = settings.SUPABASE_JWT_SECRET
+    elif algorithm in ASYMMETRIC_ALGORITHMS:
+        if jwks_cache is None:
+            raise jwt.InvalidTokenError("SUPABASE_JWKS_URL is not configured")
+        jwk = jwks_cache.get_key(header.get("kid"))
+        if jwk is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key {header.get('kid')!r}")
+        if jwk.algorithm_name != algorithm:
+            raise jwt.InvalidAlgorithmError(f"Key {header.get('kid')!r} does not sign {algorithm}")
+        key = jwk.key
+    else:
+        raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm {algorithm!r}")
+
+    issuer = settings.SUPABASE_JWT_ISSUER or f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1"
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=settings.SUPABASE_JWT_AUDIENCE,
+        issuer=issuer,
+        options={"require": ["exp", "sub"]},
+    )
+    claims_cache.set(token, claims)
+    return claims
+
+
+async def _verify_remote(token: str):
+    supabase = await get_async_supabase()
+    auth_response = await supabase.auth.get_user(token)
+    if not auth_response or not auth_response.user:
+        raise _credentials_exception("Invalid authentication credentials")
+    return auth_response.user
+
+
+async def verify_token(token: str):
+    """
+    Resolve a bearer token to an auth user, either locally or through Supabase Auth
+    depending on `AUTH_VERIFICATION_MODE`. Raises 401 on any failure.
+    """
+    try:
+        if not _use_local_verification():
+            return await _verify_remote(token)
+
+        try:
+            return AuthUser(decode_token(token))
+        except jwt.ExpiredSignatureError:
+            raise _credentials_exception("Token has expired")
+        except jwt.InvalidTokenError as e:
+            if not settings.AUTH_REMOTE_FALLBACK:
+                raise
+            logger.info(f"Local token verification failed ({e}), falling back to Supabase Auth")
+            return await _verify_remote(token)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"Auth specific error: {e}")
+        raise _credentials_exception()
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
 
     """
-    Verifies the JWT token using Supabase's client (or you can do local validation).
-    For now, this is a placeholder that passes the token to Supabase to get the user.
+    Verifies the JWT token (locally or via Supabase Auth, see `verify_token`)
+    and returns the user's profile (PROFILE_FIELDS of public.users), served from the
+    profile cache when possible.
     """
-    token = credentials.credentials
-    supabase = get_supabase()
-    
+    auth_user = await verify_token(credentials.credentials)
+
+    profile = await profile_cache.get(auth_user.id)
+    if profile is not None:
+        return profile
+
+    supabase = await get_async_supabase()
+
     try:
-        auth_response = supabase.auth.get_user(token)
-        if not auth_response or not auth_response.user:
-             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        user_id = auth_response.user.id
-        
         # Fetch profile from public.users to get role and other details
-        # We use .single() because we expect one record
-        profile_response = supabase.table("users").select("*").eq("id", user_id).execute()
-        
-        if not profile_response.data:
-            # If user exists in Auth but not in public.users, this is an edge case.
-            # You might want to auto-create it or raise an error.
-            # For strictness, we'll raise 401/403 or just 404.
-             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User profile not found",
-            )
-            
-        return profile_response.data[0] # Return the dictionary from the DB
-        
+        profile_response = await supabase.table("users").select(PROFILE_FIELDS).eq("id", auth_user.id).execute()
     except Exception as e:
-        # Catch specific supabase errors if possible, or general exceptions
-        print(f"Auth specific error: {e}") # Simple logging
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        logger.warning(f"Auth specific error: {e}")
+        raise _credentials_exception()
+
+    if not profile_response.data:
+        # If user exists in Auth but not in public.users, this is an edge case.
+        raise _credentials_exception("User profile not found")
+
+    profile = profile_response.data[0] # Return the dictionary from the DB
+    await profile_cache.set(auth_user.id, profile)
+    return profile
 
 async def get_current_auth_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
-    Verifies the JWT token using Supabase's client and returns the Auth User object.
+    Verifies the JWT token and returns the Auth User object.
     Does NOT check the public.users table.
     """
-    token = credentials.credentials
-    supabase = get_supabase()
-    
-    try:
-        auth_response = supabase.auth.get_user(token)
-        if not auth_response or not auth_response.user:
-             raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return auth_response.user
-        
-    except Exception as e:
-        print(f"Auth specific error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    return await verify_token(credentials.credentials)
 
 def get_current_admin(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
@@ -92,5 +222,3 @@ async def get_current_user_optional(credentials: Optional[HTTPAuthorizationCrede
         return await get_current_user(credentials)
     except:
         return None
-
-
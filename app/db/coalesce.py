@@ -0,0 +1,62 @@
+import asyncio
+import hashlib
+import json
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent reads within one worker: while a call for `key`
+    is in flight, later callers await the same task instead of issuing their own
+    upstream request. Results are shared, so callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], label: str = "default") -> Any:
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._stats[label]["hits"] += 1
+        else:
+            self._stats[label]["misses"] += 1
+            # Run the upstream call as its own task so a cancelled leader doesn't fail the followers
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "by_label": {label: dict(counts) for label, counts in self._stats.items()},
+        }
+
+
+query_coalescer = SingleFlight()
+
+
+# Request headers that never change the response (client telemetry)
+IGNORED_HEADERS = {"x-client-info"}
+
+
+def query_key(query) -> str:
+    """
+    Identity of a PostgREST request: method, path, the full query string, the headers
+    that shape the response (Prefer / count, Range, Accept, Accept-Profile, and
+    Authorization, which selects the RLS role) and the body, if any.
+    """
+    request = query.request
+    headers = sorted(
+        (name.lower(), value) for name, value in request.headers.items() if name.lower() not in IGNORED_HEADERS
+    )
+    # Hashed, so tokens are not kept in plain text as dict keys
+    digest = hashlib.sha256(json.dumps([headers, request.json], sort_keys=True, default=str).encode()).hexdigest()
+    return f"{request.http_method} {request.path}?{request.params} {digest}"
+
+
+async def execute_coalesced(query, label: str = "default"):
+    """`await query.execute()`, sharing the response with identical concurrent queries."""
+    return await query_coalescer.do(query_key(query), query.execute, label=label)
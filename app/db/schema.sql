@@ -128,6 +128,7 @@ CREATE TABLE IF NOT EXISTS prompts (
     rating_count INT DEFAULT 0,
     rating_sum INT DEFAULT 0,
     average_rating DECIMAL(3,2) DEFAULT 0.00,
+    bayesian_rating DECIMAL(4,3) DEFAULT 3.000, -- see prompt_bayesian_rating()
     like_count INT DEFAULT 0,
     fork_count INT DEFAULT 0,
     comment_count INT DEFAULT 0,
@@ -146,6 +147,8 @@ CREATE TABLE IF NOT EXISTS prompts (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     deleted_at TIMESTAMP WITH TIME ZONE,
+    -- HTTP validator of GET /prompts/{id}, see touch_prompts()
+    content_updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (category_id) REFERENCES categories(id),
@@ -165,15 +168,84 @@ CREATE INDEX IF NOT EXISTS idx_prompts_avg_rating ON prompts(average_rating);
 CREATE INDEX IF NOT EXISTS idx_prompts_view_count ON prompts(view_count);
 CREATE INDEX IF NOT EXISTS idx_prompts_slug ON prompts(slug);
 
--- Fulltext Search Index (PostgreSQL GIN)
-CREATE INDEX IF NOT EXISTS idx_prompts_search ON prompts USING GIN (to_tsvector('english', title || ' ' || coalesce(description, '') || ' ' || prompt_text));
+-- Full-text search uses the BM25 index in prompt_search_postings (see search_prompts_ranked);
+-- the former GIN expression index was never used by a query and only slowed down writes
+DROP INDEX IF EXISTS idx_prompts_search;
+
+ALTER TABLE prompts ADD COLUMN IF NOT EXISTS content_updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+-- Function to update updated_at on prompts, ignoring engagement counters.
+-- updated_at records edits to the prompt itself, so a view or like must not bump it.
+-- content_updated_at (the ETag / Last-Modified of GET /prompts/{id}) moves with it, and
+-- also with the outputs, tags and author shown with the prompt (touch_prompts()).
+CREATE OR REPLACE FUNCTION update_prompts_updated_at_column()
+RETURNS TRIGGER AS $$
+DECLARE
+    counters TEXT[] := ARRAY['view_count', 'bookmark_count', 'rating_count', 'rating_sum', 'average_rating',
+                             'bayesian_rating', 'like_count', 'fork_count', 'comment_count', 'updated_at',
+                             'content_updated_at'];
+BEGIN
+    IF (to_jsonb(NEW) - counters) IS DISTINCT FROM (to_jsonb(OLD) - counters) THEN
+        NEW.updated_at = CURRENT_TIMESTAMP;
+        NEW.content_updated_at = CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
 
 -- Trigger for updated_at (Prompts)
 DROP TRIGGER IF EXISTS update_prompts_updated_at ON prompts;
 CREATE TRIGGER update_prompts_updated_at
     BEFORE UPDATE ON prompts
     FOR EACH ROW
-    EXECUTE FUNCTION update_updated_at_column();
+    EXECUTE FUNCTION update_prompts_updated_at_column();
+
+-- Bayesian average rating: the mean of the prompt's ratings blended with a prior of
+-- 5 ratings of 3.0, so a single 5-star rating does not outrank 200 ratings averaging 4.8.
+-- Stored in prompts.bayesian_rating (indexed) for sort=top_rated.
+CREATE OR REPLACE FUNCTION prompt_bayesian_rating(rating_sum INT, rating_count INT)
+RETURNS DECIMAL(4,3) AS $$
+    SELECT ROUND((5 * 3.0 + COALESCE(rating_sum, 0)) / (5 + COALESCE(rating_count, 0)), 3);
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Derive average_rating and bayesian_rating whenever rating_sum / rating_count change
+CREATE OR REPLACE FUNCTION update_prompt_rating_scores()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.average_rating = CASE WHEN COALESCE(NEW.rating_count, 0) > 0
+        THEN ROUND(NEW.rating_sum::DECIMAL / NEW.rating_count, 2) ELSE 0 END;
+    NEW.bayesian_rating = prompt_bayesian_rating(NEW.rating_sum, NEW.rating_count);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_prompts_rating_scores ON prompts;
+CREATE TRIGGER update_prompts_rating_scores
+    BEFORE INSERT OR UPDATE OF rating_sum, rating_count ON prompts
+    FOR EACH ROW
+    EXECUTE FUNCTION update_prompt_rating_scores();
+
+-- Existing databases: add bayesian_rating and backfill it once
+DO $$ BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'prompts' AND column_name = 'bayesian_rating'
+    ) THEN
+        ALTER TABLE prompts ADD COLUMN bayesian_rating DECIMAL(4,3) DEFAULT 3.000;
+        UPDATE prompts SET bayesian_rating = prompt_bayesian_rating(rating_sum, rating_count)
+        WHERE rating_count > 0;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_prompts_bayesian_rating ON prompts(bayesian_rating);
+
+-- Keyset (cursor) pagination: one (sort column, id) index per listing order, so
+-- "WHERE (col, id) < (v, id) ORDER BY col DESC, id DESC LIMIT n" is a range scan
+CREATE INDEX IF NOT EXISTS idx_prompts_keyset_created_at ON prompts(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_prompts_keyset_like_count ON prompts(like_count DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_prompts_keyset_view_count ON prompts(view_count DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_prompts_keyset_bookmark_count ON prompts(bookmark_count DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_prompts_keyset_bayesian_rating ON prompts(bayesian_rating DESC, id DESC);
 
 -- Prompt Variables Enums
 DO $$ BEGIN
@@ -256,7 +328,10 @@ CREATE TABLE IF NOT EXISTS prompt_tags (
 
 -- Prompt Tags Indices
 CREATE INDEX IF NOT EXISTS idx_prompt_tags_prompt_id ON prompt_tags(prompt_id);
-CREATE INDEX IF NOT EXISTS idx_prompt_tags_tag_id ON prompt_tags(tag_id);
+-- (tag_id, prompt_id): prompts of a tag straight from the index, for the inner join in
+-- get_prompts_by_tag; supersedes the former single-column tag_id index
+DROP INDEX IF EXISTS idx_prompt_tags_tag_id;
+CREATE INDEX IF NOT EXISTS idx_prompt_tags_tag_prompt ON prompt_tags(tag_id, prompt_id);
 
 -- Prompt Ratings Table
 CREATE TABLE IF NOT EXISTS prompt_ratings (
@@ -408,6 +483,24 @@ CREATE INDEX IF NOT EXISTS idx_prompt_views_prompt_id ON prompt_views(prompt_id)
 CREATE INDEX IF NOT EXISTS idx_prompt_views_user_id ON prompt_views(user_id);
 CREATE INDEX IF NOT EXISTS idx_prompt_views_viewed_at ON prompt_views(viewed_at);
 
+-- Apply aggregated view_count deltas in one call (used by the API's buffered view recorder).
+-- Rows are updated in prompt id order so concurrent flushes from several workers cannot deadlock.
+CREATE OR REPLACE FUNCTION increment_view_counts(deltas JSONB)
+RETURNS VOID AS $$
+DECLARE
+    r RECORD;
+BEGIN
+    FOR r IN
+        SELECT d.prompt_id, SUM(d.delta) AS delta
+        FROM jsonb_to_recordset(deltas) AS d(prompt_id UUID, delta INT)
+        GROUP BY d.prompt_id
+        ORDER BY d.prompt_id
+    LOOP
+        UPDATE prompts SET view_count = view_count + r.delta WHERE id = r.prompt_id;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Prompt Outputs Enums
 DO $$ BEGIN
     CREATE TYPE output_type_enum AS ENUM ('text', 'image', 'video', 'audio', 'code');
@@ -453,6 +546,97 @@ CREATE TRIGGER update_prompt_outputs_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Bump content_updated_at of the given prompts, whose representation changed without an
+-- edit of their own row: outputs added or edited, tags linked, unlinked or renamed, or the
+-- author's public profile edited. Counters (and total_followers) are volatile and left out.
+CREATE OR REPLACE FUNCTION touch_prompts(p_ids UUID[])
+RETURNS VOID AS $$
+    UPDATE prompts SET content_updated_at = CURRENT_TIMESTAMP
+    WHERE id = ANY(p_ids) AND content_updated_at IS DISTINCT FROM CURRENT_TIMESTAMP;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION touch_prompts_on_children_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM touch_prompts(ARRAY(SELECT DISTINCT prompt_id FROM old_rows ORDER BY prompt_id));
+    ELSE
+        PERFORM touch_prompts(ARRAY(SELECT DISTINCT prompt_id FROM new_rows ORDER BY prompt_id));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS touch_prompts_on_outputs_insert ON prompt_outputs;
+CREATE TRIGGER touch_prompts_on_outputs_insert
+    AFTER INSERT ON prompt_outputs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION touch_prompts_on_children_change();
+
+DROP TRIGGER IF EXISTS touch_prompts_on_outputs_update ON prompt_outputs;
+CREATE TRIGGER touch_prompts_on_outputs_update
+    AFTER UPDATE ON prompt_outputs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION touch_prompts_on_children_change();
+
+DROP TRIGGER IF EXISTS touch_prompts_on_outputs_delete ON prompt_outputs;
+CREATE TRIGGER touch_prompts_on_outputs_delete
+    AFTER DELETE ON prompt_outputs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION touch_prompts_on_children_change();
+
+DROP TRIGGER IF EXISTS touch_prompts_on_tags_insert ON prompt_tags;
+CREATE TRIGGER touch_prompts_on_tags_insert
+    AFTER INSERT ON prompt_tags
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION touch_prompts_on_children_change();
+
+DROP TRIGGER IF EXISTS touch_prompts_on_tags_delete ON prompt_tags;
+CREATE TRIGGER touch_prompts_on_tags_delete
+    AFTER DELETE ON prompt_tags
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION touch_prompts_on_children_change();
+
+CREATE OR REPLACE FUNCTION touch_prompts_on_tag_rename()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM touch_prompts(ARRAY(SELECT prompt_id FROM prompt_tags WHERE tag_id = NEW.id ORDER BY prompt_id));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS touch_prompts_on_tag_rename ON tags;
+CREATE TRIGGER touch_prompts_on_tag_rename
+    AFTER UPDATE OF name, slug ON tags
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.slug IS DISTINCT FROM NEW.slug)
+    EXECUTE FUNCTION touch_prompts_on_tag_rename();
+
+-- The author embed (UserPublic) shows username, display_name and avatar_url
+CREATE OR REPLACE FUNCTION touch_prompts_on_author_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM touch_prompts(ARRAY(SELECT id FROM prompts WHERE user_id = NEW.id ORDER BY id));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS touch_prompts_on_author_change ON users;
+CREATE TRIGGER touch_prompts_on_author_change
+    AFTER UPDATE OF username, display_name, avatar_url ON users
+    FOR EACH ROW
+    WHEN (
+        OLD.username IS DISTINCT FROM NEW.username
+        OR OLD.display_name IS DISTINCT FROM NEW.display_name
+        OR OLD.avatar_url IS DISTINCT FROM NEW.avatar_url
+    )
+    EXECUTE FUNCTION touch_prompts_on_author_change();
+
 -- Trending Prompts Table
 CREATE TABLE IF NOT EXISTS trending_prompts (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -582,6 +766,247 @@ CREATE TABLE IF NOT EXISTS comment_votes (
 CREATE INDEX IF NOT EXISTS idx_comment_votes_comment_id ON comment_votes(comment_id);
 CREATE INDEX IF NOT EXISTS idx_comment_votes_user_id ON comment_votes(user_id);
 
+-- Engagement toggles (used by the API's counter service).
+-- Each changes the membership row and its denormalised counter in one transaction, so
+-- parallel clicks can neither double count nor lose an update. The counter is only
+-- written when membership actually changed. NULL means the target does not exist.
+CREATE OR REPLACE FUNCTION set_prompt_like(p_user_id UUID, p_prompt_id UUID, p_liked BOOLEAN)
+RETURNS INT AS $$
+DECLARE
+    changed INT;
+    new_count INT;
+BEGIN
+    PERFORM 1 FROM prompts WHERE id = p_prompt_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    IF p_liked THEN
+        INSERT INTO prompt_likes (user_id, prompt_id) VALUES (p_user_id, p_prompt_id)
+        ON CONFLICT (user_id, prompt_id) DO NOTHING;
+        GET DIAGNOSTICS changed = ROW_COUNT;
+    ELSE
+        DELETE FROM prompt_likes WHERE user_id = p_user_id AND prompt_id = p_prompt_id;
+        GET DIAGNOSTICS changed = ROW_COUNT;
+        changed := -changed;
+    END IF;
+
+    IF changed = 0 THEN
+        SELECT like_count INTO new_count FROM prompts WHERE id = p_prompt_id;
+    ELSE
+        UPDATE prompts SET like_count = GREATEST(COALESCE(like_count, 0) + changed, 0)
+        WHERE id = p_prompt_id
+        RETURNING like_count INTO new_count;
+    END IF;
+    RETURN COALESCE(new_count, 0);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Returns the bookmark row (existing or new; the removed one when p_bookmarked is false)
+CREATE OR REPLACE FUNCTION set_prompt_bookmark(p_user_id UUID, p_prompt_id UUID, p_bookmarked BOOLEAN)
+RETURNS JSONB AS $$
+DECLARE
+    bookmark bookmarks;
+BEGIN
+    PERFORM 1 FROM prompts WHERE id = p_prompt_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    IF p_bookmarked THEN
+        INSERT INTO bookmarks (user_id, prompt_id) VALUES (p_user_id, p_prompt_id)
+        ON CONFLICT (user_id, prompt_id) DO NOTHING
+        RETURNING * INTO bookmark;
+        IF FOUND THEN
+            UPDATE prompts SET bookmark_count = COALESCE(bookmark_count, 0) + 1 WHERE id = p_prompt_id;
+        ELSE
+            SELECT * INTO bookmark FROM bookmarks WHERE user_id = p_user_id AND prompt_id = p_prompt_id;
+        END IF;
+    ELSE
+        DELETE FROM bookmarks WHERE user_id = p_user_id AND prompt_id = p_prompt_id
+        RETURNING * INTO bookmark;
+        IF FOUND THEN
+            UPDATE prompts SET bookmark_count = GREATEST(COALESCE(bookmark_count, 0) - 1, 0) WHERE id = p_prompt_id;
+        END IF;
+    END IF;
+    RETURN to_jsonb(bookmark);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Rates or re-rates a prompt: rating_count / rating_sum move by the delta from the
+-- user's previous rating, and the rating scores trigger derives the averages.
+-- Returns the rating row.
+CREATE OR REPLACE FUNCTION set_prompt_rating(p_user_id UUID, p_prompt_id UUID, p_rating INT)
+RETURNS JSONB AS $$
+DECLARE
+    old_rating INT;
+    rated prompt_ratings;
+BEGIN
+    PERFORM 1 FROM prompts WHERE id = p_prompt_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    LOOP
+        SELECT r.rating INTO old_rating FROM prompt_ratings r
+        WHERE r.user_id = p_user_id AND r.prompt_id = p_prompt_id
+        FOR UPDATE;
+        IF FOUND THEN
+            UPDATE prompt_ratings r SET rating = p_rating
+            WHERE r.user_id = p_user_id AND r.prompt_id = p_prompt_id
+            RETURNING * INTO rated;
+            EXIT;
+        END IF;
+
+        INSERT INTO prompt_ratings (user_id, prompt_id, rating) VALUES (p_user_id, p_prompt_id, p_rating)
+        ON CONFLICT (user_id, prompt_id) DO NOTHING
+        RETURNING * INTO rated;
+        IF FOUND THEN
+            old_rating := NULL;
+            EXIT;
+        END IF;
+        -- A concurrent first rating won the insert: go round and lock that row instead
+    END LOOP;
+
+    IF old_rating IS NULL THEN
+        UPDATE prompts
+        SET rating_count = COALESCE(rating_count, 0) + 1, rating_sum = COALESCE(rating_sum, 0) + p_rating
+        WHERE id = p_prompt_id;
+    ELSIF old_rating <> p_rating THEN
+        UPDATE prompts SET rating_sum = COALESCE(rating_sum, 0) + p_rating - old_rating
+        WHERE id = p_prompt_id;
+    END IF;
+    RETURN to_jsonb(rated);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Returns the followed user's total_followers. Both user rows are locked in id order.
+CREATE OR REPLACE FUNCTION set_follow(p_follower_id UUID, p_following_id UUID, p_following BOOLEAN)
+RETURNS INT AS $$
+DECLARE
+    changed INT;
+    new_count INT;
+BEGIN
+    PERFORM 1 FROM users WHERE id = p_following_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    IF p_following THEN
+        INSERT INTO follows (follower_id, following_id) VALUES (p_follower_id, p_following_id)
+        ON CONFLICT (follower_id, following_id) DO NOTHING;
+        GET DIAGNOSTICS changed = ROW_COUNT;
+    ELSE
+        DELETE FROM follows WHERE follower_id = p_follower_id AND following_id = p_following_id;
+        GET DIAGNOSTICS changed = ROW_COUNT;
+        changed := -changed;
+    END IF;
+
+    IF changed = 0 THEN
+        SELECT total_followers INTO new_count FROM users WHERE id = p_following_id;
+        RETURN COALESCE(new_count, 0);
+    END IF;
+
+    IF p_follower_id < p_following_id THEN
+        UPDATE users SET total_following = GREATEST(COALESCE(total_following, 0) + changed, 0) WHERE id = p_follower_id;
+    END IF;
+    UPDATE users SET total_followers = GREATEST(COALESCE(total_followers, 0) + changed, 0)
+    WHERE id = p_following_id
+    RETURNING total_followers INTO new_count;
+    IF p_follower_id > p_following_id THEN
+        UPDATE users SET total_following = GREATEST(COALESCE(total_following, 0) + changed, 0) WHERE id = p_follower_id;
+    END IF;
+    RETURN new_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Upserts the vote and keeps comments.upvote_count in step. Returns the vote row.
+CREATE OR REPLACE FUNCTION set_comment_vote(p_user_id UUID, p_comment_id UUID, p_vote_type vote_type_enum)
+RETURNS JSONB AS $$
+DECLARE
+    old_type vote_type_enum;
+    vote comment_votes;
+    delta INT;
+BEGIN
+    PERFORM 1 FROM comments WHERE id = p_comment_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    LOOP
+        SELECT vote_type INTO old_type FROM comment_votes
+        WHERE user_id = p_user_id AND comment_id = p_comment_id
+        FOR UPDATE;
+        IF FOUND THEN
+            UPDATE comment_votes SET vote_type = p_vote_type
+            WHERE user_id = p_user_id AND comment_id = p_comment_id
+            RETURNING * INTO vote;
+            EXIT;
+        END IF;
+
+        INSERT INTO comment_votes (user_id, comment_id, vote_type) VALUES (p_user_id, p_comment_id, p_vote_type)
+        ON CONFLICT (user_id, comment_id) DO NOTHING
+        RETURNING * INTO vote;
+        IF FOUND THEN
+            old_type := NULL;
+            EXIT;
+        END IF;
+        -- A concurrent first vote won the insert: go round and lock that row instead
+    END LOOP;
+
+    delta := (p_vote_type = 'upvote')::INT - COALESCE((old_type = 'upvote')::INT, 0);
+    IF delta <> 0 THEN
+        UPDATE comments SET upvote_count = GREATEST(COALESCE(upvote_count, 0) + delta, 0) WHERE id = p_comment_id;
+    END IF;
+    RETURN to_jsonb(vote);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recount drifted counters (used by the counter reconciliation job).
+-- p_ids are the rows the job's scan found out of line; p_counters describes how each
+-- counter is derived: [{"column", "source", "key", "value" (summed, or null to count
+-- rows), "not_deleted"}]. Each row is locked first and then recounted in a separate
+-- statement, whose snapshot is taken after the lock: every write that already changed
+-- the counter is visible to the recount, and any later one waits and applies its delta
+-- on top, so no concurrent like, vote or follow is lost.
+DROP FUNCTION IF EXISTS apply_counter_updates(TEXT, JSONB);
+
+CREATE OR REPLACE FUNCTION recount_counters(p_table TEXT, p_ids UUID[], p_counters JSONB)
+RETURNS INT AS $$
+DECLARE
+    c JSONB;
+    assignments TEXT[] := '{}';
+    target_id UUID;
+    updated INT := 0;
+BEGIN
+    IF p_table NOT IN ('prompts', 'users', 'tags', 'categories') THEN
+        RAISE EXCEPTION 'recount_counters: unsupported table %', p_table;
+    END IF;
+
+    FOR c IN SELECT value FROM jsonb_array_elements(p_counters) LOOP
+        assignments := assignments || format(
+            '%I = (SELECT %s FROM %I s WHERE s.%I = t.id%s)',
+            c->>'column',
+            CASE WHEN c->>'value' IS NULL THEN 'count(*)' ELSE format('COALESCE(sum(s.%I), 0)', c->>'value') END,
+            c->>'source',
+            c->>'key',
+            CASE WHEN (c->>'not_deleted')::BOOLEAN THEN ' AND s.deleted_at IS NULL' ELSE '' END
+        );
+    END LOOP;
+    IF cardinality(assignments) = 0 THEN
+        RETURN 0;
+    END IF;
+
+    FOR target_id IN SELECT DISTINCT id FROM unnest(p_ids) AS id ORDER BY id LOOP
+        EXECUTE format('SELECT 1 FROM %I WHERE id = $1 FOR UPDATE', p_table) USING target_id;
+        EXECUTE format('UPDATE %I t SET %s WHERE t.id = $1', p_table, array_to_string(assignments, ', '))
+            USING target_id;
+        updated := updated + 1;
+    END LOOP;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Reports Enums
 DO $$ BEGIN
     CREATE TYPE reportable_type_enum AS ENUM ('prompt', 'comment', 'user');
@@ -629,6 +1054,652 @@ CREATE TRIGGER update_reports_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Insert JSON objects into a table, naming only the columns present in the first object
+-- so omitted columns keep their defaults. Returns the inserted rows.
+CREATE OR REPLACE FUNCTION insert_json_rows(p_table TEXT, p_rows JSONB)
+RETURNS SETOF JSONB AS $$
+DECLARE
+    column_list TEXT;
+BEGIN
+    IF p_rows IS NULL OR jsonb_array_length(p_rows) = 0 THEN
+        RETURN;
+    END IF;
+
+    SELECT string_agg(quote_ident(a.attname), ', ' ORDER BY a.attnum)
+    INTO column_list
+    FROM pg_attribute a
+    WHERE a.attrelid = p_table::regclass AND a.attnum > 0 AND NOT a.attisdropped
+      AND (p_rows->0) ? a.attname;
+
+    RETURN QUERY EXECUTE format(
+        'INSERT INTO %I (%s) SELECT %s FROM jsonb_populate_recordset(NULL::%I, $1) RETURNING to_jsonb(%I.*)',
+        p_table, column_list, column_list, p_table, p_table
+    ) USING p_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create a prompt with its variables, tags and outputs in one transaction (used by the
+-- API's create path). Tags are matched by slug and created when missing.
+-- Returns {"prompt": <prompts row>, "tags": {<slug>: <tag id>}}.
+CREATE OR REPLACE FUNCTION create_prompt_full(
+    p_user_id UUID,
+    p_prompt JSONB,
+    p_variables JSONB DEFAULT '[]',
+    p_tags JSONB DEFAULT '[]',
+    p_outputs JSONB DEFAULT '[]'
+)
+RETURNS JSONB AS $$
+DECLARE
+    new_prompt JSONB;
+    new_prompt_id UUID;
+    tag_slugs TEXT[];
+    tag_names TEXT[];
+    tag_map JSONB;
+BEGIN
+    SELECT r INTO new_prompt
+    FROM insert_json_rows('prompts', jsonb_build_array(p_prompt || jsonb_build_object('user_id', p_user_id))) AS r;
+    new_prompt_id := (new_prompt->>'id')::UUID;
+
+    PERFORM insert_json_rows('prompt_variables', (
+        SELECT jsonb_agg(v || jsonb_build_object('prompt_id', new_prompt_id))
+        FROM jsonb_array_elements(COALESCE(p_variables, '[]')) AS v
+    ));
+
+    -- Same slug rule as the API: lower-cased, trimmed, spaces to dashes; first spelling wins
+    SELECT array_agg(slug ORDER BY slug), array_agg(name ORDER BY slug)
+    INTO tag_slugs, tag_names
+    FROM (
+        SELECT DISTINCT ON (slug) slug, name
+        FROM (
+            SELECT replace(lower(btrim(t)), ' ', '-') AS slug, btrim(t) AS name, ord
+            FROM jsonb_array_elements_text(COALESCE(p_tags, '[]')) WITH ORDINALITY AS x(t, ord)
+            WHERE btrim(t) <> ''
+        ) named
+        ORDER BY slug, ord
+    ) wanted;
+
+    IF tag_slugs IS NOT NULL THEN
+        -- Only an existing slug is skipped; a name taken by a tag with another slug raises
+        INSERT INTO tags (name, slug)
+        SELECT * FROM unnest(tag_names, tag_slugs)
+        ON CONFLICT (slug) DO NOTHING;
+
+        -- A new statement, so tags committed concurrently by other requests are visible too.
+        -- The map is built from the links actually inserted, and every wanted tag must be one.
+        WITH linked AS (
+            INSERT INTO prompt_tags (prompt_id, tag_id)
+            SELECT new_prompt_id, t.id FROM tags t WHERE t.slug = ANY(tag_slugs)
+            RETURNING tag_id
+        )
+        SELECT jsonb_object_agg(t.slug, t.id) INTO tag_map
+        FROM linked JOIN tags t ON t.id = linked.tag_id;
+
+        IF COALESCE((SELECT count(*) FROM jsonb_object_keys(tag_map)), 0) <> cardinality(tag_slugs) THEN
+            RAISE EXCEPTION 'create_prompt_full: could not link tags %',
+                (SELECT array_agg(slug) FROM unnest(tag_slugs) AS slug WHERE NOT COALESCE(tag_map ? slug, false));
+        END IF;
+    END IF;
+
+    PERFORM insert_json_rows('prompt_outputs', (
+        SELECT jsonb_agg(o || jsonb_build_object('prompt_id', new_prompt_id, 'user_id', p_user_id))
+        FROM jsonb_array_elements(COALESCE(p_outputs, '[]')) AS o
+    ));
+
+    RETURN jsonb_build_object('prompt', new_prompt, 'tags', COALESCE(tag_map, '{}'));
+END;
+$$ LANGUAGE plpgsql;
+
+-- Bulk variant for the admin import. Each element of p_prompts is
+-- {"prompt": ..., "variables": [...], "tags": [...], "outputs": [...]} and is created in its
+-- own subtransaction, so a bad record does not roll back the rest of the batch.
+-- Returns one {"ok", "id", "category_id", "tags"} or {"ok", "error"} per element, in order.
+CREATE OR REPLACE FUNCTION create_prompts_batch(p_user_id UUID, p_prompts JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    item JSONB;
+    created JSONB;
+    results JSONB := '[]';
+BEGIN
+    -- Create the batch's new tags up front, in one statement in slug order: created
+    -- record by record, concurrent batches sharing new tags would take their locks in
+    -- different orders and deadlock. If this fails (say, a name taken by a tag with another
+    -- slug), the records create their tags themselves and only the offending one fails.
+    BEGIN
+        INSERT INTO tags (name, slug)
+        SELECT DISTINCT ON (slug) name, slug
+        FROM (
+            SELECT replace(lower(btrim(t)), ' ', '-') AS slug, btrim(t) AS name, x.n, y.ord
+            FROM jsonb_array_elements(p_prompts) WITH ORDINALITY AS x(e, n),
+                 jsonb_array_elements_text(CASE WHEN jsonb_typeof(x.e->'tags') = 'array' THEN x.e->'tags' ELSE '[]' END)
+                     WITH ORDINALITY AS y(t, ord)
+            WHERE btrim(t) <> ''
+        ) named
+        ORDER BY slug, n, ord
+        ON CONFLICT (slug) DO NOTHING;
+    EXCEPTION WHEN OTHERS THEN
+        NULL;
+    END;
+
+    FOR item IN
+        SELECT e FROM jsonb_array_elements(p_prompts) WITH ORDINALITY AS x(e, n) ORDER BY n
+    LOOP
+        BEGIN
+            created := create_prompt_full(p_user_id, item->'prompt', item->'variables', item->'tags', item->'outputs');
+            results := results || jsonb_build_array(jsonb_build_object(
+                'ok', true,
+                'id', created->'prompt'->'id',
+                'category_id', created->'prompt'->'category_id',
+                'tags', created->'tags'
+            ));
+        EXCEPTION WHEN OTHERS THEN
+            results := results || jsonb_build_array(jsonb_build_object('ok', false, 'error', SQLERRM));
+        END;
+    END LOOP;
+    RETURN results;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ─────────────────────────────────────────────
+-- Full-text search (BM25)
+-- ─────────────────────────────────────────────
+
+-- Inverted index over the title, tag names, description and prompt_text of published
+-- public prompts: one row per (stemmed term, prompt). tf is the field-weighted term
+-- frequency (title 3, tags 2, description 1.5, prompt_text 1) and doc_length the
+-- weighted length of the prompt. impact is the BM25 term weight without the IDF
+-- (prompt_search_impact), so a score is SUM(idf * impact) read from the index alone.
+CREATE TABLE IF NOT EXISTS prompt_search_postings (
+    term TEXT NOT NULL,
+    prompt_id UUID NOT NULL REFERENCES prompts(id) ON DELETE CASCADE,
+    tf REAL NOT NULL,
+    doc_length REAL NOT NULL,
+    impact REAL NOT NULL,
+    PRIMARY KEY (term, prompt_id) INCLUDE (impact)
+);
+-- Existing databases: run rebuild_prompt_search() once to fill impact and max_impact
+ALTER TABLE prompt_search_postings ADD COLUMN IF NOT EXISTS impact REAL NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_prompt_search_postings_prompt_id ON prompt_search_postings(prompt_id);
+-- A term's postings, highest impact first, for the top-k scan of search_prompts_ranked
+CREATE INDEX IF NOT EXISTS idx_prompt_search_postings_impact ON prompt_search_postings(term, impact DESC, prompt_id DESC);
+
+-- Document frequency per term, so a query starts from its rarest term, and the highest
+-- impact of any of its postings, which bounds what the term can add to a score
+CREATE TABLE IF NOT EXISTS prompt_search_terms (
+    term TEXT PRIMARY KEY,
+    df INT NOT NULL,
+    max_impact REAL NOT NULL DEFAULT 0
+);
+ALTER TABLE prompt_search_terms ADD COLUMN IF NOT EXISTS max_impact REAL NOT NULL DEFAULT 0;
+
+-- Corpus size and total length, for the IDF and the average document length
+CREATE TABLE IF NOT EXISTS prompt_search_stats (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    doc_count BIGINT NOT NULL DEFAULT 0,
+    total_length DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+INSERT INTO prompt_search_stats (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+-- Writers never update the two tables above: every prompt write would queue on the same
+-- stats row and on the rows of common terms, and concurrent imports would deadlock.
+-- They append their changes here instead (no row is ever updated, so nothing to wait
+-- for), queries add the pending deltas to the compacted values, and
+-- compact_prompt_search() folds them in periodically.
+CREATE TABLE IF NOT EXISTS prompt_search_term_deltas (
+    term TEXT NOT NULL,
+    df INT NOT NULL,
+    max_impact REAL NOT NULL DEFAULT 0
+);
+ALTER TABLE prompt_search_term_deltas ADD COLUMN IF NOT EXISTS max_impact REAL NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_prompt_search_term_deltas_term ON prompt_search_term_deltas(term);
+
+CREATE TABLE IF NOT EXISTS prompt_search_stats_deltas (
+    doc_count INT NOT NULL,
+    total_length DOUBLE PRECISION NOT NULL
+);
+
+-- Tokenise (english text search configuration: lower-cased, stop words removed, Snowball
+-- stemming) and weight the fields of a prompt. Returns (term, weighted frequency).
+CREATE OR REPLACE FUNCTION prompt_search_document(p_title TEXT, p_tags TEXT, p_description TEXT, p_prompt_text TEXT)
+RETURNS TABLE (term TEXT, tf REAL) AS $$
+    SELECT u.lexeme, SUM(f.weight * COALESCE(array_length(u.positions, 1), 1))::REAL
+    FROM (VALUES
+        (3.0, to_tsvector('english', COALESCE(p_title, ''))),
+        (2.0, to_tsvector('english', COALESCE(p_tags, ''))),
+        (1.5, to_tsvector('english', COALESCE(p_description, ''))),
+        (1.0, to_tsvector('english', COALESCE(p_prompt_text, '')))
+    ) AS f(weight, vector),
+    unnest(f.vector) AS u(lexeme, positions, weights)
+    GROUP BY u.lexeme;
+$$ LANGUAGE sql STABLE;
+
+-- BM25 term weight without the IDF (k1 = 1.2, b = 0.75). avgdl is the average document
+-- length when the posting is written; rebuild_prompt_search() renormalises every posting
+-- against the current average.
+CREATE OR REPLACE FUNCTION prompt_search_impact(p_tf REAL, p_doc_length REAL, p_avgdl DOUBLE PRECISION)
+RETURNS REAL AS $$
+    SELECT (p_tf * (1.2 + 1) / (p_tf + 1.2 * (1 - 0.75 + 0.75 * p_doc_length / GREATEST(p_avgdl, 1))))::REAL;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Drop a prompt from the search index
+CREATE OR REPLACE FUNCTION prompt_search_remove(p_prompt_id UUID)
+RETURNS VOID AS $$
+DECLARE
+    old_length REAL;
+BEGIN
+    WITH removed AS (
+        DELETE FROM prompt_search_postings WHERE prompt_id = p_prompt_id RETURNING term, doc_length
+    ),
+    logged AS (
+        INSERT INTO prompt_search_term_deltas (term, df) SELECT term, -1 FROM removed
+    )
+    SELECT MAX(doc_length) INTO old_length FROM removed;
+
+    IF old_length IS NOT NULL THEN
+        INSERT INTO prompt_search_stats_deltas (doc_count, total_length) VALUES (-1, -old_length);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- (Re)index one prompt from its current row and tags; prompts that are not published
+-- and public are only removed
+CREATE OR REPLACE FUNCTION prompt_search_reindex(p_prompt_id UUID)
+RETURNS VOID AS $$
+DECLARE
+    p prompts%ROWTYPE;
+    new_length REAL;
+    avgdl DOUBLE PRECISION;
+BEGIN
+    PERFORM prompt_search_remove(p_prompt_id);
+
+    SELECT * INTO p FROM prompts
+    WHERE id = p_prompt_id AND status = 'published' AND privacy_status = 'public' AND deleted_at IS NULL;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+    -- Compacted average only: reading the pending deltas would put every write back on
+    -- the same rows
+    SELECT total_length / NULLIF(doc_count, 0) INTO avgdl FROM prompt_search_stats;
+
+    WITH doc AS (
+        SELECT d.term, d.tf
+        FROM prompt_search_document(
+            p.title,
+            (SELECT string_agg(t.name, ' ') FROM prompt_tags pt JOIN tags t ON t.id = pt.tag_id WHERE pt.prompt_id = p_prompt_id),
+            p.description,
+            p.prompt_text
+        ) d
+    ),
+    sized AS (
+        SELECT term, tf, SUM(tf) OVER () AS doc_length FROM doc
+    ),
+    inserted AS (
+        INSERT INTO prompt_search_postings (term, prompt_id, tf, doc_length, impact)
+        SELECT term, p_prompt_id, tf, doc_length, prompt_search_impact(tf, doc_length, COALESCE(avgdl, doc_length))
+        FROM sized
+        RETURNING term, doc_length, impact
+    ),
+    logged AS (
+        INSERT INTO prompt_search_term_deltas (term, df, max_impact) SELECT term, 1, impact FROM inserted
+    )
+    SELECT MAX(doc_length) INTO new_length FROM inserted;
+
+    IF new_length IS NOT NULL THEN
+        INSERT INTO prompt_search_stats_deltas (doc_count, total_length) VALUES (1, new_length);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Keep the index in step with every write path (API, admin, bulk import, SQL functions),
+-- in the writing transaction. Counter updates (views, likes, ...) do not touch it.
+CREATE OR REPLACE FUNCTION prompt_search_on_prompt_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM prompt_search_remove(OLD.id);
+        RETURN OLD;
+    END IF;
+    PERFORM prompt_search_reindex(NEW.id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS prompt_search_on_insert ON prompts;
+CREATE TRIGGER prompt_search_on_insert
+    AFTER INSERT ON prompts
+    FOR EACH ROW
+    EXECUTE FUNCTION prompt_search_on_prompt_change();
+
+DROP TRIGGER IF EXISTS prompt_search_on_update ON prompts;
+CREATE TRIGGER prompt_search_on_update
+    AFTER UPDATE OF title, description, prompt_text, status, privacy_status, deleted_at ON prompts
+    FOR EACH ROW
+    WHEN (
+        OLD.title IS DISTINCT FROM NEW.title
+        OR OLD.description IS DISTINCT FROM NEW.description
+        OR OLD.prompt_text IS DISTINCT FROM NEW.prompt_text
+        OR OLD.status IS DISTINCT FROM NEW.status
+        OR OLD.privacy_status IS DISTINCT FROM NEW.privacy_status
+        OR OLD.deleted_at IS DISTINCT FROM NEW.deleted_at
+    )
+    EXECUTE FUNCTION prompt_search_on_prompt_change();
+
+-- Before the delete cascades to the postings, so term and corpus statistics are kept exact
+DROP TRIGGER IF EXISTS prompt_search_on_delete ON prompts;
+CREATE TRIGGER prompt_search_on_delete
+    BEFORE DELETE ON prompts
+    FOR EACH ROW
+    EXECUTE FUNCTION prompt_search_on_prompt_change();
+
+-- Tag links change the indexed tag names: reindex each affected prompt once per statement
+CREATE OR REPLACE FUNCTION prompt_search_on_tags_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM prompt_search_reindex(prompt_id) FROM (SELECT DISTINCT prompt_id FROM changed_tags) c;
+    ELSE
+        PERFORM prompt_search_reindex(prompt_id) FROM (SELECT DISTINCT prompt_id FROM removed_tags) c;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS prompt_search_on_tags_insert ON prompt_tags;
+CREATE TRIGGER prompt_search_on_tags_insert
+    AFTER INSERT ON prompt_tags
+    REFERENCING NEW TABLE AS changed_tags
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION prompt_search_on_tags_change();
+
+DROP TRIGGER IF EXISTS prompt_search_on_tags_delete ON prompt_tags;
+CREATE TRIGGER prompt_search_on_tags_delete
+    AFTER DELETE ON prompt_tags
+    REFERENCING OLD TABLE AS removed_tags
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION prompt_search_on_tags_change();
+
+-- A renamed tag changes the text of every prompt carrying it
+CREATE OR REPLACE FUNCTION prompt_search_on_tag_rename()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM prompt_search_reindex(prompt_id) FROM prompt_tags WHERE tag_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS prompt_search_on_tag_rename ON tags;
+CREATE TRIGGER prompt_search_on_tag_rename
+    AFTER UPDATE OF name ON tags
+    FOR EACH ROW
+    WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION prompt_search_on_tag_rename();
+
+-- Fold the pending deltas into prompt_search_terms / prompt_search_stats. Called every
+-- PROMPT_SEARCH_COMPACT_SECONDS by the API; only one compaction runs at a time, and it
+-- never waits on writers, which only append deltas. Returns the number of terms updated.
+CREATE OR REPLACE FUNCTION compact_prompt_search()
+RETURNS INT AS $$
+DECLARE
+    folded INT;
+    emptied TEXT[];
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('compact_prompt_search')) THEN
+        RETURN 0;
+    END IF;
+
+    WITH moved AS (
+        DELETE FROM prompt_search_term_deltas RETURNING term, df, max_impact
+    ),
+    applied AS (
+        -- max_impact only grows here (removals do not lower it): a loose bound only costs
+        -- the search some pruning, and rebuild_prompt_search() tightens it
+        INSERT INTO prompt_search_terms AS t (term, df, max_impact)
+        SELECT term, SUM(df), MAX(max_impact) FROM moved GROUP BY term ORDER BY term
+        ON CONFLICT (term) DO UPDATE
+        SET df = t.df + EXCLUDED.df, max_impact = GREATEST(t.max_impact, EXCLUDED.max_impact)
+        RETURNING t.term, t.df
+    )
+    SELECT COUNT(*), array_agg(term) FILTER (WHERE df <= 0) INTO folded, emptied FROM applied;
+    -- Terms no prompt contains any more
+    DELETE FROM prompt_search_terms WHERE term = ANY(emptied) AND df <= 0;
+
+    WITH moved AS (
+        DELETE FROM prompt_search_stats_deltas RETURNING doc_count, total_length
+    )
+    UPDATE prompt_search_stats s
+    SET doc_count = s.doc_count + d.doc_count, total_length = s.total_length + d.total_length
+    FROM (SELECT COALESCE(SUM(doc_count), 0) AS doc_count, COALESCE(SUM(total_length), 0) AS total_length FROM moved) d;
+
+    RETURN folded;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Build the index for existing prompts (run once after installing; safe to re-run)
+CREATE OR REPLACE FUNCTION rebuild_prompt_search()
+RETURNS BIGINT AS $$
+DECLARE
+    indexed BIGINT;
+BEGIN
+    -- Wait for a running compaction; the one below then takes the same lock again
+    PERFORM pg_advisory_xact_lock(hashtext('compact_prompt_search'));
+    TRUNCATE prompt_search_postings, prompt_search_terms, prompt_search_term_deltas, prompt_search_stats_deltas;
+    UPDATE prompt_search_stats SET doc_count = 0, total_length = 0;
+    PERFORM prompt_search_reindex(id) FROM prompts
+    WHERE status = 'published' AND privacy_status = 'public' AND deleted_at IS NULL;
+    PERFORM compact_prompt_search();
+
+    -- Postings written before the corpus size was known: weigh them all against the
+    -- final average length, and record each term's exact maximum
+    UPDATE prompt_search_postings
+    SET impact = prompt_search_impact(tf, doc_length, (SELECT total_length / NULLIF(doc_count, 0) FROM prompt_search_stats));
+    UPDATE prompt_search_terms t SET max_impact = m.max_impact
+    FROM (SELECT term, MAX(impact) AS max_impact FROM prompt_search_postings GROUP BY term) m
+    WHERE m.term = t.term;
+
+    SELECT doc_count INTO indexed FROM prompt_search_stats;
+    RETURN indexed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Search published public prompts: every query term must match (after stemming).
+-- p_sort is 'relevance' (BM25) or one of the listing sort columns. Returns one page of
+-- (id, rank), rank descending (NULLs first, like the listings) then id descending; pass
+-- the last (rank, id) as p_after_rank / p_after_id for the next page, or use p_offset.
+--
+-- The rarest query term leads, and the other terms are checked through the
+-- (term, prompt_id) primary key. For relevance, the lead term's postings are read highest
+-- impact first, a block at a time, keeping the best p_offset + p_limit scores (MaxScore):
+-- once the next lead impact plus the max_impact of every other term cannot reach the
+-- lowest of those scores, no remaining posting can make the page and the scan stops, so
+-- a common word costs about a page of postings rather than its whole posting list. For
+-- the other sort orders the matches of a rare lead term are sorted directly; past
+-- walk_above postings, prompts are walked in the listing's (column, id) index order
+-- instead, keeping the first ones that contain every term.
+CREATE OR REPLACE FUNCTION search_prompts_ranked(
+    p_query TEXT,
+    p_sort TEXT DEFAULT 'relevance',
+    p_limit INT DEFAULT 20,
+    p_offset INT DEFAULT 0,
+    p_after_rank DOUBLE PRECISION DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_category_id UUID DEFAULT NULL,
+    p_prompt_type TEXT DEFAULT NULL
+)
+RETURNS TABLE (id UUID, rank DOUBLE PRECISION) AS $$
+#variable_conflict use_column
+DECLARE
+    walk_above CONSTANT INT := 5000;
+    n DOUBLE PRECISION;
+    terms TEXT[];
+    dfs BIGINT[];
+    idfs DOUBLE PRECISION[];
+    bounds DOUBLE PRECISION[];
+    rest_bound DOUBLE PRECISION := 0;
+    wanted INT := p_offset + p_limit;
+    block_size INT := GREATEST(p_offset + p_limit, 100);
+    block_ids UUID[];
+    block_impacts REAL[];
+    top_ids UUID[] := '{}';
+    top_ranks DOUBLE PRECISION[] := '{}';
+    last_impact REAL;
+    last_id UUID;
+    rank_expr TEXT;
+BEGIN
+    IF p_sort NOT IN ('relevance', 'created_at', 'like_count', 'view_count', 'bookmark_count', 'bayesian_rating') THEN
+        RAISE EXCEPTION 'search_prompts_ranked: unsupported sort %', p_sort;
+    END IF;
+
+    -- Compacted statistics plus the deltas not folded in yet
+    SELECT GREATEST(s.doc_count + (SELECT COALESCE(SUM(d.doc_count), 0) FROM prompt_search_stats_deltas d), 1)
+    INTO n FROM prompt_search_stats s;
+
+    -- Query terms, rarest first. A term without a recorded maximum is bounded by k1 + 1.
+    SELECT array_agg(q.term ORDER BY q.df, q.term),
+           array_agg(q.df ORDER BY q.df, q.term),
+           array_agg(LN(1 + (n - q.df + 0.5) / (q.df + 0.5)) ORDER BY q.df, q.term),
+           array_agg(q.max_impact ORDER BY q.df, q.term)
+    INTO terms, dfs, idfs, bounds
+    FROM (
+        SELECT w.term,
+               COALESCE(t.df, 0) + COALESCE(d.df, 0) AS df,
+               COALESCE(GREATEST(t.max_impact, d.max_impact), 2.2) AS max_impact
+        FROM (SELECT DISTINCT lexeme AS term FROM unnest(to_tsvector('english', p_query))) w
+        LEFT JOIN prompt_search_terms t ON t.term = w.term
+        LEFT JOIN LATERAL (
+            SELECT SUM(x.df) AS df, MAX(x.max_impact) AS max_impact
+            FROM prompt_search_term_deltas x WHERE x.term = w.term
+        ) d ON TRUE
+    ) q;
+    IF terms IS NULL OR dfs[1] <= 0 THEN
+        RETURN;
+    END IF;
+
+    IF p_sort = 'relevance' THEN
+        FOR i IN 2 .. cardinality(terms) LOOP
+            rest_bound := rest_bound + idfs[i] * bounds[i];
+        END LOOP;
+
+        LOOP
+            SELECT array_agg(b.prompt_id ORDER BY b.impact DESC, b.prompt_id DESC),
+                   array_agg(b.impact ORDER BY b.impact DESC, b.prompt_id DESC)
+            INTO block_ids, block_impacts
+            FROM (
+                SELECT sp.prompt_id, sp.impact
+                FROM prompt_search_postings sp
+                WHERE sp.term = terms[1]
+                  AND (last_id IS NULL OR (sp.impact, sp.prompt_id) < (last_impact, last_id))
+                ORDER BY sp.impact DESC, sp.prompt_id DESC
+                LIMIT block_size
+            ) b;
+            EXIT WHEN block_ids IS NULL;
+            EXIT WHEN cardinality(top_ranks) >= wanted
+                  AND idfs[1] * block_impacts[1] + rest_bound < top_ranks[wanted];
+
+            -- Score the block and keep the best `wanted` of it and the matches so far
+            SELECT COALESCE(array_agg(m.id ORDER BY m.rank DESC, m.id DESC), '{}'),
+                   COALESCE(array_agg(m.rank ORDER BY m.rank DESC, m.id DESC), '{}')
+            INTO top_ids, top_ranks
+            FROM (
+                SELECT c.id, c.rank
+                FROM (
+                    SELECT t.id, t.rank FROM unnest(top_ids, top_ranks) AS t(id, rank)
+                    UNION ALL
+                    SELECT b.id, idfs[1] * b.impact + COALESCE(o.score, 0)
+                    FROM unnest(block_ids, block_impacts) AS b(id, impact)
+                    JOIN prompts p ON p.id = b.id
+                    CROSS JOIN LATERAL (
+                        SELECT SUM(w.idf * sp.impact) AS score, COUNT(*) AS matched
+                        FROM unnest(terms[2:], idfs[2:]) AS w(term, idf)
+                        JOIN prompt_search_postings sp ON sp.term = w.term AND sp.prompt_id = b.id
+                    ) o
+                    WHERE o.matched = cardinality(terms) - 1
+                      AND (p_category_id IS NULL OR p.category_id = p_category_id)
+                      AND (p_prompt_type IS NULL OR p.prompt_type::TEXT = p_prompt_type)
+                ) c
+                WHERE p_after_id IS NULL OR (c.rank, c.id) < (p_after_rank, p_after_id)
+                ORDER BY c.rank DESC, c.id DESC
+                LIMIT wanted
+            ) m;
+
+            EXIT WHEN cardinality(block_ids) < block_size;
+            last_impact := block_impacts[cardinality(block_impacts)];
+            last_id := block_ids[cardinality(block_ids)];
+            block_size := LEAST(block_size * 2, 10000);
+        END LOOP;
+
+        RETURN QUERY
+        SELECT t.id, t.rank
+        FROM unnest(top_ids, top_ranks) WITH ORDINALITY AS t(id, rank, position)
+        WHERE t.position > p_offset
+        ORDER BY t.position;
+        RETURN;
+    END IF;
+
+    rank_expr := CASE p_sort
+        WHEN 'created_at' THEN 'EXTRACT(EPOCH FROM p.created_at)::DOUBLE PRECISION'
+        ELSE format('p.%I::DOUBLE PRECISION', p_sort)
+    END;
+
+    -- Ordered by the column itself, so the walk follows its (column, id) index.
+    -- $1 terms, $2 category, $3 prompt type, $4 / $5 cursor id / rank, $6 offset, $7 limit
+    RETURN QUERY EXECUTE format($query$
+        SELECT p.id, %1$s
+        FROM %2$s
+        WHERE (SELECT COUNT(*) FROM prompt_search_postings sp
+               WHERE sp.term = ANY(%3$s) AND sp.prompt_id = p.id) = %4$s
+          AND ($2 IS NULL OR p.category_id = $2)
+          AND ($3 IS NULL OR p.prompt_type::TEXT = $3)
+          AND ($4 IS NULL
+               OR CASE WHEN $5 IS NULL THEN %1$s IS NOT NULL OR p.id < $4
+                       ELSE %1$s IS NOT NULL AND (%1$s, p.id) < ($5, $4) END)
+          %5$s
+        ORDER BY p.%6$I DESC, p.id DESC
+        OFFSET $6
+        LIMIT $7
+    $query$,
+        rank_expr,
+        CASE WHEN dfs[1] <= walk_above
+            THEN 'prompt_search_postings lead JOIN prompts p ON p.id = lead.prompt_id AND lead.term = $1[1]'
+            ELSE 'prompts p'
+        END,
+        CASE WHEN dfs[1] <= walk_above THEN '$1[2:]' ELSE '$1' END,
+        CASE WHEN dfs[1] <= walk_above THEN 'cardinality($1) - 1' ELSE 'cardinality($1)' END,
+        CASE WHEN dfs[1] <= walk_above THEN ''
+            ELSE 'AND p.status = ''published'' AND p.privacy_status = ''public'' AND p.deleted_at IS NULL'
+        END,
+        p_sort
+    ) USING terms, p_category_id, p_prompt_type, p_after_id, p_after_rank, p_offset, p_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- The functions above act on behalf of any user id they are given: only the API
+-- (service role) may call them, not clients holding the anon / authenticated keys.
+DO $$
+DECLARE
+    fn TEXT;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        FOREACH fn IN ARRAY ARRAY[
+            'increment_view_counts(JSONB)',
+            'set_prompt_like(UUID, UUID, BOOLEAN)',
+            'set_prompt_bookmark(UUID, UUID, BOOLEAN)',
+            'set_prompt_rating(UUID, UUID, INT)',
+            'set_follow(UUID, UUID, BOOLEAN)',
+            'set_comment_vote(UUID, UUID, vote_type_enum)',
+            'recount_counters(TEXT, UUID[], JSONB)',
+            'insert_json_rows(TEXT, JSONB)',
+            'create_prompt_full(UUID, JSONB, JSONB, JSONB, JSONB)',
+            'create_prompts_batch(UUID, JSONB)',
+            'touch_prompts(UUID[])',
+            'prompt_search_remove(UUID)',
+            'prompt_search_reindex(UUID)',
+            'compact_prompt_search()',
+            'rebuild_prompt_search()'
+        ] LOOP
+            EXECUTE format('REVOKE EXECUTE ON FUNCTION %s FROM PUBLIC, anon, authenticated', fn);
+        END LOOP;
+    END IF;
+END $$;
+
 
 
 
@@ -1,10 +1,114 @@
-from supabase import create_client, Client
+import asyncio
+import time
+
+import httpx
+from supabase import AClientOptions, AsyncClient, Client, acreate_client, create_client
 from app.core.config import settings
 
 _supabase: Client = None
+_async_supabase: AsyncClient = None
+_http_client: httpx.AsyncClient = None
+_async_lock = asyncio.Lock()
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """
+    Connection-pooled transport that keeps simple utilisation counters so worker
+    count and pool size can be sized against PostgREST capacity.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.total_errors = 0
+        self.total_seconds = 0.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.total_requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.perf_counter()
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            self.total_errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        connections = self._pool.connections
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {
+            "max_connections": settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "http2": settings.SUPABASE_HTTP2,
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "in_flight_requests": self.in_flight,
+            "peak_in_flight_requests": self.peak_in_flight,
+            "total_requests": self.total_requests,
+            "total_errors": self.total_errors,
+            "avg_request_ms": round(self.total_seconds * 1000 / self.total_requests, 2) if self.total_requests else 0.0,
+        }
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.SUPABASE_HTTP_READ_TIMEOUT,
+        connect=settings.SUPABASE_HTTP_CONNECT_TIMEOUT,
+        pool=settings.SUPABASE_HTTP_POOL_TIMEOUT,
+    )
+    transport = InstrumentedTransport(limits=limits, http2=settings.SUPABASE_HTTP2)
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
 
 def get_supabase() -> Client:
+    """
+    Blocking client. Kept as the sync shim for scripts (seed_data.py, create_admin.py);
+    request handlers should use `get_async_supabase`.
+    """
     global _supabase
     if _supabase is None:
         _supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
     return _supabase
+
+async def get_async_supabase() -> AsyncClient:
+    """
+    Shared async client used by the API endpoints. Queries are awaited on the event
+    loop, so concurrency per worker is bounded by sockets rather than threadpool size.
+    Normally created by `init_async_supabase` in the app lifespan; created lazily otherwise.
+    """
+    global _async_supabase, _http_client
+    if _async_supabase is None:
+        async with _async_lock:
+            if _async_supabase is None:
+                _http_client = _build_http_client()
+                # Auth, PostgREST and Storage all share this client, and therefore one pool
+                options = AClientOptions(httpx_client=_http_client)
+                _async_supabase = await acreate_client(settings.SUPABASE_URL, settings.SUPABASE_KEY, options)
+    return _async_supabase
+
+async def init_async_supabase() -> None:
+    await get_async_supabase()
+
+async def close_async_supabase() -> None:
+    """Close the pooled HTTP client. Called from the app lifespan on shutdown."""
+    global _async_supabase, _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _async_supabase = None
+    _http_client = None
+
+def get_pool_stats() -> dict:
+    if _http_client is None:
+        return {"open_connections": 0, "in_flight_requests": 0, "initialized": False}
+    return {"initialized": True, **_http_client._transport.stats()}
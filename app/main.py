@@ -1,18 +1,55 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.core.idempotency import IdempotencyMiddleware
+from app.core.jwks import jwks_cache
 from app.core.logging import setup_logging
+from app.db.supabase import close_async_supabase, init_async_supabase
+from app.services.cache_bus import cache_bus
+from app.services.prompt_search import prompt_search
+from app.services.redis_cache import async_redis_service
+from app.services.tag_index import tag_index
+from app.services.view_recorder import view_recorder
 import time
 import logging
 from fastapi import Request
 
 setup_logging()
 logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load signing keys before serving so token checks never wait on a JWKS download
+    if jwks_cache is not None:
+        await run_in_threadpool(jwks_cache.start)
+    await init_async_supabase()
+    cache_bus.start()
+    view_recorder.start()
+    # Built in the background; /prompts/tags waits for the first build
+    tag_index.start()
+    prompt_search.start()
+    yield
+    await prompt_search.stop()
+    await tag_index.stop()
+    # Write out buffered views while the database client is still open
+    await view_recorder.stop()
+    await cache_bus.stop()
+    await close_async_supabase()
+    await async_redis_service.close()
+    if jwks_cache is not None:
+        jwks_cache.stop()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 @app.middleware("http")
@@ -25,6 +62,9 @@ async def log_requests(request: Request, call_next):
     )
     return response
 
+# Replays retried writes that carry an Idempotency-Key (inside CORS, so replays keep CORS headers)
+app.add_middleware(IdempotencyMiddleware)
+
 # Set all CORS enabled origins
 # Set all CORS enabled origins
 app.add_middleware(
@@ -33,6 +73,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link", "X-Next-Cursor"],
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
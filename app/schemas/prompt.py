@@ -82,10 +82,12 @@ class PromptResponse(PromptBase):
     featured_at: Optional[datetime] = None
     
     view_count: int
+    unique_views: Optional[int] = None  # HyperLogLog estimate, only on single-prompt reads
     bookmark_count: int
     rating_count: int
     rating_sum: int
     average_rating: float
+    bayesian_rating: Optional[float] = None
     like_count: int = 0
     fork_count: int
     comment_count: int
@@ -105,3 +107,37 @@ class PromptResponse(PromptBase):
 
     class Config:
         from_attributes = True
+
+
+class PromptView(str, Enum):
+    FULL = "full"
+    CARD = "card"
+
+class PromptCard(BaseModel):
+    """Compact listing item: no prompt text or outputs, public author fields only."""
+    id: UUID
+    user_id: UUID
+    title: str
+    description: Optional[str] = None
+    slug: Optional[str] = None
+    prompt_type: PromptType
+    category_id: UUID
+    privacy_status: PrivacyStatus
+    status: PromptStatus
+    is_featured: bool = False
+
+    view_count: int = 0
+    like_count: int = 0
+    bookmark_count: int = 0
+    comment_count: int = 0
+    average_rating: float = 0
+    bayesian_rating: Optional[float] = None
+
+    published_at: Optional[datetime] = None
+    created_at: datetime
+
+    author: Optional[UserPublic] = None
+    prompt_tags: List[PromptTagLink] = []
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis_cache import async_redis_service
+
+logger = logging.getLogger(__name__)
+
+InvalidationHandler = Callable[[List[str], List[str]], None]
+
+
+class CacheBus:
+    """
+    Broadcasts cache invalidations to every worker over Redis pub/sub so in-process
+    (L1) caches drop stale entries as soon as another worker writes.
+
+    Caches register under a name with a handler taking `(keys, tags)` and a reset
+    callback. Messages published by this process are ignored on receipt, since the
+    publisher has already applied the invalidation locally. Whenever the subscription
+    is (re)established every registered cache is reset, as anything published while
+    disconnected has been missed.
+    """
+
+    def __init__(self, channel: str, reconnect_delay: float = 5.0):
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, Tuple[InvalidationHandler, Callable[[], None]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.received = 0
+
+    def register(self, name: str, on_invalidate: InvalidationHandler, on_reset: Callable[[], None]) -> None:
+        self._handlers[name] = (on_invalidate, on_reset)
+
+    async def publish(self, name: str, keys: Iterable[str] = (), tags: Iterable[str] = ()) -> None:
+        message = {"origin": self.origin, "cache": name, "keys": list(keys), "tags": list(tags)}
+        try:
+            await async_redis_service.publish(self.channel, json.dumps(message))
+            self.published += 1
+        except Exception as e:
+            logger.warning(f"Cache invalidation publish failed: {e}")
+
+    def _dispatch(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning(f"Ignoring malformed cache invalidation message: {data!r}")
+            return
+        if message.get("origin") == self.origin:
+            return
+        handler = self._handlers.get(message.get("cache"))
+        if handler is None:
+            return
+        self.received += 1
+        handler[0](message.get("keys") or [], message.get("tags") or [])
+
+    def _reset_all(self) -> None:
+        for _, on_reset in self._handlers.values():
+            on_reset()
+
+    async def _run(self) -> None:
+        connected = True
+        while True:
+            pubsub = async_redis_service.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self._reset_all()
+                if not connected:
+                    logger.info(f"Subscribed to cache invalidation channel {self.channel}")
+                connected = True
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if connected:
+                    logger.warning(f"Cache invalidation subscriber disconnected: {e}")
+                connected = False
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def start(self) -> None:
+        """Start the subscriber on the running event loop. Called from the app lifespan."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "channel": self.channel,
+            "subscribed": self._task is not None and not self._task.done(),
+            "published": self.published,
+            "received": self.received,
+        }
+
+
+cache_bus = CacheBus(settings.CACHE_INVALIDATION_CHANNEL)
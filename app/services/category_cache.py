@@ -0,0 +1,19 @@
+from app.core.config import settings
+from app.services.query_cache import QueryCache
+
+# The category list changes rarely and is read on every page load: serve it
+# stale-while-revalidate and evict it whenever a category is written.
+CATEGORY_LIST = "list"
+
+category_cache = QueryCache(
+    "categories",
+    ttl=settings.CATEGORY_CACHE_TTL_SECONDS,
+    local_ttl=settings.HOT_CACHE_LOCAL_TTL_SECONDS,
+    local_max_bytes=settings.PROMPT_LIST_CACHE_LOCAL_MAX_BYTES // 16,
+    stale_ttl=settings.CATEGORY_CACHE_STALE_SECONDS,
+    early_refresh_beta=settings.CACHE_EARLY_REFRESH_BETA,
+)
+
+
+async def invalidate_category_lists() -> None:
+    await category_cache.invalidate_tags(CATEGORY_LIST)
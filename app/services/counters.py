@@ -0,0 +1,72 @@
+from collections import Counter
+from typing import Optional
+
+from app.db.supabase import get_async_supabase
+
+
+class EngagementCounters:
+    """
+    Engagement toggles - likes, bookmarks, ratings, follows and comment votes - backed
+    by the `set_*` SQL functions in schema.sql.
+
+    Each call is a single round trip: the function writes the membership row and applies
+    the matching delta to the denormalised counters (`like_count`, `bookmark_count`,
+    `rating_count` / `rating_sum`, `total_followers` / `total_following`, `upvote_count`)
+    in one transaction, so parallel clicks stay correct without a read-modify-write here.
+    Every method returns None when the target does not exist.
+    """
+
+    def __init__(self):
+        self.calls: Counter = Counter()
+
+    async def _call(self, fn: str, params: dict):
+        self.calls[fn] += 1
+        supabase = await get_async_supabase()
+        response = await supabase.rpc(fn, params).execute()
+        return response.data
+
+    async def set_like(self, user_id: str, prompt_id: str, liked: bool) -> Optional[int]:
+        """Like or unlike a prompt. Returns the prompt's `like_count`."""
+        return await self._call("set_prompt_like", {
+            "p_user_id": str(user_id),
+            "p_prompt_id": str(prompt_id),
+            "p_liked": liked,
+        })
+
+    async def set_bookmark(self, user_id: str, prompt_id: str, bookmarked: bool) -> Optional[dict]:
+        """Add or remove a bookmark. Returns the bookmark row (the removed one when un-bookmarking)."""
+        return await self._call("set_prompt_bookmark", {
+            "p_user_id": str(user_id),
+            "p_prompt_id": str(prompt_id),
+            "p_bookmarked": bookmarked,
+        })
+
+    async def set_rating(self, user_id: str, prompt_id: str, rating: int) -> Optional[dict]:
+        """Rate or re-rate a prompt, adjusting `rating_count` / `rating_sum` by the delta. Returns the rating row."""
+        return await self._call("set_prompt_rating", {
+            "p_user_id": str(user_id),
+            "p_prompt_id": str(prompt_id),
+            "p_rating": rating,
+        })
+
+    async def set_follow(self, follower_id: str, following_id: str, following: bool) -> Optional[int]:
+        """Follow or unfollow a user. Returns the followed user's `total_followers`."""
+        return await self._call("set_follow", {
+            "p_follower_id": str(follower_id),
+            "p_following_id": str(following_id),
+            "p_following": following,
+        })
+
+    async def set_comment_vote(self, user_id: str, comment_id: str, vote_type: str) -> Optional[dict]:
+        """Cast or change a vote on a comment. Returns the vote row."""
+        return await self._call("set_comment_vote", {
+            "p_user_id": str(user_id),
+            "p_comment_id": str(comment_id),
+            "p_vote_type": vote_type,
+        })
+
+    def stats(self) -> dict:
+        return dict(self.calls)
+
+
+counters = EngagementCounters()
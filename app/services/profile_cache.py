@@ -0,0 +1,87 @@
+import logging
+from typing import List, Optional
+
+from app.core.config import settings
+from app.services.cache_bus import cache_bus
+from app.services.local_cache import LocalCache
+from app.services.redis_cache import async_redis_service
+
+logger = logging.getLogger(__name__)
+
+# Columns of public.users the auth dependencies load and cache: what handlers read from
+# `current_user` (id, role, status) plus the public profile. Never email / password_hash.
+PROFILE_FIELDS = "id, username, display_name, avatar_url, role, is_active, is_verified, deleted_at"
+
+
+class ProfileCache:
+    """
+    Cache of public.users profiles (PROFILE_FIELDS) keyed by user id, used by the auth
+    dependencies.
+
+    Lookups go through a bounded in-process LRU (short TTL) and then Redis, which
+    is shared by every worker. Endpoints that modify a users row must call
+    `invalidate`, which also drops the row from the other workers' LRUs via the cache bus.
+    """
+
+    key_prefix = "profile:v2:"  # v2: PROFILE_FIELDS only (v1 held the whole row)
+    bus_name = "profile"
+
+    def __init__(self, max_entries: int, ttl: int, local_ttl: int, local_max_bytes: int):
+        self.ttl = ttl
+        self.local = LocalCache(max_bytes=local_max_bytes, ttl=local_ttl, max_entries=max_entries)
+        self.serializer = async_redis_service.serializer
+        self.hits = 0
+        self.misses = 0
+        cache_bus.register(self.bus_name, self._on_invalidate, self.local.clear)
+
+    def _on_invalidate(self, keys: List[str], tags: List[str]) -> None:
+        self.local.delete(*keys)
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        user_id = str(user_id)
+        profile = self.local.get(user_id)
+        if profile is not None:
+            return profile
+
+        try:
+            raw = await async_redis_service.get_raw(self.key_prefix + user_id)
+            profile = self.serializer.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning(f"Profile cache read failed: {e}")
+            return None
+
+        if profile is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.local.set(user_id, profile, len(raw))
+        return profile
+
+    async def set(self, user_id: str, profile: dict) -> None:
+        user_id = str(user_id)
+        raw = self.serializer.dumps(profile)
+        self.local.set(user_id, profile, len(raw))
+        try:
+            await async_redis_service.set_raw(self.key_prefix + user_id, raw, expire=self.ttl)
+        except Exception as e:
+            logger.warning(f"Profile cache write failed: {e}")
+
+    async def invalidate(self, user_id: str) -> None:
+        user_id = str(user_id)
+        self.local.delete(user_id)
+        try:
+            await async_redis_service.delete(self.key_prefix + user_id)
+        except Exception as e:
+            logger.warning(f"Profile cache invalidation failed: {e}")
+        await cache_bus.publish(self.bus_name, keys=[user_id])
+
+    def stats(self) -> dict:
+        return {"l1": self.local.stats(), "l2": {"hits": self.hits, "misses": self.misses}}
+
+
+profile_cache = ProfileCache(
+    max_entries=settings.PROFILE_CACHE_MAX_ENTRIES,
+    ttl=settings.PROFILE_CACHE_TTL_SECONDS,
+    local_ttl=settings.PROFILE_CACHE_LOCAL_TTL_SECONDS,
+    local_max_bytes=settings.PROFILE_CACHE_LOCAL_MAX_BYTES,
+)
@@ -0,0 +1,81 @@
+from typing import Iterable, Optional
+
+from app.core.config import settings
+from app.services.query_cache import QueryCache
+
+# Columns needed to work out which cached listings a prompt appears in
+PROMPT_CACHE_FIELDS = "id, user_id, category_id, prompt_tags(tag_id)"
+
+# Listings that are not narrowed by category, tag or author (e.g. GET /prompts/, search)
+ALL_PROMPTS = "all"
+
+prompt_list_cache = QueryCache(
+    "prompts",
+    ttl=settings.PROMPT_LIST_CACHE_TTL_SECONDS,
+    local_ttl=settings.PROMPT_LIST_CACHE_LOCAL_TTL_SECONDS,
+    local_max_bytes=settings.PROMPT_LIST_CACHE_LOCAL_MAX_BYTES,
+)
+
+# Trending is recomputed out of band into `trending_prompts`, so it is only ever
+# refreshed by TTL: served stale-while-revalidate to keep the boundary flat.
+trending_cache = QueryCache(
+    "trending",
+    ttl=settings.TRENDING_CACHE_TTL_SECONDS,
+    local_ttl=settings.HOT_CACHE_LOCAL_TTL_SECONDS,
+    local_max_bytes=settings.PROMPT_LIST_CACHE_LOCAL_MAX_BYTES // 16,
+    stale_ttl=settings.TRENDING_CACHE_STALE_SECONDS,
+    early_refresh_beta=settings.CACHE_EARLY_REFRESH_BETA,
+)
+
+
+def category_tag(category_id) -> str:
+    return f"category:{category_id}"
+
+
+def tag_tag(tag_id) -> str:
+    return f"tag:{tag_id}"
+
+
+def author_tag(user_id) -> str:
+    return f"author:{user_id}"
+
+
+def list_tags(category_id=None, tag_id=None, user_id=None) -> list:
+    """Invalidation tags for a listing with the given filters."""
+    tags = []
+    if category_id:
+        tags.append(category_tag(category_id))
+    if tag_id:
+        tags.append(tag_tag(tag_id))
+    if user_id:
+        tags.append(author_tag(user_id))
+    return tags or [ALL_PROMPTS]
+
+
+async def invalidate_prompt_lists(
+    prompt: Optional[dict] = None,
+    category_id=None,
+    user_id=None,
+    tag_ids: Iterable = (),
+    category_ids: Iterable = (),
+) -> None:
+    """
+    Evict cached listings a prompt appears (or appeared) in. Accepts a row selected
+    with PROMPT_CACHE_FIELDS and/or explicit ids; `category_ids` covers several
+    prompts at once (bulk import).
+    """
+    tags = {ALL_PROMPTS}
+    tag_ids = set(str(t) for t in tag_ids)
+    if prompt:
+        category_id = category_id or prompt.get("category_id")
+        user_id = user_id or prompt.get("user_id")
+        tag_ids.update(str(link["tag_id"]) for link in prompt.get("prompt_tags") or [] if link.get("tag_id"))
+
+    if category_id:
+        tags.add(category_tag(category_id))
+    tags.update(category_tag(c) for c in category_ids)
+    if user_id:
+        tags.add(author_tag(user_id))
+    tags.update(tag_tag(t) for t in tag_ids)
+
+    await prompt_list_cache.invalidate_tags(*tags)
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from app.core.config import settings
+from app.db.supabase import get_async_supabase
+from app.schemas.prompt import PromptCreate
+from app.services.tag_cache import slugify, tag_cache
+
+logger = logging.getLogger(__name__)
+
+# PostgREST error code for a function missing from its schema cache
+FUNCTION_NOT_FOUND = "PGRST202"
+
+
+class PromptCreator:
+    """
+    Creates a prompt together with its variables, tags and outputs.
+
+    The whole `PromptCreate` payload goes to the `create_prompt_full` SQL function in a
+    single call, which writes every table in one transaction: one round trip, and a
+    failure leaves nothing behind. If that function is not installed yet (schema.sql not
+    re-applied), the previous step-by-step path is used instead, deleting the prompt
+    again if a later step fails.
+    """
+
+    def __init__(self):
+        self.rpc_available: Optional[bool] = None  # unknown until the first create
+        self.batch_rpc_available: Optional[bool] = None
+        self.rpc_creates = 0
+        self.stepwise_creates = 0
+
+    @staticmethod
+    def _split(prompt_in: PromptCreate) -> dict:
+        prompt_data = prompt_in.model_dump(mode='json')
+        return {
+            "variables": prompt_data.pop("variables", None) or [],
+            "tags": prompt_data.pop("tags", None) or [],
+            "outputs": prompt_data.pop("prompt_outputs", None) or [],
+            "prompt": prompt_data,
+        }
+
+    async def create(self, user_id: str, prompt_in: PromptCreate) -> Tuple[dict, List[str]]:
+        """Returns the new prompts row and the ids of its tags."""
+        parts = self._split(prompt_in)
+
+        if self.rpc_available is not False:
+            supabase = await get_async_supabase()
+            try:
+                response = await supabase.rpc("create_prompt_full", {
+                    "p_user_id": str(user_id),
+                    "p_prompt": parts["prompt"],
+                    "p_variables": parts["variables"],
+                    "p_tags": parts["tags"],
+                    "p_outputs": parts["outputs"],
+                }).execute()
+            except APIError as e:
+                if e.code != FUNCTION_NOT_FOUND:
+                    raise
+                logger.warning("create_prompt_full is not installed; creating prompts step by step")
+                self.rpc_available = False
+            else:
+                self.rpc_available = True
+                self.rpc_creates += 1
+                tags = response.data["tags"]
+                tag_cache.prime(tags)
+                return response.data["prompt"], list(tags.values())
+
+        self.stepwise_creates += 1
+        return await self._create_stepwise(
+            user_id, parts["prompt"], parts["variables"], parts["tags"], parts["outputs"]
+        )
+
+    async def create_batch(
+        self, user_id: str, prompts: List[PromptCreate], slots: Optional[asyncio.Semaphore] = None
+    ) -> List[dict]:
+        """
+        Create several prompts in one call to `create_prompts_batch`, each in its own
+        subtransaction. Returns, in order, `{"ok": True, "id", "category_id", "tag_ids"}`
+        or `{"ok": False, "error"}` per prompt. Falls back to `create` calls, at most one
+        per free `slot`; share one semaphore between concurrent batches to bound them all
+        together (default: PROMPT_IMPORT_CONCURRENCY for this batch alone).
+        """
+        if self.batch_rpc_available is not False:
+            supabase = await get_async_supabase()
+            try:
+                response = await supabase.rpc("create_prompts_batch", {
+                    "p_user_id": str(user_id),
+                    "p_prompts": [self._split(prompt_in) for prompt_in in prompts],
+                }).execute()
+            except APIError as e:
+                if e.code != FUNCTION_NOT_FOUND:
+                    raise
+                logger.warning("create_prompts_batch is not installed; creating imported prompts one by one")
+                self.batch_rpc_available = False
+            else:
+                self.batch_rpc_available = True
+                results = []
+                for result in response.data:
+                    if result["ok"]:
+                        self.rpc_creates += 1
+                        tags = result.pop("tags") or {}
+                        tag_cache.prime(tags)
+                        result["tag_ids"] = list(tags.values())
+                    results.append(result)
+                return results
+
+        if slots is None:
+            slots = asyncio.Semaphore(settings.PROMPT_IMPORT_CONCURRENCY)
+
+        async def create_one(prompt_in: PromptCreate) -> Tuple[dict, List[str]]:
+            async with slots:
+                return await self.create(user_id, prompt_in)
+
+        results = []
+        for outcome in await asyncio.gather(*(create_one(p) for p in prompts), return_exceptions=True):
+            if isinstance(outcome, Exception):
+                results.append({"ok": False, "error": str(outcome)})
+            else:
+                prompt, tag_ids = outcome
+                results.append({"ok": True, "id": prompt["id"], "category_id": prompt.get("category_id"), "tag_ids": tag_ids})
+        return results
+
+    async def _create_stepwise(
+        self,
+        user_id: str,
+        prompt_data: dict,
+        variables_data: List[dict],
+        tags_data: List[str],
+        outputs_data: List[dict],
+    ) -> Tuple[dict, List[str]]:
+        supabase = await get_async_supabase()
+        prompt_data["user_id"] = user_id
+        response = await supabase.table("prompts").insert(prompt_data).execute()
+        if not response.data:
+            raise ValueError("Could not create prompt")
+
+        new_prompt = response.data[0]
+        prompt_id = new_prompt["id"]
+        try:
+            if variables_data:
+                for var in variables_data:
+                    var["prompt_id"] = prompt_id
+                await supabase.table("prompt_variables").insert(variables_data).execute()
+
+            # One lookup, one upsert for new tags and one insert of links, however many tags
+            tag_ids = []
+            if tags_data:
+                resolved = await tag_cache.resolve(tags_data)
+                unlinked = {slugify(name) for name in tags_data if name and name.strip()} - set(resolved)
+                if unlinked:
+                    raise ValueError(f"Could not link tags {sorted(unlinked)}")
+                tag_ids = list(resolved.values())
+                if tag_ids:
+                    links = [{"prompt_id": prompt_id, "tag_id": tag_id} for tag_id in tag_ids]
+                    await supabase.table("prompt_tags").insert(links).execute()
+
+            if outputs_data:
+                for out in outputs_data:
+                    out["prompt_id"] = prompt_id
+                    out["user_id"] = user_id
+                await supabase.table("prompt_outputs").insert(outputs_data).execute()
+        except Exception:
+            # Children cascade with the prompt
+            await supabase.table("prompts").delete().eq("id", prompt_id).execute()
+            raise
+
+        return new_prompt, tag_ids
+
+    def stats(self) -> dict:
+        return {
+            "rpc_available": self.rpc_available,
+            "batch_rpc_available": self.batch_rpc_available,
+            "rpc_creates": self.rpc_creates,
+            "stepwise_creates": self.stepwise_creates,
+        }
+
+
+prompt_creator = PromptCreator()
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.schemas.prompt import PromptCreate
+from app.services.prompt_cache import invalidate_prompt_lists
+from app.services.prompt_create import prompt_creator
+from app.services.tag_index import tag_index
+
+logger = logging.getLogger(__name__)
+
+
+def _line(record: dict) -> bytes:
+    return json.dumps(record, separators=(",", ":"), default=str).encode() + b"\n"
+
+
+class PromptImporter:
+    """
+    Bulk prompt import from an NDJSON stream, one `PromptCreate` object per line.
+
+    The body is read chunk by chunk and every line is validated as soon as it is
+    complete. Valid records are grouped into batches written by `create_prompts_batch`
+    (one round trip per batch), with at most `concurrency` batches in flight; reading
+    waits for a free slot, so at most `batch_size * concurrency` records are held
+    whatever the size of the upload. Without the batch function, prompts are created one
+    by one, again at most `concurrency` at a time across the whole import. A result line `{"line", "ok", "id" | "error"}` is
+    streamed back per input line (batches can finish out of order), followed by a
+    summary line.
+    """
+
+    def __init__(self, batch_size: int, concurrency: int, max_line_bytes: int):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_line_bytes = max_line_bytes
+        self.imports = 0
+        self.created = 0
+        self.failed = 0
+
+    async def _lines(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+        """Yield (line number, line) for each non-blank line; None for over-long lines."""
+        buffer = b""
+        line_no = 0
+        skipping = False  # inside a line that was already reported as too long
+        async for chunk in chunks:
+            buffer += chunk
+            while True:
+                end = buffer.find(b"\n")
+                if end < 0:
+                    break
+                line, buffer = buffer[:end], buffer[end + 1:]
+                line_no += 1
+                if skipping:
+                    skipping = False
+                elif len(line) > self.max_line_bytes:
+                    yield line_no, None
+                elif line.strip():
+                    yield line_no, line
+            if len(buffer) > self.max_line_bytes:
+                if not skipping:
+                    yield line_no + 1, None
+                    skipping = True
+                buffer = b""
+        if buffer.strip() and not skipping:
+            line_no += 1
+            yield line_no, buffer if len(buffer) <= self.max_line_bytes else None
+
+    async def _write(
+        self,
+        user_id: str,
+        batch: List[Tuple[int, PromptCreate]],
+        results: List[dict],
+        creates: asyncio.Semaphore,
+    ) -> None:
+        try:
+            outcomes = await prompt_creator.create_batch(user_id, [prompt_in for _, prompt_in in batch], creates)
+        except Exception as e:
+            logger.error(f"Import batch of {len(batch)} prompts failed: {e}")
+            outcomes = [{"ok": False, "error": str(e)}] * len(batch)
+
+        category_ids, tag_ids, prompt_ids = set(), set(), []
+        for (line_no, _), outcome in zip(batch, outcomes):
+            if outcome["ok"]:
+                results.append({"line": line_no, "ok": True, "id": outcome["id"]})
+                prompt_ids.append(outcome["id"])
+                if outcome.get("category_id"):
+                    category_ids.add(outcome["category_id"])
+                tag_ids.update(outcome.get("tag_ids") or ())
+            else:
+                results.append({"line": line_no, "ok": False, "error": outcome["error"]})
+
+        if any(outcome["ok"] for outcome in outcomes):
+            await invalidate_prompt_lists(user_id=user_id, category_ids=category_ids, tag_ids=tag_ids)
+            await tag_index.prompts_changed(prompt_ids)
+
+    async def run(
+        self,
+        user_id: str,
+        chunks: AsyncIterator[bytes],
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+    ) -> AsyncIterator[bytes]:
+        batch_size = batch_size or self.batch_size
+        concurrency = concurrency or self.concurrency
+        slots = asyncio.Semaphore(concurrency)
+        # Prompts created one by one (no create_prompts_batch), across all batches of the run
+        creates = asyncio.Semaphore(concurrency)
+        tasks: Set[asyncio.Task] = set()
+        results: List[dict] = []
+        summary = {"lines": 0, "created": 0, "failed": 0}
+        batch: List[Tuple[int, PromptCreate]] = []
+        self.imports += 1
+
+        def drain():
+            records = results[:]
+            results.clear()
+            for record in records:
+                summary["created" if record["ok"] else "failed"] += 1
+                yield _line(record)
+
+        async def write(pending):
+            try:
+                await self._write(user_id, pending, results, creates)
+            finally:
+                slots.release()
+
+        async def flush():
+            await slots.acquire()
+            task = asyncio.create_task(write(batch[:]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            batch.clear()
+
+        try:
+            async for line_no, line in self._lines(chunks):
+                summary["lines"] = line_no
+                if line is None:
+                    results.append({"line": line_no, "ok": False, "error": f"Line exceeds {self.max_line_bytes} bytes"})
+                else:
+                    try:
+                        batch.append((line_no, PromptCreate.model_validate_json(line)))
+                    except ValidationError as e:
+                        results.append({"line": line_no, "ok": False, "error": e.errors(include_url=False, include_context=False, include_input=False)})
+                    if len(batch) >= batch_size:
+                        await flush()
+                for out in drain():
+                    yield out
+
+            if batch:
+                await flush()
+            while tasks:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for out in drain():
+                    yield out
+            for out in drain():
+                yield out
+            yield _line({"summary": summary})
+        finally:
+            # A client that disconnects stops the read; batches already in flight are
+            # left to finish so no prompt is half written.
+            self.created += summary["created"]
+            self.failed += summary["failed"]
+
+    def stats(self) -> dict:
+        return {
+            "imports": self.imports,
+            "created": self.created,
+            "failed": self.failed,
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+        }
+
+
+prompt_importer = PromptImporter(
+    batch_size=settings.PROMPT_IMPORT_BATCH_SIZE,
+    concurrency=settings.PROMPT_IMPORT_CONCURRENCY,
+    max_line_bytes=settings.PROMPT_IMPORT_MAX_LINE_BYTES,
+)
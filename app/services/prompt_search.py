@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import Any, List, Optional, Tuple
+
+from postgrest.exceptions import APIError
+
+from app.core.config import settings
+from app.db.supabase import get_async_supabase
+from app.services.prompt_create import FUNCTION_NOT_FOUND
+
+logger = logging.getLogger(__name__)
+
+RELEVANCE = "relevance"
+
+
+class SearchIndexUnavailable(Exception):
+    """`search_prompts_ranked` is not installed (schema.sql not re-applied)."""
+
+
+class PromptSearch:
+    """
+    Full-text prompt search over the BM25 index kept in Postgres.
+
+    `prompt_search_postings` holds one row per (stemmed term, prompt) for the title, tag
+    names, description and prompt text of published public prompts. Triggers on
+    `prompts`, `prompt_tags` and `tags` maintain it in the same transaction as every
+    write, so creates, edits, status changes and deletes are searchable at commit.
+    `search_prompts_ranked` matches every query term, scores with BM25 and returns one
+    page of `(id, rank)`, scanning only as many postings as can still change the page
+    (per-term impact bounds); the rows themselves are then read by id. If the function is not
+    installed yet, `search` raises `SearchIndexUnavailable` and callers fall back to the
+    previous `ilike` search.
+
+    Writes only append to the document frequency and corpus size deltas (updating shared
+    rows would serialise, and deadlock, concurrent imports). A background task folds
+    them in every `compact_interval` seconds with `compact_prompt_search`.
+    """
+
+    def __init__(self, compact_interval: float):
+        self.compact_interval = compact_interval
+        self.rpc_available: Optional[bool] = None  # unknown until the first search
+        self.searches = 0
+        self.fallbacks = 0
+        self.compactions = 0
+        self.terms_compacted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def search(
+        self,
+        q: str,
+        column: str = RELEVANCE,
+        limit: int = 20,
+        skip: int = 0,
+        after: Optional[Tuple[Any, str]] = None,
+        category_id=None,
+        prompt_type: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        One page of matches as `[{"id", "rank"}]`, rank descending then id descending.
+        `rank` is the BM25 score for `column="relevance"`, otherwise the value of the sort
+        column (timestamps as epoch seconds). `after` is the (rank, id) of the previous
+        page's last match, used instead of `skip`.
+        """
+        if self.rpc_available is False:
+            self.fallbacks += 1
+            raise SearchIndexUnavailable()
+
+        supabase = await get_async_supabase()
+        params = {
+            "p_query": q,
+            "p_sort": column,
+            "p_limit": limit,
+            "p_offset": 0 if after else skip,
+            "p_after_rank": after[0] if after else None,
+            "p_after_id": after[1] if after else None,
+            "p_category_id": str(category_id) if category_id else None,
+            "p_prompt_type": prompt_type,
+        }
+        try:
+            response = await supabase.rpc("search_prompts_ranked", params).execute()
+        except APIError as e:
+            if e.code != FUNCTION_NOT_FOUND:
+                raise
+            logger.warning("search_prompts_ranked is not installed; searching with ilike")
+            self.rpc_available = False
+            self.fallbacks += 1
+            raise SearchIndexUnavailable() from e
+
+        self.rpc_available = True
+        self.searches += 1
+        return response.data
+
+    async def compact(self) -> None:
+        supabase = await get_async_supabase()
+        response = await supabase.rpc("compact_prompt_search", {}).execute()
+        self.compactions += 1
+        self.terms_compacted += response.data or 0
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                await self.compact()
+            except APIError as e:
+                if e.code == FUNCTION_NOT_FOUND:
+                    logger.warning("compact_prompt_search is not installed; search statistics are not compacted")
+                    return
+                logger.error(f"Search statistics compaction failed: {e}")
+            except Exception as e:
+                logger.error(f"Search statistics compaction failed: {e}")
+
+    def start(self) -> None:
+        """Start the periodic compaction. Called from the app lifespan."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "rpc_available": self.rpc_available,
+            "searches": self.searches,
+            "fallbacks": self.fallbacks,
+            "compactions": self.compactions,
+            "terms_compacted": self.terms_compacted,
+        }
+
+
+prompt_search = PromptSearch(compact_interval=settings.PROMPT_SEARCH_COMPACT_SECONDS)
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.http_cache import etag_from_content
+from app.db.coalesce import SingleFlight
+from app.services.cache_bus import cache_bus
+from app.services.local_cache import LocalCache
+from app.services.redis_cache import async_redis_service
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class QueryCache:
+    """
+    Read-through cache for JSON-serialisable query results: an in-process LRU (L1,
+    bounded by bytes, short TTL) in front of Redis (L2, shared by every worker).
+
+    Each entry is registered under one or more invalidation tags (e.g. "category:<id>");
+    `invalidate_tags` evicts every entry registered under any of the given tags, in
+    Redis and - through the cache bus - in the L1 of every worker.
+    Redis failures are logged and treated as cache misses.
+
+    Entries are fresh for `ttl` seconds. With `stale_ttl` set they are kept that much
+    longer and served stale while a single worker (holding a short Redis lock) reloads
+    them in the background, so a TTL boundary never sends every request to the
+    database. With `early_refresh_beta` > 0 that refresh may also start shortly before
+    expiry, with a probability that grows as expiry approaches and with the time the
+    last load took ("XFetch").
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: int,
+        local_ttl: int,
+        local_max_bytes: int,
+        stale_ttl: int = 0,
+        early_refresh_beta: float = 0.0,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.early_refresh_beta = early_refresh_beta
+        self.local = LocalCache(max_bytes=local_max_bytes, ttl=local_ttl)
+        self.serializer = async_redis_service.serializer
+        self._flight = SingleFlight()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        cache_bus.register(namespace, self._on_invalidate, self.local.clear)
+
+    def _on_invalidate(self, keys: List[str], tags: List[str]) -> None:
+        self.local.delete(*keys)
+        self.local.invalidate_tags(*tags)
+
+    def key(self, name: str, **params: Any) -> str:
+        """Build a cache key from normalised query parameters (None values are dropped)."""
+        normalised = {}
+        for k, v in params.items():
+            if v is None:
+                continue
+            if isinstance(v, Enum):
+                v = v.value
+            elif not isinstance(v, (int, float, bool)):
+                v = str(v)
+            normalised[k] = v
+        digest = hashlib.sha1(json.dumps(normalised, sort_keys=True).encode()).hexdigest()
+        return f"{self.namespace}:{name}:{digest}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self.namespace}:tag:{tag}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"{self.namespace}:lock:{key}"
+
+    async def _read(self, key: str, tags: Tuple[str, ...]) -> Optional[dict]:
+        """Fetch an entry from Redis into L1. Entries are `{"value", "etag", "fresh_until", "delta"}`."""
+        try:
+            raw = await async_redis_service.get_raw(key)
+            entry = self.serializer.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning(f"Query cache read failed: {e}")
+            return None
+        if not isinstance(entry, dict) or "fresh_until" not in entry or "etag" not in entry:
+            return None
+        self.local.set(key, entry, len(raw), tags)
+        return entry
+
+    async def _compute(self, key: str, loader: Loader, tags: Tuple[str, ...]) -> dict:
+        started = time.monotonic()
+        value = await loader()
+        entry = {
+            "value": value,
+            "etag": etag_from_content(self.serializer.dumps(value)),
+            "fresh_until": time.time() + self.ttl,
+            "delta": time.monotonic() - started,
+        }
+        raw = self.serializer.dumps(entry)
+        self.local.set(key, entry, len(raw), tags)
+
+        expire = self.ttl + self.stale_ttl
+        try:
+            # Entry and tag registrations go out in a single round trip
+            async with async_redis_service.pipeline() as pipe:
+                pipe.set(key, raw, ex=expire)
+                for tag in tags:
+                    pipe.sadd(self._tag_key(tag), key)
+                    pipe.expire(self._tag_key(tag), expire)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Query cache write failed: {e}")
+        return entry
+
+    def _refresh_early(self, entry: dict, now: float) -> bool:
+        if self.early_refresh_beta <= 0 or not entry.get("delta"):
+            return False
+        # -log(u) is exponentially distributed, so the refresh point jitters ahead of expiry
+        return now - entry["delta"] * self.early_refresh_beta * math.log(1.0 - random.random()) >= entry["fresh_until"]
+
+    async def _refresh(self, key: str, loader: Loader, tags: Tuple[str, ...], seen_fresh_until: float) -> None:
+        try:
+            token = await async_redis_service.acquire_lock(self._lock_key(key), settings.CACHE_LOCK_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(f"Query cache lock failed, refreshing locally: {e}")
+            token = ""
+        if token is None:
+            return  # another worker is refreshing this entry
+
+        try:
+            # Another worker may have refreshed it between our read and taking the lock
+            entry = await self._read(key, tags)
+            if entry is not None and entry["fresh_until"] > seen_fresh_until:
+                return
+            self.refreshes += 1
+            await self._compute(key, loader, tags)
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed: {e}")
+        finally:
+            if token:
+                try:
+                    await async_redis_service.release_lock(self._lock_key(key), token)
+                except Exception as e:
+                    logger.warning(f"Query cache lock release failed: {e}")
+
+    def _schedule_refresh(self, key: str, loader: Loader, tags: Tuple[str, ...], entry: dict) -> None:
+        if key in self._refreshing:
+            return
+        task = asyncio.ensure_future(self._refresh(key, loader, tags, entry["fresh_until"]))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def get_or_load(self, key: str, loader: Loader, tags: Iterable[str] = ()) -> Any:
+        return (await self.get_or_load_entry(key, loader, tags))["value"]
+
+    async def get_or_load_entry(self, key: str, loader: Loader, tags: Iterable[str] = ()) -> dict:
+        """Like `get_or_load`, but returns the whole entry, including the payload's `etag`."""
+        tags = tuple(tags)
+        entry = self.local.get(key)
+        if entry is None:
+            entry = await self._read(key, tags)
+            if entry is not None:
+                self.hits += 1
+
+        if entry is not None:
+            now = time.time()
+            if now < entry["fresh_until"]:
+                if self._refresh_early(entry, now):
+                    self._schedule_refresh(key, loader, tags, entry)
+                return entry
+            if self.stale_ttl:
+                self.stale_hits += 1
+                self._schedule_refresh(key, loader, tags, entry)
+                return entry
+
+        self.misses += 1
+        return await self._flight.do(key, lambda: self._compute(key, loader, tags), label=self.namespace)
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        tags = set(tags)
+        self.local.invalidate_tags(*tags)
+        try:
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                keys = await async_redis_service.set_members(tag_key)
+                await async_redis_service.delete(tag_key, *keys)
+        except Exception as e:
+            logger.warning(f"Query cache invalidation failed: {e}")
+        await cache_bus.publish(self.namespace, tags=tags)
+
+    def stats(self) -> dict:
+        return {
+            "l1": self.local.stats(),
+            "l2": {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "background_refreshes": self.refreshes,
+            },
+        }
@@ -0,0 +1,192 @@
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from app.db.supabase import get_async_supabase
+
+logger = logging.getLogger(__name__)
+
+# (target column, group key column in the source, summed column or None to count rows)
+Output = Tuple[str, str, Optional[str]]
+
+
+class CounterSource:
+    """A source table whose rows, grouped by a key column, add up to one or more counters."""
+
+    def __init__(self, table: str, outputs: List[Output], not_deleted: bool = False):
+        self.table = table
+        self.outputs = outputs
+        self.not_deleted = not_deleted
+
+    @property
+    def columns(self) -> List[str]:
+        columns = {"id"}
+        for _, key, value in self.outputs:
+            columns.add(key)
+            if value:
+                columns.add(value)
+        return sorted(columns)
+
+
+class CounterTarget:
+    """A table holding denormalised counters, and the sources they are recomputed from."""
+
+    def __init__(self, table: str, sources: List[CounterSource], averages: Dict[str, Tuple[str, str]] = None):
+        self.table = table
+        self.sources = sources
+        # Derived column -> (sum column, count column), rounded to two places like DECIMAL(3,2)
+        self.averages = averages or {}
+
+    @property
+    def counted(self) -> List[str]:
+        return [column for source in self.sources for column, _, _ in source.outputs]
+
+    @property
+    def columns(self) -> List[str]:
+        return self.counted + list(self.averages)
+
+    @property
+    def recount(self) -> List[dict]:
+        """How each counted column is derived, as `recount_counters` takes it."""
+        return [
+            {"column": column, "source": source.table, "key": key, "value": value, "not_deleted": source.not_deleted}
+            for source in self.sources
+            for column, key, value in source.outputs
+        ]
+
+
+COUNTER_TARGETS = [
+    CounterTarget("prompts", [
+        CounterSource("prompt_likes", [("like_count", "prompt_id", None)]),
+        CounterSource("bookmarks", [("bookmark_count", "prompt_id", None)]),
+        CounterSource("comments", [("comment_count", "prompt_id", None)], not_deleted=True),
+        CounterSource("prompt_ratings", [("rating_count", "prompt_id", None), ("rating_sum", "prompt_id", "rating")]),
+    ], averages={"average_rating": ("rating_sum", "rating_count")}),
+    CounterTarget("users", [
+        CounterSource("follows", [("total_followers", "following_id", None), ("total_following", "follower_id", None)]),
+        CounterSource("prompts", [("total_prompts", "user_id", None)], not_deleted=True),
+    ]),
+    CounterTarget("tags", [
+        CounterSource("prompt_tags", [("usage_count", "tag_id", None)]),
+    ]),
+    CounterTarget("categories", [
+        CounterSource("prompts", [("prompt_count", "category_id", None)], not_deleted=True),
+    ]),
+]
+
+
+class CounterReconciler:
+    """
+    Recomputes denormalised counters from their source tables and writes back the rows
+    that drifted.
+
+    Tables are read with keyset pagination on `id` (`id > last ORDER BY id LIMIT n`), so
+    every page is an index range scan however deep the scan gets, and only one page of
+    rows is held at a time. Aggregates are kept in memory per target table - one integer
+    per target row and counter, released before the next table - and the target table is
+    then streamed the same way and compared.
+
+    The scan is not a snapshot, so its values are only used to find the rows that drifted;
+    they are never written. Those rows are passed `write_batch` at a time to the
+    `recount_counters` SQL function, which locks each row and sets its counters from
+    `count(*)` / `sum()` subqueries over the source tables. A like or follow that lands
+    while the job runs is therefore counted, not overwritten. (`average_rating` is then
+    derived by the prompts trigger.)
+    """
+
+    def __init__(self, page_size: int = 5000, write_batch: int = 500, dry_run: bool = False):
+        self.page_size = page_size
+        self.write_batch = write_batch
+        self.dry_run = dry_run
+        self.report: Dict[str, dict] = {}
+
+    async def _scan(self, table: str, columns: List[str], not_deleted: bool = False):
+        """Yield pages of `table` in id order."""
+        supabase = await get_async_supabase()
+        select = ", ".join(columns)
+        last_id = None
+        while True:
+            query = supabase.table(table).select(select).order("id").limit(self.page_size)
+            if not_deleted:
+                query = query.is_("deleted_at", "null")
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            rows = (await query.execute()).data
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.page_size:
+                return
+            last_id = rows[-1]["id"]
+
+    async def _aggregate(self, source: CounterSource, expected: Dict[str, Dict[str, int]]) -> dict:
+        started = time.perf_counter()
+        scanned = 0
+        async for rows in self._scan(source.table, source.columns, source.not_deleted):
+            scanned += len(rows)
+            for row in rows:
+                for column, key, value in source.outputs:
+                    target_id = row.get(key)
+                    if target_id is not None:
+                        expected[column][target_id] += (row.get(value) or 0) if value else 1
+        seconds = time.perf_counter() - started
+        return {"rows": scanned, "seconds": round(seconds, 2), "rows_per_second": round(scanned / seconds) if seconds else 0}
+
+    async def _write(self, target: CounterTarget, ids: List[str]) -> None:
+        if self.dry_run or not ids:
+            return
+        supabase = await get_async_supabase()
+        params = {"p_table": target.table, "p_ids": ids, "p_counters": target.recount}
+        await supabase.rpc("recount_counters", params).execute()
+
+    async def reconcile(self, target: CounterTarget) -> dict:
+        started = time.perf_counter()
+        expected: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        sources = {}
+        for source in target.sources:
+            sources[source.table] = await self._aggregate(source, expected)
+
+        compared = changed = batches = 0
+        pending: List[str] = []
+        async for rows in self._scan(target.table, ["id"] + target.columns):
+            compared += len(rows)
+            for row in rows:
+                values = {column: expected[column].get(row["id"], 0) for column in target.counted}
+                for column, (sum_column, count_column) in target.averages.items():
+                    count = values.get(count_column, 0)
+                    values[column] = round(values.get(sum_column, 0) / count, 2) if count else 0.0
+
+                drifted = any(
+                    row.get(column) is None or abs(float(row[column]) - value) > 0.001
+                    for column, value in values.items()
+                )
+                if drifted:
+                    pending.append(row["id"])
+                    changed += 1
+            while len(pending) >= self.write_batch:
+                await self._write(target, pending[:self.write_batch])
+                pending = pending[self.write_batch:]
+                batches += 1
+        if pending:
+            await self._write(target, pending)
+            batches += 1
+
+        seconds = time.perf_counter() - started
+        report = {
+            "sources": sources,
+            "rows_compared": compared,
+            "rows_changed": changed,
+            "write_batches": 0 if self.dry_run else batches,
+            "seconds": round(seconds, 2),
+        }
+        self.report[target.table] = report
+        logger.info(f"Reconciled {target.table}: {changed} of {compared} rows changed in {seconds:.1f}s")
+        return report
+
+    async def run(self, tables: Optional[List[str]] = None) -> Dict[str, dict]:
+        for target in COUNTER_TARGETS:
+            if tables and target.table not in tables:
+                continue
+            await self.reconcile(target)
+        return self.report
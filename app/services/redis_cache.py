@@ -1,7 +1,11 @@
+import uuid
+
 import redis
+import redis.asyncio
 from app.core.config import settings
+from app.services.serializers import get_serializer
 import json
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List, Sequence, Set
 
 class RedisService:
     def __init__(self):
@@ -15,8 +19,111 @@ class RedisService:
 
     def set(self, key: str, value: Any, expire: int = 3600):
         self.client.set(key, json.dumps(value), ex=expire)
-    
-    def delete(self, key: str):
-        self.client.delete(key)
+
+    def delete(self, *keys: str):
+        if keys:
+            self.client.delete(*keys)
 
 redis_service = RedisService()
+
+
+class AsyncRedisService:
+    """
+    Async Redis client used on the request path. Connections come from an explicit,
+    bounded pool; values are encoded with the configured serializer (`CACHE_SERIALIZER`)
+    and stored as bytes.
+    """
+
+    _RELEASE_LOCK_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("del", KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self):
+        self.serializer = get_serializer(settings.CACHE_SERIALIZER)
+        self.pool = redis.asyncio.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        )
+        self.client = redis.asyncio.Redis(connection_pool=self.pool)
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.client.get(key)
+        if value is not None:
+            return self.serializer.loads(value)
+        return None
+
+    async def set(self, key: str, value: Any, expire: int = 3600):
+        await self.client.set(key, self.serializer.dumps(value), ex=expire)
+
+    async def get_raw(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set_raw(self, key: str, value: bytes, expire: int = 3600):
+        await self.client.set(key, value, ex=expire)
+
+    async def mget(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Fetch several keys in one round trip; missing keys come back as None."""
+        if not keys:
+            return []
+        values = await self.client.mget(keys)
+        return [self.serializer.loads(v) if v is not None else None for v in values]
+
+    async def mset(self, mapping: Dict[str, Any], expire: int = 3600):
+        """Store several keys with a TTL in one round trip (MSET itself cannot set expiries)."""
+        if not mapping:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, self.serializer.dumps(value), ex=expire)
+            await pipe.execute()
+
+    def pipeline(self, transaction: bool = False):
+        return self.client.pipeline(transaction=transaction)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*keys)
+
+    async def add_to_set(self, key: str, *members: str, expire: int = 3600):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.sadd(key, *members)
+            pipe.expire(key, expire)
+            await pipe.execute()
+
+    async def set_members(self, key: str) -> Set[str]:
+        return {m.decode() for m in await self.client.smembers(key)}
+
+    async def acquire_lock(self, key: str, timeout: int) -> Optional[str]:
+        """Take a short-lived lock (SET NX EX). Returns the owner token, or None if it is held."""
+        token = uuid.uuid4().hex
+        if await self.client.set(key, token, nx=True, ex=timeout):
+            return token
+        return None
+
+    async def release_lock(self, key: str, token: str):
+        """Release a lock taken with `acquire_lock`, unless it has expired and been re-taken."""
+        await self.client.eval(self._RELEASE_LOCK_SCRIPT, 1, key, token)
+
+    async def publish(self, channel: str, message: str):
+        await self.client.publish(channel, message)
+
+    async def memory_stats(self) -> dict:
+        info = await self.client.info("memory")
+        return {
+            "used_memory": info.get("used_memory"),
+            "used_memory_human": info.get("used_memory_human"),
+            "keys": await self.client.dbsize(),
+            "serializer": self.serializer.name,
+        }
+
+    async def close(self):
+        await self.client.aclose()
+        await self.pool.disconnect()
+
+
+async_redis_service = AsyncRedisService()
@@ -0,0 +1,118 @@
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.db.supabase import get_async_supabase
+from app.services.cache_bus import cache_bus
+from app.services.local_cache import LocalCache
+
+
+def slugify(name: str) -> str:
+    return name.lower().strip().replace(" ", "-")
+
+
+class TagCache:
+    """
+    In-process map from tag slug (or the name a client looked a tag up by) to tag id,
+    used to resolve tags in bulk when prompts are created and by `get_prompts_by_tag`.
+
+    Tag ids never change, so entries only go stale when a tag is renamed or deleted;
+    those endpoints must call `invalidate`, which also reaches the other workers
+    through the cache bus. Unknown tags are not cached.
+    """
+
+    bus_name = "tags"
+
+    def __init__(self, ttl: int, max_entries: int, max_bytes: int):
+        self.local = LocalCache(max_bytes=max_bytes, ttl=ttl, max_entries=max_entries)
+        self.created = 0
+        cache_bus.register(self.bus_name, self._on_invalidate, self.local.clear)
+
+    def _on_invalidate(self, keys: List[str], tags: List[str]) -> None:
+        self.local.invalidate_tags(*tags)
+
+    def _remember(self, key: str, tag_id: str) -> None:
+        # Every key of a tag is registered under its id, so renames and deletes drop them all
+        self.local.set(key, tag_id, len(key) + len(tag_id), tags=(tag_id,))
+
+    def prime(self, slugs: Dict[str, str]) -> None:
+        """Record slug -> id pairs resolved elsewhere (e.g. by `create_prompt_full`)."""
+        for slug, tag_id in slugs.items():
+            self._remember(slug, str(tag_id))
+
+    async def lookup(self, tag: str) -> Optional[str]:
+        """Resolve a tag by slug, falling back to a case-insensitive name match."""
+        tag_id = self.local.get(tag)
+        if tag_id is not None:
+            return tag_id
+
+        supabase = await get_async_supabase()
+        tag_res = await supabase.table("tags").select("id").eq("slug", tag).execute()
+        if not tag_res.data:
+            tag_res = await supabase.table("tags").select("id").ilike("name", tag).execute()
+        if not tag_res.data:
+            return None
+
+        tag_id = tag_res.data[0]["id"]
+        self._remember(tag, tag_id)
+        return tag_id
+
+    async def resolve(self, names: Iterable[str]) -> Dict[str, str]:
+        """
+        Map tag names to ids (keyed by slug), creating the missing tags. At most one
+        lookup and one upsert, whatever the number of tags.
+        """
+        slugs: Dict[str, str] = {}
+        for name in names:
+            if name and name.strip():
+                slugs.setdefault(slugify(name), name.strip())
+
+        resolved = {}
+        for slug in slugs:
+            tag_id = self.local.get(slug)
+            if tag_id is not None:
+                resolved[slug] = tag_id
+
+        missing = [slug for slug in slugs if slug not in resolved]
+        if not missing:
+            return resolved
+
+        supabase = await get_async_supabase()
+        found = await supabase.table("tags").select("id, slug").in_("slug", missing).execute()
+        for row in found.data:
+            resolved[row["slug"]] = row["id"]
+
+        to_create = [{"name": slugs[slug], "slug": slug} for slug in missing if slug not in resolved]
+        if to_create:
+            created = await supabase.table("tags").upsert(
+                to_create, on_conflict="slug", ignore_duplicates=True
+            ).execute()
+            for row in created.data:
+                resolved[row["slug"]] = row["id"]
+            self.created += len(created.data)
+
+            # Rows skipped as duplicates were created concurrently by another request
+            raced = [row["slug"] for row in to_create if row["slug"] not in resolved]
+            if raced:
+                found = await supabase.table("tags").select("id, slug").in_("slug", raced).execute()
+                for row in found.data:
+                    resolved[row["slug"]] = row["id"]
+
+        for slug in missing:
+            if slug in resolved:
+                self._remember(slug, resolved[slug])
+        return resolved
+
+    async def invalidate(self, tag_id: str) -> None:
+        tag_id = str(tag_id)
+        self.local.invalidate_tags(tag_id)
+        await cache_bus.publish(self.bus_name, tags=[tag_id])
+
+    def stats(self) -> dict:
+        return {**self.local.stats(), "tags_created": self.created}
+
+
+tag_cache = TagCache(
+    ttl=settings.TAG_CACHE_TTL_SECONDS,
+    max_entries=settings.TAG_CACHE_MAX_ENTRIES,
+    max_bytes=settings.TAG_CACHE_MAX_BYTES,
+)
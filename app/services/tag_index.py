@@ -0,0 +1,305 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.core.config import settings
+from app.db.supabase import get_async_supabase
+from app.services.cache_bus import cache_bus
+
+logger = logging.getLogger(__name__)
+
+# Sort columns kept per prompt, so tag queries are ordered and paged without the database
+SORT_COLUMNS = ("created_at", "like_count", "view_count", "bookmark_count", "bayesian_rating")
+INDEX_FIELDS = "id, status, privacy_status, deleted_at, " + ", ".join(SORT_COLUMNS) + ", prompt_tags(tag_id)"
+
+
+def _bits(bitmap: int) -> Iterator[int]:
+    """Positions of the set bits, lowest first."""
+    digits = bin(bitmap)[:1:-1]
+    position = digits.find("1")
+    while position != -1:
+        yield position
+        position = digits.find("1", position + 1)
+
+
+def _visible(row: dict) -> bool:
+    return row.get("status") == "published" and row.get("privacy_status") == "public" and not row.get("deleted_at")
+
+
+class _Snapshot:
+    """One generation of the index. Rebuilt off to the side and swapped in whole."""
+
+    def __init__(self):
+        self.slots: Dict[str, int] = {}            # prompt id -> bit position
+        self.ids: List[Optional[str]] = []         # bit position -> prompt id (None once removed)
+        self.keys: List[Optional[tuple]] = []      # bit position -> values of SORT_COLUMNS
+        self.tags_of: List[Tuple[str, ...]] = []   # bit position -> tag ids
+        self.postings: Dict[str, int] = {}         # tag id -> bitmap of bit positions
+
+    def upsert(self, row: dict) -> None:
+        tag_ids = {link["tag_id"] for link in row.get("prompt_tags") or []}
+        slot = self.slots.get(row["id"])
+        if slot is None:
+            slot = len(self.ids)
+            self.slots[row["id"]] = slot
+            self.ids.append(row["id"])
+            self.keys.append(None)
+            self.tags_of.append(())
+
+        bit = 1 << slot
+        old = set(self.tags_of[slot])
+        for tag_id in old - tag_ids:
+            self._unlink(tag_id, bit)
+        for tag_id in tag_ids - old:
+            self.postings[tag_id] = self.postings.get(tag_id, 0) | bit
+        self.keys[slot] = tuple(row.get(column) for column in SORT_COLUMNS)
+        self.tags_of[slot] = tuple(tag_ids)
+
+    def remove(self, prompt_id: str) -> None:
+        slot = self.slots.pop(prompt_id, None)
+        if slot is None:
+            return
+        bit = 1 << slot
+        for tag_id in self.tags_of[slot]:
+            self._unlink(tag_id, bit)
+        self.ids[slot] = None
+        self.keys[slot] = None
+        self.tags_of[slot] = ()
+
+    def _unlink(self, tag_id: str, bit: int) -> None:
+        bitmap = self.postings.get(tag_id, 0) & ~bit
+        if bitmap:
+            self.postings[tag_id] = bitmap
+        else:
+            self.postings.pop(tag_id, None)
+
+
+class TagIndex:
+    """
+    In-memory inverted index from tag to the published, public prompts carrying it,
+    answering boolean tag queries (`all` / `any` / `none`) for `GET /prompts/tags`.
+
+    Each prompt gets a bit position and each tag a posting list stored as a bitmap (a
+    Python int), so intersection, union and exclusion are single AND / OR / AND-NOT
+    operations over compact integers, however popular the tags. The sort columns of
+    every prompt are kept alongside, and the matching set is ordered and paged in memory
+    (`heapq.nlargest`, O(n log k)); only the page itself is then read from the database.
+
+    The index is built with a keyset scan of `prompts` when the app starts and rebuilt
+    every `rebuild_interval` seconds, which also refreshes the sort counters (likes,
+    views, ...). Prompts created, edited or deleted through the API are re-read at once
+    via `prompts_changed`, which other workers hear about over the cache bus.
+    """
+
+    bus_name = "tag_index"
+
+    def __init__(self, rebuild_interval: int, page_size: int):
+        self.rebuild_interval = rebuild_interval
+        self.page_size = page_size
+        self._snapshot = _Snapshot()
+        self._ready: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._rebuild_requested: Optional[asyncio.Event] = None
+        self._building = False
+        self._changed_while_building: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
+        self.builds = 0
+        self.last_build_seconds = 0.0
+        self.refreshes = 0
+        self.queries = 0
+        cache_bus.register(self.bus_name, self._on_invalidate, self._on_reset)
+
+    # ── Building ──
+
+    async def rebuild(self) -> None:
+        started = time.perf_counter()
+        self._building = True
+        self._changed_while_building.clear()
+        try:
+            snapshot = _Snapshot()
+            supabase = await get_async_supabase()
+            last_id = None
+            while True:
+                query = (
+                    supabase.table("prompts").select(INDEX_FIELDS)
+                    .eq("status", "published").eq("privacy_status", "public").is_("deleted_at", "null")
+                    .order("id").limit(self.page_size)
+                )
+                if last_id is not None:
+                    query = query.gt("id", last_id)
+                rows = (await query.execute()).data
+                for row in rows:
+                    snapshot.upsert(row)
+                if len(rows) < self.page_size:
+                    break
+                last_id = rows[-1]["id"]
+            self._snapshot = snapshot
+        finally:
+            self._building = False
+
+        # Writes that landed mid-scan may have been read before they happened
+        changed = list(self._changed_while_building)
+        if changed:
+            await self._refresh(changed)
+        self.builds += 1
+        self.last_build_seconds = round(time.perf_counter() - started, 2)
+        if self._ready is not None:
+            self._ready.set()
+        logger.info(f"Tag index built: {len(snapshot.slots)} prompts, {len(snapshot.postings)} tags in {self.last_build_seconds}s")
+
+    async def _refresh(self, prompt_ids: Sequence[str]) -> None:
+        """Re-read the given prompts (visibility, sort values, tags) into the live snapshot."""
+        supabase = await get_async_supabase()
+        rows = (await supabase.table("prompts").select(INDEX_FIELDS).in_("id", list(prompt_ids)).execute()).data
+        snapshot = self._snapshot
+        found = set()
+        for row in rows:
+            found.add(row["id"])
+            if _visible(row):
+                snapshot.upsert(row)
+            else:
+                snapshot.remove(row["id"])
+        for prompt_id in prompt_ids:
+            if prompt_id not in found:
+                snapshot.remove(prompt_id)
+        self.refreshes += 1
+
+    async def prompts_changed(self, prompt_ids: Iterable) -> None:
+        """Call after prompts (or their tags) are created, updated or deleted."""
+        prompt_ids = [str(p) for p in prompt_ids]
+        if not prompt_ids:
+            return
+        if self._building:
+            self._changed_while_building.update(prompt_ids)
+        try:
+            await self._refresh(prompt_ids)
+        except Exception as e:
+            logger.warning(f"Tag index refresh failed, picked up at the next rebuild: {e}")
+        await cache_bus.publish(self.bus_name, keys=prompt_ids)
+
+    async def tag_deleted(self, tag_id) -> None:
+        self._snapshot.postings.pop(str(tag_id), None)
+        await cache_bus.publish(self.bus_name, tags=[str(tag_id)])
+
+    def _on_invalidate(self, keys: List[str], tags: List[str]) -> None:
+        for tag_id in tags:
+            self._snapshot.postings.pop(tag_id, None)
+        if keys:
+            if self._building:
+                self._changed_while_building.update(keys)
+            task = asyncio.get_running_loop().create_task(self._refresh(keys))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    def _on_reset(self) -> None:
+        # Missed broadcasts: rebuild soon rather than serve a stale index until the next cycle
+        if self._rebuild_requested is not None and self.builds:
+            self._rebuild_requested.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Tag index rebuild failed: {e}")
+            try:
+                await asyncio.wait_for(self._rebuild_requested.wait(), timeout=self.rebuild_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._rebuild_requested.clear()
+
+    def start(self) -> None:
+        """Build the index in the background and keep rebuilding it. Called from the app lifespan."""
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._rebuild_requested = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def ready(self) -> None:
+        """Wait for the first build (started on demand if the background task is not running)."""
+        if self._ready is None:
+            self.start()
+        await self._ready.wait()
+
+    # ── Querying ──
+
+    def match(self, all_tags: Sequence[str] = (), any_tags: Sequence[str] = (), none_tags: Sequence[str] = ()) -> int:
+        """Bitmap of prompts carrying every `all` tag, at least one `any` tag and no `none` tag."""
+        postings = self._snapshot.postings
+        result: Optional[int] = None
+        for tag_id in all_tags:
+            bitmap = postings.get(tag_id, 0)
+            result = bitmap if result is None else result & bitmap
+            if not result:
+                return 0
+        if any_tags:
+            union = 0
+            for tag_id in any_tags:
+                union |= postings.get(tag_id, 0)
+            result = union if result is None else result & union
+        if not result:
+            return 0
+        for tag_id in none_tags:
+            result &= ~postings.get(tag_id, 0)
+        return result
+
+    def page(
+        self,
+        bitmap: int,
+        column: str,
+        skip: int,
+        limit: int,
+        after: Optional[Tuple[object, str]] = None,
+    ) -> List[dict]:
+        """
+        One page of the matching prompts ordered by `column` descending (NULLs first,
+        then id descending, like `paginate`), starting after the cursor position `after`
+        or at offset `skip`, as `[{"id", column}]`.
+        """
+        snapshot = self._snapshot
+        position = SORT_COLUMNS.index(column)
+
+        def key(slot: int) -> tuple:
+            value = snapshot.keys[slot][position]
+            return (value is None, value if value is not None else 0, snapshot.ids[slot])
+
+        slots = [slot for slot in _bits(bitmap) if slot < len(snapshot.ids) and snapshot.ids[slot] is not None]
+        if after is not None:
+            bound = (after[0] is None, after[0] if after[0] is not None else 0, after[1])
+            slots = [slot for slot in slots if key(slot) < bound]
+            skip = 0
+        top = heapq.nlargest(skip + limit, slots, key=key)[skip:]
+        self.queries += 1
+        return [{"id": snapshot.ids[slot], column: snapshot.keys[slot][position]} for slot in top]
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "ready": self._ready is not None and self._ready.is_set(),
+            "prompts": len(snapshot.slots),
+            "tags": len(snapshot.postings),
+            "bitmap_bytes": sum((bitmap.bit_length() + 7) // 8 for bitmap in snapshot.postings.values()),
+            "builds": self.builds,
+            "last_build_seconds": self.last_build_seconds,
+            "refreshes": self.refreshes,
+            "queries": self.queries,
+        }
+
+
+tag_index = TagIndex(
+    rebuild_interval=settings.TAG_INDEX_REBUILD_SECONDS,
+    page_size=settings.TAG_INDEX_SCAN_PAGE_SIZE,
+)
@@ -0,0 +1,80 @@
+import hashlib
+import logging
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis_cache import async_redis_service
+
+logger = logging.getLogger(__name__)
+
+
+class UniqueViewTracker:
+    """
+    Per-prompt unique viewer estimate and repeat-view filter, both in Redis.
+
+    Viewers are identified by user id, or for anonymous requests by a hash of IP and
+    user agent. Each view is added to a HyperLogLog per prompt (~0.8% error, at most
+    12 KB per prompt), and a `SET NX EX` marker per (prompt, viewer) tells whether the
+    same viewer already counted within `dedupe_window` seconds. Both go out in one
+    pipeline with the count, so a read costs a single round trip.
+
+    If Redis is unavailable every view counts and the estimate is unknown (None).
+    """
+
+    def __init__(self, dedupe_window: int, namespace: str = "views"):
+        self.dedupe_window = dedupe_window
+        self.namespace = namespace
+        self.repeats = 0
+        self.errors = 0
+
+    def _hll_key(self, prompt_id: str) -> str:
+        return f"{self.namespace}:hll:{prompt_id}"
+
+    def _seen_key(self, prompt_id: str, viewer: str) -> str:
+        return f"{self.namespace}:seen:{prompt_id}:{viewer}"
+
+    @staticmethod
+    def viewer_id(user_id: Optional[str], ip_address: Optional[str], user_agent: Optional[str]) -> str:
+        if user_id:
+            return f"u:{user_id}"
+        digest = hashlib.sha1(f"{ip_address or ''}|{user_agent or ''}".encode()).hexdigest()[:16]
+        return f"a:{digest}"
+
+    async def observe(self, prompt_id: str, viewer: str) -> Tuple[bool, Optional[int]]:
+        """
+        Register a view. Returns `(counts, unique_views)`: whether the view is new within
+        the dedupe window (and should be recorded), and the current unique viewer estimate.
+        """
+        try:
+            async with async_redis_service.pipeline() as pipe:
+                if self.dedupe_window > 0:
+                    pipe.set(self._seen_key(prompt_id, viewer), 1, nx=True, ex=self.dedupe_window)
+                pipe.pfadd(self._hll_key(prompt_id), viewer)
+                pipe.pfcount(self._hll_key(prompt_id))
+                results = await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Unique view tracking failed: {e}")
+            return True, None
+
+        counts = bool(results[0]) if self.dedupe_window > 0 else True
+        if not counts:
+            self.repeats += 1
+        return counts, results[-1]
+
+    async def forget(self, prompt_id: str) -> None:
+        """Drop the estimate of a deleted prompt (dedupe markers expire on their own)."""
+        try:
+            await async_redis_service.delete(self._hll_key(prompt_id))
+        except Exception as e:
+            logger.warning(f"Unique view cleanup failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "dedupe_window_seconds": self.dedupe_window,
+            "repeat_views_skipped": self.repeats,
+            "errors": self.errors,
+        }
+
+
+unique_views = UniqueViewTracker(dedupe_window=settings.VIEW_DEDUPE_WINDOW_SECONDS)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+from app.core.config import settings
+from app.db.supabase import get_async_supabase
+
+logger = logging.getLogger(__name__)
+
+
+def _is_invalid_data(error: APIError) -> bool:
+    """Postgres data exceptions (22xxx) and constraint violations (23xxx)."""
+    return str(error.code or "")[:2] in ("22", "23")
+
+
+class ViewRecorder:
+    """
+    Write-behind buffer for prompt views.
+
+    `record` only appends to memory. A background task flushes every `flush_interval`
+    seconds (or as soon as `batch_size` views are waiting): `prompt_views` rows are
+    bulk-inserted in batches and the per-prompt `view_count` deltas are applied in one
+    call to the `increment_view_counts` SQL function, so concurrent workers never
+    read-modify-write the counter.
+
+    The buffer is bounded: past `max_rows` pending rows, new view rows are dropped
+    (their count deltas are still kept). Whatever a failed flush did not write goes back
+    into the buffer and is retried on the next tick. Only rows the database rejects as
+    invalid (e.g. the prompt was deleted meanwhile) are dropped, found by splitting the
+    rejected batch, so one bad row does not cost the rest of its batch.
+    Pending views are flushed on shutdown; a crash loses at most one interval of views.
+    """
+
+    def __init__(self, flush_interval: float, batch_size: int, max_rows: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+
+        self._rows: List[dict] = []
+        self._deltas: Counter = Counter()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        self.recorded = 0
+        self.dropped_rows = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def record(
+        self,
+        prompt_id: str,
+        user_id: Optional[str] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        referrer: Optional[str] = None,
+    ) -> None:
+        self.recorded += 1
+        self._deltas[prompt_id] += 1
+
+        if len(self._rows) >= self.max_rows:
+            self.dropped_rows += 1
+            return
+
+        row = {"prompt_id": prompt_id, "viewed_at": datetime.now(timezone.utc).isoformat()}
+        if user_id: row["user_id"] = user_id
+        if ip_address: row["ip_address"] = ip_address
+        if user_agent: row["user_agent"] = user_agent
+        if referrer: row["referrer"] = referrer[:500]
+        self._rows.append(row)
+
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            rows, self._rows = self._rows, []
+            deltas, self._deltas = self._deltas, Counter()
+            if not rows and not deltas:
+                return
+
+            batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+            supabase = await get_async_supabase()
+            try:
+                while batches:
+                    batch = batches[0]
+                    try:
+                        await supabase.table("prompt_views").insert(batch, returning=ReturnMethod.minimal).execute()
+                        self.flushed_rows += len(batch)
+                    except APIError as e:
+                        if not _is_invalid_data(e):
+                            raise
+                        # Retrying the same rows cannot help: halve the batch until the bad rows are isolated
+                        if len(batch) > 1:
+                            middle = len(batch) // 2
+                            batches[0:1] = [batch[:middle], batch[middle:]]
+                            continue
+                        logger.warning(f"Dropping a prompt view rejected by the database: {e}")
+                        self.dropped_rows += 1
+                    batches.pop(0)
+
+                if deltas:
+                    payload = [{"prompt_id": pid, "delta": delta} for pid, delta in deltas.items()]
+                    await supabase.rpc("increment_view_counts", {"deltas": payload}).execute()
+                    deltas = Counter()
+
+                self.flushes += 1
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.warning(f"View flush failed, retrying next interval: {e}")
+                # Put back whatever was not written, within the buffer bound
+                rows = [row for batch in batches for row in batch]
+                room = max(self.max_rows - len(self._rows), 0)
+                self.dropped_rows += max(len(rows) - room, 0)
+                self._rows = rows[:room] + self._rows
+                self._deltas.update(deltas)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Shielded so shutdown never cancels a flush halfway (stop() waits for it on the lock)
+            await asyncio.shield(self.flush())
+
+    def start(self) -> None:
+        """Start the periodic flusher on the running event loop. Called from the app lifespan."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending_rows": len(self._rows),
+            "pending_prompts": len(self._deltas),
+            "recorded": self.recorded,
+            "flushed_rows": self.flushed_rows,
+            "dropped_rows": self.dropped_rows,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+view_recorder = ViewRecorder(
+    flush_interval=settings.VIEW_FLUSH_INTERVAL_SECONDS,
+    batch_size=settings.VIEW_FLUSH_BATCH_SIZE,
+    max_rows=settings.VIEW_BUFFER_MAX_ROWS,
+)
@@ -0,0 +1,141 @@
+"""
+Benchmark the sync `RedisService` (stdlib json, one round trip per key) against
+`AsyncRedisService` with each available serializer, single-key and batched.
+
+Needs a local redis-server; keys are written under "bench:" and removed afterwards.
+Run from the repo root:
+
+    redis-server --daemonize yes
+    python scripts/bench_redis.py --url redis://localhost:6379/15 -n 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--url", default="redis://localhost:6379/15", help="Redis URL (use a scratch database)")
+parser.add_argument("-n", type=int, default=2000, help="operations per case")
+parser.add_argument("--batch", type=int, default=20, help="keys per mget/mset (e.g. one page of prompt cards)")
+parser.add_argument("--concurrency", type=int, default=50, help="concurrent tasks for the async cases")
+args = parser.parse_args()
+
+os.environ["REDIS_URL"] = args.url
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "offline")
+
+from app.core.config import settings  # noqa: E402
+from app.services import serializers  # noqa: E402
+from app.services.redis_cache import AsyncRedisService, RedisService  # noqa: E402
+
+
+def prompt_card(i: int) -> dict:
+    """Roughly the shape of a row returned by the prompt list endpoints."""
+    return {
+        "id": str(uuid.uuid4()),
+        "title": f"Prompt {i}: summarise a long technical document",
+        "description": "Condenses an arbitrary document into a short executive summary. " * 3,
+        "prompt_text": "You are an expert editor. Summarise the following text... " * 10,
+        "prompt_type": "text_generation",
+        "status": "published",
+        "view_count": i * 7,
+        "like_count": i * 3,
+        "bookmark_count": i,
+        "average_rating": 4.2,
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "author": {"id": str(uuid.uuid4()), "username": f"user{i}", "avatar_url": None},
+        "prompt_tags": [{"tags": {"id": str(uuid.uuid4()), "name": "writing", "slug": "writing"}}],
+        "prompt_outputs": [],
+    }
+
+
+def report(name: str, ops: int, seconds: float) -> None:
+    print(f"  {name:<38} {ops / seconds:>10.0f} ops/s   {seconds * 1e6 / ops:>8.1f} us/op")
+
+
+def bench_sync(keys, values) -> None:
+    service = RedisService()
+    started = time.perf_counter()
+    for key, value in zip(keys, values):
+        service.set(key, value, expire=60)
+    report("sync json set", len(keys), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for key in keys:
+        service.get(key)
+    report("sync json get", len(keys), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for i in range(0, len(keys), args.batch):
+        for key in keys[i:i + args.batch]:
+            service.get(key)
+    report(f"sync json {args.batch} x get (per key)", len(keys), time.perf_counter() - started)
+    service.client.delete(*keys)
+
+
+async def bench_async(serializer_name: str, keys, values) -> None:
+    settings.CACHE_SERIALIZER = serializer_name
+    service = AsyncRedisService()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(coro):
+        async with semaphore:
+            return await coro
+
+    try:
+        started = time.perf_counter()
+        for key, value in zip(keys, values):
+            await service.set(key, value, expire=60)
+        report(f"async {serializer_name} set", len(keys), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for key in keys:
+            await service.get(key)
+        report(f"async {serializer_name} get", len(keys), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(bounded(service.get(key)) for key in keys))
+        report(f"async {serializer_name} get x{args.concurrency} concurrent", len(keys), time.perf_counter() - started)
+
+        batches = [keys[i:i + args.batch] for i in range(0, len(keys), args.batch)]
+        started = time.perf_counter()
+        for batch in batches:
+            await service.mset({key: values[0] for key in batch}, expire=60)
+        report(f"async {serializer_name} mset (per key)", len(keys), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for batch in batches:
+            await service.mget(batch)
+        report(f"async {serializer_name} mget (per key)", len(keys), time.perf_counter() - started)
+
+        size = len(service.serializer.dumps(values[0]))
+        print(f"  {'':<38} payload {size} bytes")
+        await service.delete(*keys)
+    finally:
+        await service.close()
+
+
+def main() -> None:
+    values = [prompt_card(i) for i in range(args.n)]
+    keys = [f"bench:{i}" for i in range(args.n)]
+
+    print(f"{args.n} ops per case against {args.url}")
+    print("baseline")
+    bench_sync(keys, values)
+
+    available = ["json"]
+    if serializers.orjson is not None:
+        available.append("orjson")
+    if serializers.msgpack is not None:
+        available.append("msgpack")
+    for name in available:
+        print(name)
+        asyncio.run(bench_async(name, keys, values))
+
+
+if __name__ == "__main__":
+    main()
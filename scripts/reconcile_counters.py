@@ -0,0 +1,48 @@
+"""
+Recompute denormalised counters (likes, bookmarks, comments, ratings, followers,
+prompts per user / category, tag usage) from their source tables and write back
+the rows that drifted. Prints a throughput report per table.
+
+Run from the repo root with the API's environment (.env):
+
+    python scripts/reconcile_counters.py --dry-run
+    python scripts/reconcile_counters.py --tables prompts users --page-size 10000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db.supabase import close_async_supabase, init_async_supabase  # noqa: E402
+from app.services.reconcile import COUNTER_TARGETS, CounterReconciler  # noqa: E402
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--tables", nargs="*", choices=[target.table for target in COUNTER_TARGETS], help="target tables (default: all)")
+parser.add_argument("--page-size", type=int, default=5000, help="rows per keyset page")
+parser.add_argument("--write-batch", type=int, default=500, help="changed rows per write-back call")
+parser.add_argument("--dry-run", action="store_true", help="compute and report, write nothing")
+
+
+def print_report(report: dict) -> None:
+    for table, result in report.items():
+        print(f"{table}: {result['rows_changed']} of {result['rows_compared']} rows changed, "
+              f"{result['write_batches']} write batches, {result['seconds']}s")
+        for source, scan in result["sources"].items():
+            print(f"  {source:<16} {scan['rows']:>10} rows  {scan['rows_per_second']:>8} rows/s  {scan['seconds']}s")
+
+
+async def main(args) -> None:
+    await init_async_supabase()
+    try:
+        reconciler = CounterReconciler(page_size=args.page_size, write_batch=args.write_batch, dry_run=args.dry_run)
+        print_report(await reconciler.run(args.tables))
+    finally:
+        await close_async_supabase()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""
+Offline check of asymmetric (RS256/ES256) token verification.
+
+Generates throwaway RSA and EC key pairs, publishes them in a JWKS file, signs
+tokens with them and runs them through app.core.security.decode_token.
+No Supabase project is needed; run from the repo root:
+
+    python scripts/verify_jwks_local.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "offline")
+
+keys = {
+    "rsa-1": ("RS256", rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+    "ec-1": ("ES256", ec.generate_private_key(ec.SECP256R1())),
+}
+
+jwks_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+json.dump({"keys": []}, jwks_file)
+jwks_file.close()
+
+
+def publish(kids):
+    document = {"keys": []}
+    for kid in kids:
+        alg, private_key = keys[kid]
+        jwk = json.loads(jwt.algorithms.get_default_algorithms()[alg].to_jwk(private_key.public_key()))
+        jwk.update({"kid": kid, "alg": alg, "use": "sig"})
+        document["keys"].append(jwk)
+    with open(jwks_file.name, "w") as f:
+        json.dump(document, f)
+
+
+def sign(kid, **overrides):
+    alg, private_key = keys[kid]
+    claims = {
+        "sub": "00000000-0000-0000-0000-000000000001",
+        "email": "jwks@example.com",
+        "aud": "authenticated",
+        "iss": "http://localhost:54321/auth/v1",
+        "exp": int(time.time()) + 300,
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, private_key, algorithm=alg, headers={"kid": kid})
+
+
+def check(label, token, expect_ok):
+    try:
+        decode_token(token)
+        ok = True
+    except jwt.InvalidTokenError as e:
+        ok = False
+        print(f"   rejected: {e}")
+    status = "PASS" if ok == expect_ok else "FAIL"
+    print(f"[{status}] {label}")
+    return ok == expect_ok
+
+
+publish(["rsa-1"])
+os.environ["SUPABASE_JWKS_URL"] = f"file://{jwks_file.name}"
+os.environ["JWKS_MIN_REFETCH_INTERVAL_SECONDS"] = "0"
+
+from app.core.jwks import jwks_cache  # noqa: E402
+from app.core.security import decode_token  # noqa: E402
+
+jwks_cache.start()
+
+results = [
+    check("RS256 token with published key", sign("rsa-1"), True),
+    check("Token for wrong audience", sign("rsa-1", aud="other"), False),
+    check("Expired token", sign("rsa-1", exp=int(time.time()) - 10), False),
+]
+
+# Rotate: a new kid is rejected once, triggers a background refetch, then verifies
+publish(["rsa-1", "ec-1"])
+results.append(check("ES256 token before refetch", sign("ec-1"), False))
+time.sleep(0.5)
+results.append(check("ES256 token after refetch", sign("ec-1"), True))
+
+jwks_cache.stop()
+os.remove(jwks_file.name)
+
+print("All checks passed" if all(results) else "Some checks FAILED")
+sys.exit(0 if all(results) else 1)